@@ -1,130 +1,496 @@
-from flask import Flask, render_template, jsonify, request
+import time
+import zlib
+
+from flask import Flask, Response, g, render_template, jsonify, request
+from bot_scheduler import BOT_KINDS, DEFAULT_BOT_KIND, BotScheduler
 from game_engine import CasinoGameEngine, ITEM_STEAL, ITEM_DIAMOND
+from history import MatchHistory, match_record
+from matchmaking import Matchmaker
+from metrics import REGISTRY
+from replay import export_match
+from rooms import RoomRegistry, RoomError, DEFAULT_ROOM, STREAM_TIMEOUT
+from wire import COMPACT_MIME, WIRE_SCHEMA, compact_state
+
+# Longest action list /batch accepts in one request
+MAX_BATCH_ACTIONS = 16
+# Seconds each bot move is delayed by (random in range), so humans can follow along
+BOT_PACING = (0.4, 1.0)
+# Matchmaking: players per queued table, and seconds before bots fill a short one
+TABLE_SIZE = 4
+BACKFILL_AFTER = 30.0
 
 app = Flask(__name__)
 
-# Global state
-game = None
-lobby = [] # List of player names
-game_started = False
+# Global state: every table lives in its own room
+registry = RoomRegistry()
+# Finished matches are written here off the request path
+history = MatchHistory()
+
+
+# Request metrics: labelled by the route template, never the raw path, so cardinality stays bounded
+http_requests = REGISTRY.counter("http_requests_total", "HTTP requests by route, method and status",
+                                 ("route", "method", "status"))
+http_latency = REGISTRY.histogram("http_request_seconds", "HTTP request latency by route", ("route", "method"))
+
+
+def _room_gauge(fn):
+    return lambda: sum(fn(room) for room in registry.rooms())
+
+
+def _game_gauge(fn):
+    # Reads without the room locks: a scrape may see a value mid-update, never a broken game
+    return _room_gauge(lambda room: fn(room.game) if room.game else 0)
+
+
+REGISTRY.gauge("rooms_active", "Rooms currently held by the registry", lambda: len(registry))
+REGISTRY.gauge("games_running", "Rooms with a started game", _room_gauge(lambda room: room.game is not None))
+REGISTRY.gauge("players_active", "Players seated in lobbies and games", _room_gauge(lambda room: len(room.lobby)))
+REGISTRY.gauge("players_alive", "Players still alive in running games", _game_gauge(lambda game: len(game.alive)))
+REGISTRY.gauge("log_lines_retained", "Log lines held in memory, public and private tails",
+               _game_gauge(lambda game: sum(game.log_store.sizes().values())))
+REGISTRY.gauge("events_buffered", "Events held in the per-game event buffers", _game_gauge(lambda game: len(game.events)))
+REGISTRY.gauge("bot_moves_queued", "Bot moves waiting for pacing, CPU budget or a worker",
+               lambda: bot_scheduler.stats()["queued"])
+REGISTRY.gauge("bot_moves_total", "Bot moves applied since start", lambda: bot_scheduler.moves, kind="counter")
+REGISTRY.gauge("bot_cpu_seconds_total", "CPU seconds spent planning bot moves",
+               lambda: bot_scheduler.cpu_seconds, kind="counter")
+REGISTRY.gauge("matchmaking_queue_depth", "Players waiting in the matchmaking queue", lambda: matchmaker.depth())
+REGISTRY.gauge("matchmaking_oldest_wait_seconds", "How long the oldest queued player has waited",
+               lambda: matchmaker.oldest_wait())
+REGISTRY.gauge("matchmaking_tables_total", "Tables started by the matchmaker (queue and brackets)",
+               lambda: matchmaker.tables_started, kind="counter")
+REGISTRY.gauge("matchmaking_bots_backfilled_total", "Bot seats added to fill queued tables",
+               lambda: matchmaker.bots_backfilled, kind="counter")
+REGISTRY.gauge("matchmaking_tables_failed_total", "Tables the matchmaker could not start",
+               lambda: matchmaker.tables_failed, kind="counter")
+REGISTRY.gauge("tournaments_active", "Brackets without a champion yet", lambda: matchmaker.stats()["tournaments_active"])
+REGISTRY.gauge("history_pending", "Finished matches waiting for the history writer", lambda: history.pending())
+REGISTRY.gauge("history_written_total", "Matches written by the history writer since start",
+               lambda: history.written, kind="counter")
+REGISTRY.gauge("history_dropped_total", "Matches dropped because the history queue was full",
+               lambda: history.dropped, kind="counter")
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    start = g.pop("request_start", None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        http_latency.observe(time.perf_counter() - start, (route, request.method))
+        http_requests.inc((route, request.method, str(response.status_code)))
+    return response
+
+
+def room_route(rule, **options):
+    """Register a route both under /api/rooms/<room_id>/... and the legacy /api/... path.
+
+    The legacy path maps onto the DEFAULT_ROOM so old clients keep working.
+    """
+    def decorator(func):
+        app.route(f"/api/rooms/<room_id>{rule}", **options)(func)
+        app.route(f"/api{rule}", defaults={"room_id": DEFAULT_ROOM},
+                  endpoint=f"legacy_{func.__name__}", **options)(func)
+        return func
+    return decorator
+
+
+def load_room(room_id):
+    # The default room always exists so legacy clients never see a 404
+    if room_id == DEFAULT_ROOM:
+        room = registry.get_or_create(room_id)
+    else:
+        room = registry.get(room_id)
+    room.touch()
+    return room
+
+
+def settle(room):
+    """After a mutation: wake waiters and queue a just-finished match for the history.
+
+    Caller must hold the room lock.
+    """
+    room.notify()
+    game = room.take_finished()
+    if game:
+        history.submit(match_record(game, room.room_id))
+        matchmaker.report(room, game)
+    bot_scheduler.poke(room)
+
+
+# Plays bot seats in the background; settle() wakes it after every change
+bot_scheduler = BotScheduler(after_move=settle, pacing=BOT_PACING)
+# Seats queued players and runs brackets; its tables are ordinary rooms
+matchmaker = Matchmaker(registry, on_start=bot_scheduler.poke, table_size=TABLE_SIZE,
+                        backfill_after=BACKFILL_AFTER, metrics=REGISTRY)
+
+
+def wants_compact():
+    """Compact wire format is opt-in: ?format=compact, or Accept naming COMPACT_MIME."""
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt == 'compact'
+    return any(mime == COMPACT_MIME for mime, _ in request.accept_mimetypes)
+
+
+def state_etag(room, game, player_name, since_version=None, compact=False):
+    """Validator for one viewer's /state reply; computed without building the state."""
+    viewer = zlib.crc32(player_name.encode()) if player_name else 0
+    delta = "full" if since_version is None else since_version
+    fmt = "c" if compact else "j"
+    return f"{room.generation}.{game.view_version(player_name)}.{viewer:x}.{delta}.{fmt}"
+
+
+def action_error(action):
+    """Why an /action or /batch entry is malformed, or None. Names and modes must be
+    strings: they end up in events, logs and dict lookups."""
+    for key in ('target', 'mode', 'item', 'steal_item'):
+        value = action.get(key)
+        if value is not None and not isinstance(value, str):
+            return f"{key} must be a string"
+    return None
+
+
+def viewer_state(game, player_name, since_version=None, compact=False):
+    # State filtered for this player, optionally as a delta since a version
+    if compact:
+        return compact_state(game, player_name, since_version)
+    state = game.get_state(requesting_player=player_name, since_version=since_version)
+
+    state["turn_player"] = game.current()
+    state["is_my_turn"] = (game.current() == player_name)
+    return state
+
+
+@app.errorhandler(RoomError)
+def handle_room_error(err):
+    return jsonify({"error": err.message}), err.status
+
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/api/join', methods=['POST'])
-def join_lobby():
-    global lobby, game_started
-    if game_started:
-        return jsonify({"error": "Game already in progress"}), 400
-    
+@app.route('/api/rooms', methods=['GET'])
+def list_rooms():
+    return jsonify({"rooms": [room.summary() for room in registry.rooms()]})
+
+@app.route('/api/rooms', methods=['POST'])
+def create_room():
+    data = request.get_json(silent=True) or {}
+    room = registry.create(data.get('room'))
+    return jsonify({"status": "created", "room": room.room_id}), 201
+
+@app.route('/api/rooms/<room_id>', methods=['DELETE'])
+def delete_room(room_id):
+    if not registry.remove(room_id):
+        return jsonify({"error": f"Room {room_id} not found"}), 404
+    return jsonify({"status": "deleted", "room": room_id})
+
+@room_route('/join', methods=['POST'])
+def join_lobby(room_id):
+    room = load_room(room_id)
     data = request.json
     name = data.get('name')
-    if not name:
-        return jsonify({"error": "Name required"}), 400
-    
-    if len(lobby) >= 8:
-        return jsonify({"error": "Lobby full (max 8)"}), 400
-        
-    if name in lobby:
-        # Check if rejoining? Just return success
-        return jsonify({"message": "Joined", "name": name, "lobby": lobby}) 
-        
-    lobby.append(name)
-    return jsonify({"message": "Joined", "name": name, "lobby": lobby})
-
-@app.route('/api/lobby')
-def get_lobby():
-    return jsonify({"lobby": lobby, "started": game_started})
-
-@app.route('/api/start', methods=['POST'])
-def start_game():
-    global game, game_started, lobby
-    if len(lobby) < 2:
-        return jsonify({"error": "Need at least 2 players"}), 400
-        
-    game = CasinoGameEngine(lobby)
-    game_started = True
-    return jsonify({"status": "started", "message": "Game initialized"})
-
-@app.route('/api/reset', methods=['POST'])
-def reset_game():
-    global game, game_started, lobby
-    game = None
-    game_started = False
-    lobby = []
-    # Could imply we want to restart completely.
-    return jsonify({"status": "reset"})
-
-@app.route('/api/next_round', methods=['POST'])
-def next_round():
-    global game
-    if not game:
-        return jsonify({"error": "No game"}), 404
-    
-    success = game.start_next_round()
-    if success:
-         return jsonify({"status": "next_round", "round": game.round_num})
-    else:
-         return jsonify({"status": "game_over", "winner": game.alive[0] if game.alive else "Nobody"})
-
-@app.route('/api/state')
-def get_state():
-    global game
-    if not game:
-        if game_started: # Should imply game exists, but maybe just started
-             return jsonify({"error": "Game loading..."}), 202
-        return jsonify({"error": "No game running"}), 404
-    
+    # "bot": true or a kind from BOT_KINDS makes this a server-played seat, "bot": false a human
+    # one; without it, names containing "Auto"/"Bot" are bots (see Room.join)
+    bot = data.get('bot')
+    if bot is True:
+        bot = DEFAULT_BOT_KIND
+    elif bot is not None and not bot:
+        bot = False
+    if bot and bot not in BOT_KINDS:
+        return jsonify({"error": f"Unknown bot kind {bot}; pick one of {', '.join(BOT_KINDS)}"}), 400
+    with room.lock:
+        room.join(name, bot=bot)
+        return jsonify({"message": "Joined", "name": name, "lobby": room.lobby, "room": room.room_id})
+
+@room_route('/lobby')
+def get_lobby(room_id):
+    room = load_room(room_id)
+    with room.lock:
+        return jsonify({"lobby": room.lobby, "bots": sorted(room.bots), "started": room.game_started,
+                        "room": room.room_id})
+
+@room_route('/start', methods=['POST'])
+def start_game(room_id):
+    room = load_room(room_id)
+    with room.lock:
+        room.start()
+        bot_scheduler.poke(room)
+    return jsonify({"status": "started", "message": "Game initialized", "room": room.room_id})
+
+@room_route('/reset', methods=['POST'])
+def reset_game(room_id):
+    room = load_room(room_id)
+    with room.lock:
+        room.reset()
+    return jsonify({"status": "reset", "room": room.room_id})
+
+@room_route('/next_round', methods=['POST'])
+def next_round(room_id):
+    room = load_room(room_id)
+    with room.lock:
+        game = room.game
+        if not game:
+            return jsonify({"error": "No game"}), 404
+
+        success = game.start_next_round()
+        settle(room)
+        if success:
+             return jsonify({"status": "next_round", "round": game.round_num})
+        else:
+             return jsonify({"status": "game_over", "winner": game.alive[0] if game.alive else "Nobody"})
+
+@room_route('/state')
+def get_state(room_id):
+    room = load_room(room_id)
     player_name = request.args.get('player') # For private logs
-    
-    # State filtered for this player
-    state = game.get_state(requesting_player=player_name)
-    
-    state["turn_player"] = game.current()
-    state["is_my_turn"] = (game.current() == player_name)
-    
-    return jsonify(state)
-
-@app.route('/api/action', methods=['POST'])
-def perform_action():
-    global game
-    if not game:
-        return jsonify({"error": "No game running"}), 404
-    
-    data = request.json
+    since_version = request.args.get('since_version', type=int)
+    compact = wants_compact()
+
+    with room.lock:
+        game = room.game
+        if not game:
+            if room.game_started: # Should imply game exists, but maybe just started
+                 return jsonify({"error": "Game loading..."}), 202
+            return jsonify({"error": "No game running"}), 404
+
+        # Unchanged view: answer 304 without building or encoding the state
+        etag = state_etag(room, game, player_name, since_version, compact)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = jsonify(viewer_state(game, player_name, since_version, compact))
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept")
+    return response
+
+@room_route('/events')
+def stream_events(room_id):
+    """Long-poll: blocks until there are events newer than `since`.
+
+    Clients pass the last event id they saw and get back only the new
+    events plus fresh state. An empty reply means the wait timed out.
+    """
+    room = load_room(room_id)
+    player_name = request.args.get('player')
+    since = request.args.get('since', type=int)
+    since_version = request.args.get('since_version', type=int)
+    timeout = min(request.args.get('timeout', STREAM_TIMEOUT, type=float), STREAM_TIMEOUT)
+
+    with room.lock:
+        events, resync = room.wait_for_events(since, timeout=timeout)
+        room.touch()
+        game = room.game
+        if not game:
+            return jsonify({"error": "No game running", "resync": resync}), 404
+
+        payload = {
+            "events": events,
+            "last_event_id": game.latest_event_id(),
+            "resync": resync,
+        }
+        if events or resync:
+            payload["state"] = viewer_state(game, player_name, None if resync else since_version,
+                                            wants_compact())
+
+    return jsonify(payload)
+
+@room_route('/action', methods=['POST'])
+def perform_action(room_id):
+    room = load_room(room_id)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    error = action_error(data)
+    if error:
+        return jsonify({"error": error}), 400
     action_type = data.get('type')
-    
-    player = game.current()
-    if not player:
-        return jsonify({"status": "game_over"}), 400
-
-    if action_type == 'draw':
-        target = data.get('target')
-        mode = data.get('mode', 'safe')
-        game.run_draw(target, mode)
-    
-    elif action_type == 'use':
-        item = data.get('item')
-        target = data.get('target')
-        item_to_steal = data.get('steal_item')
-        game.run_use(item, target, item_to_steal)
-
-    return jsonify({"status": "success", "state": game.get_state()})
-
-@app.route('/api/ai', methods=['POST'])
-def trigger_ai():
-    global game
-    if not game: return jsonify({"error": "No game"}), 404
-    
-    current = game.current()
-    # Simple check if current player name contains "Auto" or "Bot"
-    if "Auto" in current or "Bot" in current:
-        game.ai_turn(current)
-        return jsonify({"status": "ai_moved"})
-    
+
+    with room.lock:
+        game = room.game
+        if not game:
+            return jsonify({"error": "No game running"}), 404
+
+        player = game.current()
+        if not player:
+            return jsonify({"status": "game_over"}), 400
+
+        if action_type == 'draw':
+            target = data.get('target')
+            mode = data.get('mode', 'safe')
+            game.run_draw(target, mode)
+
+        elif action_type == 'use':
+            item = data.get('item')
+            target = data.get('target')
+            item_to_steal = data.get('steal_item')
+            game.run_use(item, target, item_to_steal)
+
+        settle(room)
+        state = compact_state(game) if wants_compact() else game.get_state()
+
+    return jsonify({"status": "success", "state": state})
+
+@room_route('/batch', methods=['POST'])
+def perform_batch(room_id):
+    """Several use/draw actions applied atomically, e.g. Lens, Knife, then a draw.
+
+    Body: {"actions": [...], "player": name, "since_version": n}. `player`
+    (optional) must hold the turn or nothing is applied. Stops at the first
+    rejected or turn-ending action and returns per-step results plus one state.
+    """
+    room = load_room(room_id)
+    data = request.get_json(silent=True) or {}
+    actions = data.get('actions')
+    player_name = data.get('player')
+    if (not isinstance(actions, list) or not actions
+            or not all(isinstance(a, dict) and a.get('type') in ('draw', 'use') for a in actions)):
+        return jsonify({"error": "actions must be a non-empty list of draw/use actions"}), 400
+    if len(actions) > MAX_BATCH_ACTIONS:
+        return jsonify({"error": f"At most {MAX_BATCH_ACTIONS} actions per batch"}), 400
+    for index, action in enumerate(actions):
+        error = action_error(action)
+        if error:
+            return jsonify({"error": f"actions[{index}]: {error}"}), 400
+    since_version = data.get('since_version')
+    if since_version is not None:
+        try:
+            since_version = int(since_version)
+        except (TypeError, ValueError):
+            return jsonify({"error": "since_version must be an integer"}), 400
+
+    with room.lock:
+        game = room.game
+        if not game:
+            return jsonify({"error": "No game running"}), 404
+
+        current = game.current()
+        if not current or game.is_round_over():
+            return jsonify({"status": "game_over" if game.is_game_over() else "round_over"}), 400
+        if player_name and player_name != current:
+            return jsonify({"error": f"It is {current}'s turn", "turn_player": current}), 409
+
+        steps = game.perform_batch(actions)
+        settle(room)
+        state = viewer_state(game, player_name, since_version, wants_compact())
+
+    applied = sum(step["ok"] for step in steps)
+    status = "success" if applied == len(actions) else "partial"
+    return jsonify({"status": status, "applied": applied, "steps": steps, "state": state})
+
+@room_route('/journal')
+def get_journal(room_id):
+    """Seed + action journal: enough to replay this match exactly (see replay.py)."""
+    room = load_room(room_id)
+    with room.lock:
+        if not room.game:
+            return jsonify({"error": "No game running"}), 404
+        return jsonify(export_match(room.game))
+
+@room_route('/ai', methods=['POST'])
+def trigger_ai(room_id):
+    room = load_room(room_id)
+    with room.lock:
+        game = room.game
+        if not game: return jsonify({"error": "No game"}), 404
+
+        current = game.current()
+        # Manual trigger kept for old clients; bot seats normally move on their own
+        if current and room.is_bot(current):
+            game.ai_turn(current)
+            settle(room)
+            return jsonify({"status": "ai_moved"})
+
     return jsonify({"status": "waiting_for_human"})
 
+@app.route('/api/queue', methods=['GET'])
+def get_queue():
+    return jsonify(matchmaker.stats())
+
+@app.route('/api/queue', methods=['POST'])
+def join_queue():
+    data = request.get_json(silent=True) or {}
+    return jsonify(matchmaker.enqueue(data.get('name')))
+
+@app.route('/api/queue/<name>', methods=['GET'])
+def get_queue_status(name):
+    """Where `name` is: queued (with position and wait) or seated (with the room to play in)."""
+    status = matchmaker.status(name)
+    if status is None:
+        return jsonify({"error": f"{name} is not queued or seated"}), 404
+    return jsonify(status)
+
+@app.route('/api/queue/<name>', methods=['DELETE'])
+def leave_queue(name):
+    if not matchmaker.leave(name):
+        return jsonify({"error": f"{name} is not queued"}), 404
+    return jsonify({"status": "left", "name": name})
+
+@app.route('/api/tournaments', methods=['GET'])
+def list_tournaments():
+    return jsonify({"tournaments": matchmaker.tournaments()})
+
+@app.route('/api/tournaments', methods=['POST'])
+def create_tournament():
+    """Body: {"players": [...], "bots": [...], "table_size": n}. Stage 1 tables start right away."""
+    data = request.get_json(silent=True) or {}
+    tournament = matchmaker.create_tournament(data.get('players') or [], data.get('bots') or [],
+                                              data.get('table_size'))
+    return jsonify(tournament), 201
+
+@app.route('/api/tournaments/<tournament_id>')
+def get_tournament(tournament_id):
+    return jsonify(matchmaker.tournament(tournament_id))
+
+@app.route('/api/wire')
+def get_wire_schema():
+    """Code tables and key legend for the compact state format."""
+    return jsonify(WIRE_SCHEMA)
+
+@app.route('/api/metrics')
+def get_metrics():
+    """Prometheus text exposition; all formatting happens here, at scrape time."""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/leaderboard')
+def get_leaderboard():
+    stat = request.args.get('stat', 'wins')
+    limit = request.args.get('limit', 10, type=int)
+    try:
+        players = history.leaderboard(stat, limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"stat": stat, "players": players})
+
+@app.route('/api/leaderboard/classes')
+def get_class_leaderboard():
+    return jsonify({"classes": history.class_win_rates()})
+
+@app.route('/api/players/<name>')
+def get_player_history(name):
+    """Lifetime totals plus newest-first matches; page with ?before=<last match_id>."""
+    totals = history.player(name)
+    if totals is None:
+        return jsonify({"error": f"No recorded matches for {name}"}), 404
+    limit = request.args.get('limit', 20, type=int)
+    before = request.args.get('before', type=int)
+    return jsonify({"player": totals, "matches": history.player_history(name, limit, before)})
+
+@app.route('/api/matches/<int:match_id>')
+def get_match(match_id):
+    match = history.match(match_id)
+    if match is None:
+        return jsonify({"error": f"Match {match_id} not found"}), 404
+    return jsonify(match)
+
 if __name__ == '__main__':
-    # Host 0.0.0.0 for LAN access
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Host 0.0.0.0 for LAN access. threaded=True lets rooms progress in parallel.
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
@@ -0,0 +1,282 @@
+import argparse
+import math
+import random
+
+import numpy as np
+
+from game_engine import (
+    CLASS_SNIPER,
+    CLASS_TANK,
+    MOD_DOUBLE_TROUBLE,
+    MOD_VAMPIRISM,
+    MODE_RISK,
+    MODE_SAFE,
+    PLAYER_CLASSES,
+    CasinoGameEngine,
+)
+
+# =========================
+# VECTORIZED DUEL CORE
+# =========================
+# Thousands of independent two-player rounds advance together as arrays.
+# Only the shell/damage core is modelled: deck draws, 1/3 damage, the 60%
+# risk backfire, Sniper crits, blackouts, Sudden Death, Double Trouble and
+# Vampirism. Items are not modelled, so results match the object engine
+# when both sides play draw-only policies (see cross_check).
+
+BLANK, LIVE, MAGIC, EMPTY = 0, 1, 2, -1
+MAX_SHELLS = 8
+
+# Policy actions
+SAFE_OPP, SAFE_SELF, RISK = 0, 1, 2
+
+MAX_STEPS = 10000
+
+
+class DuelView:
+    """What a policy sees: arrays (or scalars) from the shooter's point of view."""
+
+    def __init__(self, live_left, blank_left, hp_self, hp_opp):
+        self.live_left = live_left
+        self.blank_left = blank_left
+        self.hp_self = hp_self
+        self.hp_opp = hp_opp
+
+
+# Policies work element-wise, so the same function drives the batch engine
+# (array views) and the object engine (scalar views).
+def policy_safe(view):
+    """Always a safe shot at the opponent."""
+    return np.zeros_like(view.live_left)
+
+
+def policy_greedy(view):
+    """Shoot yourself when a blank is more likely, otherwise the opponent."""
+    return np.where(view.blank_left > view.live_left, SAFE_SELF, SAFE_OPP)
+
+
+def policy_risky(view):
+    """Risk shots while lives are likely, free turns off blanks otherwise."""
+    return np.where(view.live_left > view.blank_left, RISK, SAFE_SELF)
+
+
+POLICIES = {
+    "safe": policy_safe,
+    "greedy": policy_greedy,
+    "risky": policy_risky,
+}
+
+
+def _new_decks(rng, n, round_num):
+    """n shuffled decks as an (n, MAX_SHELLS) int array padded with EMPTY."""
+    total = rng.integers(4, MAX_SHELLS + 1, size=n)
+    live = rng.integers(1, total)  # 1 .. total-1
+    pos = np.arange(MAX_SHELLS)
+    decks = np.where(pos < live[:, None], LIVE, BLANK)
+    decks = np.where(pos < total[:, None], decks, EMPTY)
+    if round_num == 3:
+        decks[:, 0] = MAGIC
+    keys = rng.random((n, MAX_SHELLS))
+    keys[pos >= total[:, None]] = np.inf
+    order = np.argsort(keys, axis=1)
+    return np.take_along_axis(decks, order, axis=1), total, live
+
+
+def _init_health(rng, n, classes, round_num):
+    if round_num == 1:
+        base = np.full((n, 2), 4)
+    else:
+        base = rng.integers(4, 9, size=(n, 2))
+    bonus = np.array([2 if c == CLASS_TANK else 0 for c in classes])
+    return base + bonus
+
+
+def simulate_rounds(n, classes, modifier=None, round_num=1, policies=(policy_greedy, policy_greedy), seed=0):
+    """Play `n` independent duel rounds; returns a bool array "seat 0 won".
+
+    State is kept as flat per-game columns holding only unfinished games;
+    finished ones are compacted away, so every step is plain element-wise
+    work over the live set.
+    """
+    rng = np.random.default_rng(seed)
+    seat0_won = np.zeros(n, dtype=bool)
+    ids = np.arange(n)
+
+    hp = _init_health(rng, n, classes, round_num)
+    hp0, hp1 = hp[:, 0].copy(), hp[:, 1].copy()
+    max0, max1 = hp0.copy(), hp1.copy()
+    sniper0, sniper1 = (c == CLASS_SNIPER for c in classes)
+    deck, size, live_left = _new_decks(rng, n, round_num)
+    blank_left = size - live_left
+    ptr = np.zeros(n, dtype=np.int64)
+    turn = np.zeros(n, dtype=np.int64)
+    blackout_for = np.full(n, -1)
+    dmg_mult = 2 if modifier == MOD_DOUBLE_TROUBLE else 1
+    same_policy = policies[0] is policies[1]
+
+    for _ in range(MAX_STEPS):
+        m = ids.size
+        if m == 0:
+            break
+        rows = np.arange(m)
+        seat0 = turn == 0
+        hp_self = np.where(seat0, hp0, hp1)
+        hp_opp = np.where(seat0, hp1, hp0)
+
+        # Policies decide before an empty chamber is reloaded, like the engine
+        view = DuelView(live_left, blank_left, hp_self, hp_opp)
+        action = policies[0](view)
+        if not same_policy:
+            action = np.where(seat0, action, policies[1](view))
+
+        blackout = blackout_for == turn
+        blackout_for[blackout] = -1
+
+        empty = ptr >= size
+        if empty.any():
+            deck[empty], size[empty], live_left[empty] = _new_decks(rng, int(empty.sum()), round_num)
+            blank_left[empty] = size[empty] - live_left[empty]
+            ptr[empty] = 0
+
+        card = deck[rows, ptr]
+        ptr += 1
+        is_live = card != BLANK
+        live_left -= is_live
+        blank_left -= ~is_live
+
+        risk = action == RISK
+        backfire = risk & ~blackout & (rng.random(m) < 0.60)
+        at_self = ((action == SAFE_SELF) & ~blackout) | backfire
+        # Target seat: the shooter when aimed at self, the other seat otherwise
+        target0 = at_self == seat0
+
+        is_sniper = np.where(seat0, sniper0, sniper1)
+        crit = is_sniper & (rng.random(m) < 0.10)
+        dmg = np.where(risk, 3, 1) + crit
+        # Like the engine, a blackout Risk Shot deals plain risk damage even with Sudden Death
+        instant = (card == MAGIC) & ~(risk & blackout)
+        dmg = np.where(instant, 999, dmg) * dmg_mult
+        dmg = np.where(is_live, dmg, 0)
+
+        hp0 -= np.where(target0, dmg, 0)
+        hp1 -= np.where(target0, 0, dmg)
+
+        if modifier == MOD_VAMPIRISM:
+            drain = is_live & ~at_self
+            hp0 += drain & seat0 & (hp0 < max0)
+            hp1 += drain & ~seat0 & (hp1 < max1)
+
+        killed = is_live & (np.where(target0, hp0, hp1) <= 0)
+
+        # Turn passes on any risk shot, on a live safe shot, and on a blank aimed at the opponent
+        keep = ~risk & ~is_live & at_self
+        passes = ~keep & ~killed
+        turn = np.where(passes, 1 - turn, turn)
+
+        # Blackout is only rolled after a live safe shot or a risk shot
+        roll = passes & (risk | is_live) & (rng.random(m) < 0.25)
+        blackout_for = np.where(roll, turn, blackout_for)
+
+        if killed.any():
+            seat0_won[ids[killed]] = ~target0[killed]
+            alive = ~killed
+            ids, hp0, hp1, max0, max1 = ids[alive], hp0[alive], hp1[alive], max0[alive], max1[alive]
+            deck, size, live_left, blank_left = deck[alive], size[alive], live_left[alive], blank_left[alive]
+            ptr, turn, blackout_for = ptr[alive], turn[alive], blackout_for[alive]
+    else:
+        raise RuntimeError(f"Rounds still running after {MAX_STEPS} steps")
+
+    return seat0_won
+
+
+def win_probability(class_a, class_b, modifier=None, round_num=1, n=100000, policy="greedy", seed=0):
+    """P(seat 0 with `class_a` wins a duel round against `class_b`) and its standard error."""
+    fn = POLICIES[policy]
+    wins = simulate_rounds(n, (class_a, class_b), modifier, round_num, (fn, fn), seed)
+    p = wins.mean()
+    return float(p), math.sqrt(p * (1 - p) / n)
+
+
+# =========================
+# CROSS-CHECK AGAINST THE OBJECT ENGINE
+# =========================
+class EngineDrawPolicy:
+    """Runs a batch policy against CasinoGameEngine, drawing only."""
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __call__(self, game, player):
+        opponent = next(p for p in game.alive if p != player)
+        view = DuelView(game.deck.live, game.deck.blank, game.health[player], game.health[opponent])
+        action = int(self.fn(view))
+        if action == RISK:
+            return {"type": "draw", "target": opponent, "mode": MODE_RISK}
+        target = player if action == SAFE_SELF else opponent
+        return {"type": "draw", "target": target, "mode": MODE_SAFE}
+
+
+def engine_round(class_a, class_b, modifier, round_num, policy):
+    """One duel round on the object engine; True if seat 0 won."""
+    players = ["A", "B"]
+    game = CasinoGameEngine(players, headless=True)
+    game.player_classes = {"A": class_a, "B": class_b}
+    if round_num == 1:
+        game._init_health()
+    else:
+        game.round_num = round_num - 1
+        game.start_next_round()
+    game.current_modifier = modifier
+
+    while not game.is_round_over():
+        player = game.current()
+        game.perform(policy(game, player))
+    winner = game.round_winner or game.alive[0]
+    return winner == "A"
+
+
+def cross_check(class_a, class_b, modifier=None, round_num=1, policy="greedy",
+                n_engine=5000, n_batch=200000, seed=0):
+    """Compare batch and object-engine win rates; |z| < 3 means they agree."""
+    fn = POLICIES[policy]
+    random.seed(seed)
+    engine_policy = EngineDrawPolicy(fn)
+    engine_wins = sum(engine_round(class_a, class_b, modifier, round_num, engine_policy) for _ in range(n_engine))
+    p_engine = engine_wins / n_engine
+    se_engine = math.sqrt(p_engine * (1 - p_engine) / n_engine)
+
+    p_batch, se_batch = win_probability(class_a, class_b, modifier, round_num, n_batch, policy, seed)
+    z = (p_engine - p_batch) / math.sqrt(se_engine ** 2 + se_batch ** 2 or 1e-12)
+    return {
+        "engine": p_engine,
+        "batch": p_batch,
+        "z": z,
+        "consistent": abs(z) < 3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized duel simulator")
+    parser.add_argument("class_a", choices=PLAYER_CLASSES)
+    parser.add_argument("class_b", choices=PLAYER_CLASSES)
+    parser.add_argument("--modifier", choices=[MOD_DOUBLE_TROUBLE, MOD_VAMPIRISM], default=None)
+    parser.add_argument("--round", type=int, default=1, choices=[1, 2, 3])
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="greedy")
+    parser.add_argument("-n", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cross-check", action="store_true", help="Also compare against CasinoGameEngine")
+    args = parser.parse_args()
+
+    if args.cross_check:
+        result = cross_check(args.class_a, args.class_b, args.modifier, args.round, args.policy,
+                             n_batch=args.n, seed=args.seed)
+        print(f"engine {result['engine']:.4f} | batch {result['batch']:.4f} | z={result['z']:+.2f} "
+              f"{'OK' if result['consistent'] else 'MISMATCH'}")
+        return
+
+    p, se = win_probability(args.class_a, args.class_b, args.modifier, args.round, args.n, args.policy, args.seed)
+    print(f"P({args.class_a} beats {args.class_b}) = {p:.4f} ± {1.96 * se:.4f}")
+
+
+if __name__ == "__main__":
+    main()
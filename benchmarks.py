@@ -0,0 +1,344 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from bots import RandomBot
+from game_engine import (
+    ALL_ITEMS,
+    ITEM_DIAMOND,
+    ITEM_HEAL,
+    ITEM_LENS,
+    ITEM_SKIP,
+    ITEM_STEAL,
+    MODE_RISK,
+    MODE_SAFE,
+    CasinoGameEngine,
+)
+from simulation import play_match
+
+# =========================
+# BENCHMARK SUITE
+# =========================
+# Fixed-seed timings of the engine hot paths and the HTTP layer. Every case
+# builds its fixtures first and only times the operation itself; results are
+# written as JSON so two runs (e.g. two commits) can be compared with
+# --compare.
+
+RESULTS_FORMAT = 1
+DEFAULT_SEED = 1234
+DEFAULT_REPEATS = 5
+
+
+def _players(n):
+    return [f"Player{i + 1}" for i in range(n)]
+
+
+def _time_ops(fixtures, op):
+    """Seconds per op, applying `op` once to every fixture."""
+    start = time.perf_counter()
+    for fixture in fixtures:
+        op(fixture)
+    return (time.perf_counter() - start) / len(fixtures)
+
+
+def _measure(make_fixtures, op, repeats):
+    """Sorted per-op seconds over `repeats` runs, each on fresh fixtures."""
+    return sorted(_time_ops(make_fixtures(), op) for _ in range(repeats))
+
+
+def _result(name, samples, n, unit="us/op", scale=1e6, **params):
+    return {
+        "name": name,
+        "unit": unit,
+        "value": samples[0] * scale,                   # best of the repeats
+        "median": samples[len(samples) // 2] * scale,
+        "n": n,
+        "params": params,
+    }
+
+
+# ---------- engine fixtures ----------
+
+def _fresh_games(n_players, n, seed):
+    """`n` games right after construction, each with its own fixed seed."""
+    return [CasinoGameEngine(_players(n_players), seed=seed + i) for i in range(n)]
+
+
+def _with_item(game, item):
+    """Arrange for the current player to be able to use `item` meaningfully."""
+    player = game.current()
+    opponent = next(p for p in game.alive if p != player)
+    game.blocked[player] = False
+    game.items[player].append(item)
+    if item == ITEM_HEAL:
+        game.health[player] = game.player_max_health[player] - 1
+    if item == ITEM_STEAL and not game.items[opponent]:
+        game.items[opponent].append(ITEM_LENS)
+    if item in (ITEM_STEAL, ITEM_SKIP):
+        return opponent
+    if item == ITEM_DIAMOND:
+        return ITEM_LENS
+    return None
+
+
+def _played_to(n_players, seed, fraction):
+    """A normal-mode game advanced `fraction` of the way through a full match.
+
+    The match length comes from a headless run on the same seeds, so the
+    stage is the same on every machine.
+    """
+    total = play_match(_players(n_players), RandomBot(seed), headless=True, seed=seed)["actions"]
+    game = CasinoGameEngine(_players(n_players), seed=seed)
+    bot = RandomBot(seed)
+    for _ in range(int(total * fraction)):
+        if game.is_game_over():
+            break
+        if game.is_round_over():
+            game.start_next_round()
+            continue
+        game.perform(bot(game, game.current()))
+    return game
+
+
+def bench_draw(n, repeats, seed):
+    out = []
+    for mode in (MODE_SAFE, MODE_RISK):
+        def op(game):
+            player = game.current()
+            game.run_draw(next(p for p in game.alive if p != player), mode)
+        samples = _measure(lambda: _fresh_games(4, n, seed), op, repeats)
+        out.append(_result(f"run_draw[{mode}]", samples, n, players=4, mode=mode))
+    return out
+
+
+def bench_use(n, repeats, seed):
+    out = []
+    for item in ALL_ITEMS + [ITEM_DIAMOND]:
+        def make():
+            games = _fresh_games(4, n, seed)
+            return [(g, _with_item(g, item)) for g in games]
+
+        def op(fixture):
+            game, target = fixture
+            game.run_use(item, target)
+        samples = _measure(make, op, repeats)
+        out.append(_result(f"run_use[{item}]", samples, n, players=4, item=item))
+    return out
+
+
+STAGES = {"early": 0.0, "mid": 0.5, "late": 1.0}
+
+
+def bench_get_state(n, repeats, seed):
+    out = []
+    for n_players in (2, 8):
+        for stage, fraction in STAGES.items():
+            game = _played_to(n_players, seed, fraction)
+            viewer = game.original_players[0]
+            fixtures = [game] * n
+            samples = _measure(lambda: fixtures, lambda g: g.get_state(requesting_player=viewer), repeats)
+            out.append(_result(f"get_state[{n_players}p,{stage}]", samples, n, players=n_players, stage=stage,
+                               log_lines=game.log_store.sizes()["public"], events=len(game.events)))
+    return out
+
+
+def bench_wire(n, repeats, seed):
+    """Build + json.dumps of the default state vs the compact wire format."""
+    from wire import compact_state
+
+    out = []
+    for stage in ("early", "mid"):
+        game = _played_to(8, seed, STAGES[stage])
+        viewer = game.original_players[0]
+        fixtures = [game] * n
+        encoders = {
+            "json": lambda g: json.dumps(g.get_state(requesting_player=viewer)),
+            "compact": lambda g: json.dumps(compact_state(g, viewer), separators=(",", ":")),
+        }
+        for fmt, encode in encoders.items():
+            samples = _measure(lambda: fixtures, encode, repeats)
+            out.append(_result(f"wire[8p,{stage},{fmt}]", samples, n, players=8, stage=stage, format=fmt,
+                               bytes=len(encode(game).encode())))
+    return out
+
+
+def bench_mcts(n, repeats, seed):
+    """IS-MCTS playouts (determinize, tree walk, playout to the end of the round), in-process."""
+    from mcts import search, viewer_info
+
+    out = []
+    for n_players in (4, 8):
+        game = _played_to(n_players, seed, STAGES["mid"])
+        if game.is_round_over():
+            game.start_next_round()
+        player = game.current()
+        blob = game.snapshot().to_bytes()
+        known, bounty = viewer_info(game, player)
+        samples = sorted(_time_ops([None], lambda _: search(blob, player, known, bounty, iterations=n, seed=seed)) / n
+                         for _ in range(repeats))
+        out.append(_result(f"mcts_playout[{n_players}p]", samples, n, unit="us/playout", players=n_players))
+    return out
+
+
+def bench_full_game(n, repeats, seed):
+    out = []
+    for headless in (True, False):
+        def run(_):
+            for i in range(n):
+                play_match(_players(4), RandomBot(seed + i), headless=headless, seed=seed + i)
+        samples = sorted(_time_ops([None], run) / n for _ in range(repeats))
+        label = "headless" if headless else "normal"
+        out.append(_result(f"full_game[{label}]", samples, n, unit="ms/game", scale=1e3,
+                           players=4, headless=headless))
+    return out
+
+
+# ---------- HTTP fixtures ----------
+
+def _http_client(tmpdir):
+    import app as app_module
+    from history import MatchHistory
+
+    # Keep the benchmark's finished matches out of the real history file
+    app_module.history = MatchHistory(os.path.join(tmpdir, "history.db"))
+    return app_module, app_module.app.test_client()
+
+
+def _start_room(client, room, n_players):
+    client.delete(f"/api/rooms/{room}")
+    client.post("/api/rooms", json={"room": room})
+    for name in _players(n_players):
+        client.post(f"/api/rooms/{room}/join", json={"name": name})
+    client.post(f"/api/rooms/{room}/start")
+
+
+def bench_http(n, repeats, seed):
+    out = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app_module, client = _http_client(tmpdir)
+        for n_players in (2, 8):
+            room = f"bench{n_players}"
+            random.seed(seed)
+            _start_room(client, room, n_players)
+            url = f"/api/rooms/{room}/state?player=Player1"
+            samples = sorted(_time_ops(range(n), lambda _: client.get(url)) for _ in range(repeats))
+            out.append(_result(f"http_state[{n_players}p]", samples, n, players=n_players))
+
+        def action_run():
+            # RandomBot moves; round changes and restarts happen outside the timing
+            bot = RandomBot(seed)
+            random.seed(seed)
+            _start_room(client, "bench_action", 4)
+            room = app_module.registry.get("bench_action")
+            elapsed = 0.0
+            for _ in range(n):
+                game = room.game
+                if game.is_game_over():
+                    _start_room(client, "bench_action", 4)
+                    room = app_module.registry.get("bench_action")
+                    game = room.game
+                elif game.is_round_over():
+                    client.post("/api/rooms/bench_action/next_round")
+                action = bot(game, game.current())
+                start = time.perf_counter()
+                client.post("/api/rooms/bench_action/action", json=action)
+                elapsed += time.perf_counter() - start
+            return elapsed / n
+
+        samples = sorted(action_run() for _ in range(repeats))
+        out.append(_result("http_action[4p]", samples, n, players=4))
+        app_module.history.close()
+    return out
+
+
+# name -> (function, default n per repeat)
+SUITES = {
+    "draw": (bench_draw, 2000),
+    "use": (bench_use, 1000),
+    "get_state": (bench_get_state, 2000),
+    "wire": (bench_wire, 2000),
+    "mcts": (bench_mcts, 300),
+    "full_game": (bench_full_game, 200),
+    "http": (bench_http, 1000),
+}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+    }
+
+
+def run_suite(names=None, repeats=DEFAULT_REPEATS, seed=DEFAULT_SEED, scale=1.0, on_result=None):
+    results = []
+    for name in names or SUITES:
+        fn, n = SUITES[name]
+        for result in fn(max(1, int(n * scale)), repeats, seed):
+            result["suite"] = name
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return {"format": RESULTS_FORMAT, "seed": seed, "repeats": repeats,
+            "environment": environment(), "results": results}
+
+
+def compare(old, new, threshold=0.10):
+    """(name, old, new, ratio, flag) rows; flag marks changes beyond `threshold`."""
+    before = {r["name"]: r for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        prev = before.get(r["name"])
+        if prev is None or prev["unit"] != r["unit"]:
+            continue
+        ratio = r["value"] / prev["value"] if prev["value"] else float("inf")
+        flag = "SLOWER" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else ""
+        rows.append((r["name"], prev["value"], r["value"], ratio, flag))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark engine hot paths and HTTP endpoints")
+    parser.add_argument("suites", nargs="*", help="Suites to run: " + ", ".join(SUITES) + " (default: all)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every suite's op count")
+    parser.add_argument("--out", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Results JSON from an earlier run to compare against")
+    args = parser.parse_args()
+    unknown = [name for name in args.suites if name not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+
+    def show(r):
+        print(f"{r['name']:36s} {r['value']:10.2f} {r['unit']:8s} (median {r['median']:.2f})", flush=True)
+
+    report = run_suite(args.suites or None, args.repeats, args.seed, args.scale, on_result=show)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print(f"\nvs {args.compare} ({old['environment'].get('commit')}):")
+        for name, before, after, ratio, flag in compare(old, report):
+            print(f"{name:36s} {before:10.2f} -> {after:10.2f}  x{ratio:5.2f} {flag}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import solver
+from bots import ExpectimaxBot, RandomBot
+from mcts import MCTSBot
+
+# =========================
+# BOT SCHEDULER
+# =========================
+# Plays bot seats server-side. Rooms poke the scheduler after every change;
+# when the player to move is a bot, one move is planned on a worker thread
+# against a clone of the engine (the room lock is only held to clone and to
+# apply), then applied if nothing changed meanwhile. Each move is one
+# action, so multi-action bot turns interleave fairly with other rooms.
+#
+# Bot CPU is metered with a token bucket: moves draw thread CPU time from
+# it and it refills at `cpu_share` seconds per second, so bot-heavy tables
+# cannot starve request threads.
+
+BOT_KINDS = ("expectimax", "mcts", "random")
+DEFAULT_BOT_KIND = "expectimax"
+DEFAULT_WORKERS = 2
+DEFAULT_CPU_SHARE = 0.5         # Fraction of one core all bots together may use
+CPU_BURST = 0.5                 # Seconds of CPU the bucket can bank
+MIN_TIME_BUDGET = 0.005         # Solver always finishes depth 1; never plan on less than this
+
+
+def plan_move(kind, game, player, time_budget, seed=None):
+    """One /api/action dict for `player` from a bot of `kind`."""
+    if kind == "random":
+        return RandomBot(seed)(game, player)
+    if kind == "mcts":
+        # In-process search: the CPU token bucket meters this thread's time
+        return MCTSBot(seed, time_budget)(game, player)
+    return ExpectimaxBot(seed, time_budget)(game, player)
+
+
+class BotScheduler:
+    """Background player for every room's bot seats.
+
+    `after_move(room)` is called with the room lock held after each applied
+    move (the app uses it to notify waiters and record finished matches).
+    `pacing=(lo, hi)` delays every move by a random lo..hi seconds so bot
+    turns read like a person playing; None moves as soon as possible.
+    """
+
+    def __init__(self, after_move=None, workers=DEFAULT_WORKERS, time_budget=solver.DEFAULT_TIME_BUDGET,
+                 cpu_share=DEFAULT_CPU_SHARE, pacing=None, seed=None):
+        self.after_move = after_move
+        self.workers = workers
+        self.time_budget = time_budget
+        self.cpu_share = cpu_share
+        self.pacing = pacing
+        self._rng = random.Random(seed)  # Pacing and bot seeds only; never the engine's RNG
+        self._cond = threading.Condition()
+        self._due = []                   # heap of (due_time, seq, room)
+        self._seq = itertools.count()
+        self._scheduled = set()          # room ids with a queued or running move
+        self._inflight = 0
+        self._tokens = CPU_BURST
+        self._refilled = time.monotonic()
+        self._pool = None
+        self._dispatcher = None
+        self._stopped = False
+        self.moves = 0
+        self.stale = 0
+        self.cpu_seconds = 0.0
+
+    # ---------- public ----------
+
+    def poke(self, room):
+        """Schedule a move if a bot is to act in `room`. Cheap; never blocks on the room."""
+        if not room.bot_pending():
+            return
+        with self._cond:
+            if self._stopped or room.room_id in self._scheduled:
+                return
+            self._scheduled.add(room.room_id)
+            delay = self._rng.uniform(*self.pacing) if self.pacing else 0.0
+            heapq.heappush(self._due, (time.monotonic() + delay, next(self._seq), room))
+            self._ensure_started()
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {"queued": len(self._due), "inflight": self._inflight, "moves": self.moves,
+                    "stale": self.stale, "cpu_seconds": self.cpu_seconds}
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+            self._pool.shutdown(wait=True)
+
+    # ---------- dispatch ----------
+
+    def _ensure_started(self):
+        if self._dispatcher is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bot")
+            self._dispatcher = threading.Thread(target=self._dispatch, name="bot-dispatcher", daemon=True)
+            self._dispatcher.start()
+
+    def _refill(self, now):
+        self._tokens = min(CPU_BURST, self._tokens + (now - self._refilled) * self.cpu_share)
+        self._refilled = now
+
+    def _dispatch(self):
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                self._refill(now)
+                if not self._due or self._inflight >= self.workers:
+                    self._cond.wait()
+                    continue
+                wait = self._due[0][0] - now
+                if self._tokens <= 0:
+                    wait = max(wait, -self._tokens / self.cpu_share)
+                if wait > 0:
+                    self._cond.wait(timeout=wait)
+                    continue
+                _, _, room = heapq.heappop(self._due)
+                self._inflight += 1
+                self._pool.submit(self._run, room)
+
+    def _run(self, room):
+        try:
+            self._move(room)
+        finally:
+            with self._cond:
+                self._inflight -= 1
+                self._cond.notify()
+
+    def _move(self, room):
+        with self._cond:
+            self._scheduled.discard(room.room_id)
+            budget = max(MIN_TIME_BUDGET, min(self.time_budget, self._tokens))
+            seed = self._rng.randrange(2 ** 32)
+
+        with room.lock:
+            game = room.game
+            if game is None:
+                return
+            if game.is_round_over():
+                # Nobody human to press "next round" at an all-bot table
+                if not game.is_game_over() and room.all_bots():
+                    game.start_next_round()
+                    self._applied(room)
+                return
+            player = room.bot_to_act()
+            if not player:
+                return
+            kind = room.bots[player]
+            version = game.version
+            snapshot = game.clone()
+
+        cpu = time.thread_time()
+        action = plan_move(kind, snapshot, player, budget, seed)
+        cpu = time.thread_time() - cpu
+        with self._cond:
+            self._tokens -= cpu
+            self.cpu_seconds += cpu
+
+        with room.lock:
+            if room.game is not game or game.version != version:
+                # Someone moved (or reset) while we were thinking: plan again
+                with self._cond:
+                    self.stale += 1
+                self.poke(room)
+                return
+            game.perform(action)
+            self._applied(room)
+
+    def _applied(self, room):
+        with self._cond:
+            self.moves += 1
+        if self.after_move:
+            self.after_move(room)
+        # The next seat may be a bot too (or the same bot mid-turn)
+        self.poke(room)
@@ -0,0 +1,93 @@
+import random
+
+import solver
+from game_engine import (
+    ALL_ITEMS,
+    ITEM_DIAMOND,
+    ITEM_HEAL,
+    ITEM_INVERTER,
+    ITEM_SKIP,
+    ITEM_STEAL,
+    MODE_RISK,
+    MODE_SAFE,
+)
+
+# =========================
+# BOT POLICIES
+# =========================
+# A policy is any callable policy(game, player) -> action dict, using the
+# same shape as the /api/action payload, so it can be fed to game.perform().
+
+
+def legal_actions(game, player=None):
+    """Every action `player` can take this turn, as /api/action dicts.
+
+    Item uses the engine would refuse and hand back are left out: healing at
+    full health, stealing from an empty hand, inverting an empty chamber.
+    """
+    player = player or game.current()
+    opponents = [p for p in game.alive if p != player]
+
+    actions = [{"type": "draw", "target": t, "mode": MODE_SAFE} for t in game.alive]
+    actions += [{"type": "draw", "target": t, "mode": MODE_RISK} for t in opponents]
+
+    if game.blocked.get(player):
+        return actions
+
+    # dict.fromkeys keeps inventory order, so the list is deterministic across processes
+    for item in dict.fromkeys(game.items[player]):
+        if item == ITEM_STEAL:
+            actions += [{"type": "use", "item": item, "target": t} for t in opponents if game.items[t]]
+        elif item == ITEM_SKIP:
+            actions += [{"type": "use", "item": item, "target": t} for t in opponents]
+        elif item == ITEM_HEAL and game.health[player] >= game.player_max_health[player]:
+            continue
+        elif item == ITEM_INVERTER and not game.deck:
+            continue
+        elif item == ITEM_DIAMOND:
+            actions += [{"type": "use", "item": item, "target": wish} for wish in ALL_ITEMS]
+        else:
+            actions.append({"type": "use", "item": item, "target": None})
+    return actions
+
+
+class RandomBot:
+    """Random legal play, biased towards shooting so games finish.
+
+    Builds only the action it picks instead of the full legal_actions() list,
+    which keeps it cheap enough for bulk simulation.
+    """
+
+    def __init__(self, seed=None, draw_bias=0.75):
+        self.rng = random.Random(seed)
+        self.draw_bias = draw_bias
+
+    def __call__(self, game, player):
+        rng = self.rng
+        inventory = game.items[player]
+        opponents = [p for p in game.alive if p != player]
+
+        if inventory and not game.blocked.get(player) and rng.random() >= self.draw_bias:
+            item = rng.choice(inventory)
+            target = None
+            if item in (ITEM_STEAL, ITEM_SKIP):
+                target = rng.choice(opponents)
+            elif item == ITEM_DIAMOND:
+                target = rng.choice(ALL_ITEMS)
+            return {"type": "use", "item": item, "target": target}
+
+        # Safe shot at anyone still standing, or a risk shot at an opponent
+        pick = rng.randrange(len(game.alive) + len(opponents))
+        if pick < len(game.alive):
+            return {"type": "draw", "target": game.alive[pick], "mode": MODE_SAFE}
+        return {"type": "draw", "target": opponents[pick - len(game.alive)], "mode": MODE_RISK}
+
+
+class ExpectimaxBot:
+    """Searches each decision with the solver under a fixed time budget."""
+
+    def __init__(self, seed=None, time_budget=solver.DEFAULT_TIME_BUDGET):
+        self.time_budget = time_budget
+
+    def __call__(self, game, player):
+        return solver.choose_action(game, player, self.time_budget)
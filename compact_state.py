@@ -0,0 +1,249 @@
+import sys
+from array import array
+from enum import IntEnum
+
+from game_engine import (
+    ALL_ITEMS,
+    BUST,
+    ITEM_DIAMOND,
+    MAGIC_BULLET,
+    PLAYER_CLASSES,
+    ROUND_MODIFIERS,
+    SAFE,
+)
+from knowledge import DeckKnowledge
+from shoe import Shoe
+
+# =========================
+# INTEGER CODES
+# =========================
+# Small-int codes for everything the engine names with strings. Strings only
+# appear at the API boundary (from_engine / to_engine / names).
+
+
+class Shell(IntEnum):
+    BLANK = 0
+    LIVE = 1
+    MAGIC = 2
+
+
+class Item(IntEnum):
+    STEAL = 0
+    SKIP = 1
+    PEEK_RANDOM = 2
+    HEAL = 3
+    DOUBLE = 4
+    DISCARD = 5
+    LENS = 6
+    INVERTER = 7
+    MYSTERY_BOX = 8
+    DIAMOND = 9
+
+
+SHELL_NAMES = {Shell.BLANK: SAFE, Shell.LIVE: BUST, Shell.MAGIC: MAGIC_BULLET}
+SHELL_CODES = {name: code for code, name in SHELL_NAMES.items()}
+
+# ALL_ITEMS is ordered to match Item; Diamond is kept out of it on purpose
+ITEM_NAMES = list(ALL_ITEMS) + [ITEM_DIAMOND]
+ITEM_CODES = {name: code for code, name in enumerate(ITEM_NAMES)}
+N_ITEMS = len(ITEM_NAMES)
+
+CLASS_CODES = {name: code for code, name in enumerate(PLAYER_CLASSES)}
+MODIFIER_CODES = {None: 0}
+MODIFIER_CODES.update({name: code + 1 for code, name in enumerate(ROUND_MODIFIERS)})
+MODIFIER_NAMES = {code: name for name, code in MODIFIER_CODES.items()}
+
+STAT_KEYS = ("dmg_dealt", "dmg_taken", "kills", "deaths", "self_harm", "lucky_saves", "items_used")
+
+NOBODY = -1
+
+# Per-seat flag bits
+ALIVE, SKIPPED, BLOCKED = 1, 2, 4
+
+
+class CompactState:
+    """Integer-coded game state in array-backed columns: cheap to clone, hash and compare.
+
+    Seats are indexes into `names`. Per-seat data lives in flat columns
+    (`hp[seat]`, `items[seat * N_ITEMS + item]`, ...). `order` lists living
+    seats in turn order (the engine's `alive` list) and `turn` indexes into it.
+    """
+
+    __slots__ = ("names", "hp", "max_hp", "cls", "flags", "items", "stats", "order", "deck",
+                 "turn", "round_num", "max_rounds", "modifier", "double", "blackout",
+                 "assassin", "target", "round_winner", "prize_pool")
+
+    def __init__(self, names, hp, max_hp, cls, flags, items, stats, order, deck, turn=0,
+                 round_num=1, max_rounds=3, modifier=0, double=NOBODY, blackout=NOBODY,
+                 assassin=NOBODY, target=NOBODY, round_winner=NOBODY, prize_pool=0):
+        self.names = names
+        self.hp = hp
+        self.max_hp = max_hp
+        self.cls = cls
+        self.flags = flags
+        self.items = items
+        self.stats = stats
+        self.order = order
+        self.deck = deck
+        self.turn = turn
+        self.round_num = round_num
+        self.max_rounds = max_rounds
+        self.modifier = modifier
+        self.double = double
+        self.blackout = blackout
+        self.assassin = assassin
+        self.target = target
+        self.round_winner = round_winner
+        self.prize_pool = prize_pool
+
+    # ---------- engine boundary ----------
+
+    @staticmethod
+    def from_engine(game):
+        names = tuple(game.original_players)
+        seat = {name: i for i, name in enumerate(names)}
+        alive = set(game.alive)
+        items = bytearray(len(names) * N_ITEMS)
+        flags = bytearray(len(names))
+        for i, name in enumerate(names):
+            for item in game.items.get(name, ()):
+                items[i * N_ITEMS + ITEM_CODES[item]] += 1
+            flags[i] = ((ALIVE if name in alive else 0)
+                        | (SKIPPED if game.skip.get(name) else 0)
+                        | (BLOCKED if game.blocked.get(name) else 0))
+        bounty = game.bounty or {}
+        return CompactState(
+            names,
+            array("h", (game.health[n] for n in names)),
+            array("h", (game.player_max_health[n] for n in names)),
+            bytes(CLASS_CODES[game.player_classes[n]] for n in names),
+            flags,
+            items,
+            array("i", (game.stats[n][k] for n in names for k in STAT_KEYS)),
+            bytes(seat[p] for p in game.alive),
+            bytearray(SHELL_CODES[c] for c in game.deck),
+            turn=game.turn,
+            round_num=game.round_num,
+            max_rounds=game.max_rounds,
+            modifier=MODIFIER_CODES[game.current_modifier],
+            double=seat.get(game.double, NOBODY),
+            blackout=seat.get(game.blackout_for, NOBODY),
+            assassin=seat.get(bounty.get("assassin"), NOBODY),
+            target=seat.get(bounty.get("target"), NOBODY),
+            round_winner=seat.get(game.round_winner, NOBODY),
+            prize_pool=game.prize_pool,
+        )
+
+    def to_engine(self, game):
+        """Write this state into an existing engine."""
+        names = self.names
+
+        def name(seat):
+            return names[seat] if seat != NOBODY else None
+
+        game.original_players = list(names)
+        game.players = list(names)
+        game.alive = [names[s] for s in self.order]
+        game.turn = self.turn
+        game.round_num = self.round_num
+        game.max_rounds = self.max_rounds
+        game.current_modifier = MODIFIER_NAMES[self.modifier]
+        game.double = name(self.double)
+        game.blackout_for = name(self.blackout)
+        game.round_winner = name(self.round_winner)
+        game.prize_pool = self.prize_pool
+        game.bounty = ({"assassin": names[self.assassin], "target": names[self.target]}
+                       if self.assassin != NOBODY else None)
+        game.deck = Shoe(SHELL_NAMES[c] for c in self.deck)
+        # Only the shoe is stored, not who has seen what: start from public knowledge
+        game.knowledge = DeckKnowledge(names)
+        game.health = dict(zip(names, self.hp))
+        game.player_max_health = dict(zip(names, self.max_hp))
+        game.player_classes = {n: PLAYER_CLASSES[c] for n, c in zip(names, self.cls)}
+        game.skip = {n: bool(f & SKIPPED) for n, f in zip(names, self.flags)}
+        game.blocked = {n: bool(f & BLOCKED) for n, f in zip(names, self.flags)}
+        game.items = {n: self.item_names(i) for i, n in enumerate(names)}
+        n_stats = len(STAT_KEYS)
+        game.stats = {n: dict(zip(STAT_KEYS, self.stats[i * n_stats:(i + 1) * n_stats]))
+                      for i, n in enumerate(names)}
+        return game
+
+    # ---------- cheap copies and identity ----------
+
+    def clone(self):
+        return CompactState(self.names, array("h", self.hp), array("h", self.max_hp), self.cls,
+                            bytearray(self.flags), bytearray(self.items), array("i", self.stats),
+                            self.order, bytearray(self.deck), self.turn, self.round_num,
+                            self.max_rounds, self.modifier, self.double, self.blackout,
+                            self.assassin, self.target, self.round_winner, self.prize_pool)
+
+    def key(self):
+        return (self.names, self.hp.tobytes(), self.max_hp.tobytes(), self.cls, bytes(self.flags),
+                bytes(self.items), self.stats.tobytes(), self.order, bytes(self.deck), self.turn,
+                self.round_num, self.max_rounds, self.modifier, self.double, self.blackout,
+                self.assassin, self.target, self.round_winner, self.prize_pool)
+
+    def __eq__(self, other):
+        return isinstance(other, CompactState) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    # ---------- queries ----------
+
+    def current(self):
+        if not self.order:
+            return NOBODY
+        return self.order[self.turn % len(self.order)]
+
+    def item_count(self, seat, item):
+        return self.items[seat * N_ITEMS + item]
+
+    def item_names(self, seat):
+        row = self.items[seat * N_ITEMS:(seat + 1) * N_ITEMS]
+        return [ITEM_NAMES[i] for i, count in enumerate(row) for _ in range(count)]
+
+    def shell_counts(self):
+        """(live, blank, magic) in the chamber; live includes the magic bullet."""
+        magic = self.deck.count(Shell.MAGIC)
+        return self.deck.count(Shell.LIVE) + magic, self.deck.count(Shell.BLANK), magic
+
+
+def deep_size(obj, seen=None):
+    """Approximate retained bytes of an object graph, for memory comparisons."""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(x, seen) for x in obj)
+    elif hasattr(obj, "__slots__") and not isinstance(obj, (array, bytes, bytearray)):
+        size += sum(deep_size(getattr(obj, s), seen) for s in obj.__slots__ if hasattr(obj, s))
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen)
+    return size
+
+
+if __name__ == "__main__":
+    import random
+    import timeit
+    import copy
+
+    from game_engine import CasinoGameEngine
+
+    random.seed(0)
+    game = CasinoGameEngine([f"Player{i + 1}" for i in range(8)], headless=True)
+    engine_fields = ("original_players", "players", "alive", "health", "player_max_health", "items",
+                     "player_classes", "skip", "blocked", "stats", "deck", "bounty")
+    engine_state = {f: getattr(game, f) for f in engine_fields}
+    compact = CompactState.from_engine(game)
+
+    print(f"engine state  : {deep_size(engine_state):6d} bytes")
+    print(f"compact state : {deep_size(compact):6d} bytes (names shared: {deep_size(compact.names)})")
+    n = 2000
+    print(f"deepcopy      : {timeit.timeit(lambda: copy.deepcopy(engine_state), number=n) / n * 1e6:7.1f} us")
+    print(f"clone         : {timeit.timeit(compact.clone, number=n) / n * 1e6:7.1f} us")
+    print(f"hash          : {timeit.timeit(lambda: hash(compact), number=n) / n * 1e6:7.1f} us")
@@ -0,0 +1,58 @@
+from collections import deque
+from itertools import takewhile
+
+DEFAULT_EVENT_CAPACITY = 30  # Enough for every client to catch up between polls
+
+
+class EventBuffer:
+    """Fixed-capacity event ring with match-wide, never-reused ids.
+
+    Append and eviction are O(1). Ids keep counting across rounds, so a
+    client cursor is unambiguous for the whole match. `after(id)` returns
+    only newer events and costs O(new events).
+    """
+
+    def __init__(self, capacity=DEFAULT_EVENT_CAPACITY):
+        self._events = deque(maxlen=capacity)
+        self.last_id = 0
+
+    def __len__(self):
+        return len(self._events)
+
+    def __iter__(self):
+        return iter(self._events)
+
+    @property
+    def first_id(self):
+        return self._events[0]["id"] if self._events else self.last_id + 1
+
+    def append(self, event_type, data, timestamp):
+        self.last_id += 1
+        event = {
+            "id": self.last_id,
+            "type": event_type,
+            "data": data,
+            "timestamp": timestamp,
+        }
+        self._events.append(event)
+        return event
+
+    def has_after(self, event_id):
+        """True if `after(event_id)` has something to say (new events or a resync)."""
+        return event_id != self.last_id
+
+    def after(self, event_id):
+        """Events newer than `event_id`, oldest first, plus a resync flag.
+
+        resync is True when the cursor is missing, from another match, or
+        has fallen off the buffer; the caller should then refetch full state.
+        The whole buffer is returned in that case.
+        """
+        if event_id is None or event_id > self.last_id or event_id < self.first_id - 1:
+            return list(self._events), True
+        newer = list(takewhile(lambda e: e["id"] > event_id, reversed(self._events)))
+        newer.reverse()
+        return newer, False
+
+    def to_list(self):
+        return list(self._events)
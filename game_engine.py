@@ -1,12 +1,18 @@
+import hashlib
+import json
 import random
 import time
 
+from event_buffer import EventBuffer, DEFAULT_EVENT_CAPACITY
+from knowledge import DeckKnowledge, LIVE_OR_MAGIC
+from log_store import LogStore, DEFAULT_LOG_RETENTION
+from metrics import instrumented
+from shoe import Shoe, SAFE, BUST, MAGIC_BULLET
+
 # =========================
 # CONSTANTS & CONFIG
 # =========================
-SAFE = "Blank round"
-BUST = "Live round"
-MAGIC_BULLET = "Sudden Death" # Acts as BUST but 999 DMG & Hidden
+# SAFE / BUST / MAGIC_BULLET shell kinds live in shoe.py
 DECK = "Gun"
 HEALTH_NAME = "Health"
 
@@ -55,20 +61,198 @@ MOD_VAMPIRISM = "VAMPIRISM" # Life steal on hit
 
 ROUND_MODIFIERS = [MOD_DOUBLE_TROUBLE, MOD_VAMPIRISM]
 
+# Bump whenever a rule change makes the same (seed, config, actions) play out differently;
+# cached simulation results (see sweep.py) are keyed by it.
+ENGINE_VERSION = 1
+
+
+class GameConfig:
+    """Balance knobs. Immutable by convention; replace(**changes) builds a variant.
+
+    The defaults are the shipped rules, and an engine on the default config
+    draws from the RNG exactly like one built before the knobs existed.
+    """
+
+    FIELDS = ("deck_min", "deck_max", "risk_backfire", "risk_damage", "diamond_chance",
+              "gambler_diamond_chance", "sniper_crit", "blackout_chance", "bounty_chance", "tank_bonus")
+    INT_FIELDS = ("deck_min", "deck_max", "risk_damage", "tank_bonus")
+    __slots__ = FIELDS
+
+    def __init__(self, deck_min=4, deck_max=8, risk_backfire=0.60, risk_damage=3, diamond_chance=0.05,
+                 gambler_diamond_chance=0.25, sniper_crit=0.10, blackout_chance=0.25, bounty_chance=0.30,
+                 tank_bonus=2):
+        self.deck_min = deck_min                              # Shells per load: randint(deck_min, deck_max)
+        self.deck_max = deck_max
+        self.risk_backfire = risk_backfire                    # Chance a Risk Shot turns on the shooter
+        self.risk_damage = risk_damage                        # Base damage of a live Risk Shot
+        self.diamond_chance = diamond_chance                  # Per dealt item, non-Gamblers
+        self.gambler_diamond_chance = gambler_diamond_chance  # Per reload, Gamblers
+        self.sniper_crit = sniper_crit                        # +1 damage on a Sniper's live hit
+        self.blackout_chance = blackout_chance                # After each live Safe / any Risk Shot
+        self.bounty_chance = bounty_chance                    # Per round from round 2
+        self.tank_bonus = tank_bonus                          # Extra max health for Tanks
+        # Int fields are packed as one byte each in engine snapshots (see snapshot.py)
+        for name in self.INT_FIELDS:
+            value = getattr(self, name)
+            if not isinstance(value, int) or not 0 <= value <= 255:
+                raise ValueError(f"{name} must be an int in 0..255")
+        for name in self.FIELDS:
+            if name not in self.INT_FIELDS and not 0.0 <= getattr(self, name) <= 1.0:
+                raise ValueError(f"{name} must be a probability")
+        # A load needs at least one live and one blank shell
+        if not 2 <= deck_min <= deck_max <= 255:
+            raise ValueError("Need 2 <= deck_min <= deck_max <= 255")
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown config field(s): {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    def replace(self, **changes):
+        return GameConfig.from_dict(dict(self.to_dict(), **changes))
+
+    def key(self):
+        """Stable content hash, the same in every process and Python version."""
+        return hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()[:16]
+
+    def __eq__(self, other):
+        return isinstance(other, GameConfig) and self.to_dict() == other.to_dict()
+
+    def __hash__(self):
+        return hash(tuple(self.to_dict().values()))
+
+    def __repr__(self):
+        changed = ", ".join(f"{k}={v!r}" for k, v in self.to_dict().items() if v != getattr(DEFAULT_CONFIG, k))
+        return f"GameConfig({changed})"
+
+
+DEFAULT_CONFIG = GameConfig()
+
 # Cinematic Messages
-CINEMATIC_HIT = [
-    "💥 BLAST! {0} staggers back!",
-    "🔥 IMPACT! {0} reels from the shot!",
-    "💀 STRIKE! {0} takes the hit!",
-    "⚡ CRACK! {0} stumbles!",
-]
-CINEMATIC_DEATH = [
-    "💀 {0} falls! OUT!",
-    "☠️ {0} is down! OUT!",
-]
+CINEMATIC_HIT = (
+    "💥 BLAST! {player} staggers back!",
+    "🔥 IMPACT! {player} reels from the shot!",
+    "💀 STRIKE! {player} takes the hit!",
+    "⚡ CRACK! {player} stumbles!",
+)
+CINEMATIC_DEATH = (
+    "💀 {player} falls! OUT!",
+    "☠️ {player} is down! OUT!",
+)
+
+# Log lines are stored as (code, args) records and only rendered when served; see LogStore.
+# A tuple of templates is a cinematic line: the variant is picked from the record's sequence
+# number, so it costs no RNG draw and renders the same every time.
+LOG_MESSAGES = {
+    # Rounds & shoe
+    "round_start": "--- ROUND {round} START ---",
+    "players": "Players: {players}",
+    "modifier": "⚠️ ROUND MODIFIER ACTIVE: {modifier} ⚠️",
+    "sudden_death_loaded": "💀 A SUDDEN DEATH BULLET has been loaded...",
+    "reload": "🔫 Reloading... {live} Live / {blank} Blank",
+    "empty_reload": "⏹ Empty chamber. Reloading.",
+    "round_win": "🏆 {player} wins Round {round}!",
+    "next_round": "Next round starting...",
+    "grand_winner": "👑 GRAND WINNER: {player}!",
+    # Contracts
+    "contract_target": "🎯 CONTRACT: Kill {target} to win the round!",
+    "contract_received": "🤫 You have received a secret contract...",
+    "contract_expired": "❌ Contract EXPIRED due to reshuffle.",
+    "contract_complete": "🎯 CONTRACT COMPLETE! {player} eliminated {target}!",
+    "contract_win": "🏆 {player} wins by contract!",
+    # Turns & shots
+    "turn_lost": "{player} was locked and loses turn!",
+    "blackout": "🌑 BLACKOUT triggered! {player}'s next draw will have target chosen at random.",
+    "blackout_no_target": "No valid opponents for Blackout.",
+    "blackout_forced": "🌑 Blackout → target forced to {target}",
+    "invalid_target": "Invalid target",
+    "safe_shot": "🎯 {player} Safe Shot → {target}",
+    "risk_shot": "🎯 {player} Risk Shot...",
+    "risk_blackout_shot": "🎯 {player} Risk Shot (blackout) → {target}",
+    "risk_blackout_click": "🎯 {player} Risk Shot (blackout) → {target} ... Click! " + SAFE + ".",
+    "backfire": "🔥 BACKFIRE! The gun snaps to {player}!",
+    "steady": "🔫 The gun stays steady on {target}!",
+    "click": "Click! " + SAFE + ". No damage.",
+    "risk_click": "Aimed at {target}... Click! " + SAFE + ".",
+    "blank_keeps_turn": "{player} survives the blank and keeps the turn!",
+    "sudden_death_hit": "💀 SUDDEN DEATH! {target} was obliterated!",
+    "instant_kill": "💀 SUDDEN DEATH! INSTANT KILL!",
+    # Damage
+    "double_trouble": "💀 Double Trouble! Damage x2!",
+    "sniper_crit": "🎯 Sniper Critical Hit!",
+    "hit": tuple(t + " (-{dmg} " + HEALTH_NAME + ")" for t in CINEMATIC_HIT),
+    "vampirism": "🧛 Vampirism! {player} drains life!",
+    "death": CINEMATIC_DEATH,
+    # Items
+    "jammed": "{player} is jammed and can't use items!",
+    "not_owned": "Item not owned",
+    "steal_invalid": "Steal failed: Invalid target",
+    "steal_empty": "{target} has no items to steal",
+    "steal_missing": "{target} does not have {item}",
+    "stole": "💉 {player} stole {item} from {target}!",
+    "skip_invalid": "Skip failed: Invalid target",
+    "handcuffed": "⛓️ {target} is handcuffed! They will miss their next turn.",
+    "peek": "🤫 Peek → shell {index} is {shell}",
+    "phone": "{player} checks a random shell phone...",
+    "heal": "{player} gains 1 " + HEALTH_NAME,
+    "full_health": "{player} is already at full health",
+    "knife": "{player} saws off the barrel! Next hit deals DOUBLE damage.",
+    "discard": "Discarded {shell}",
+    "lens": "🔍 Current shell is: {shell}",
+    "lens_public": "{player} inspects the chamber...",
+    "diamond_no_item": "Diamond failed: No item specified",
+    "diamond_invalid": "Diamond failed: Invalid item {item}",
+    "wish": "💎 {player} wishes for a {item}!",
+    "wish_wipe": "✨ The wish ripples out... {count} {item}(s) vanished from opponents!",
+    "neutralized": "⚡ {player} neutralized the anomaly! It's now Blank!",
+    "inverted": "⚡ {player} inverted the polarity! The shell is now {shell}!",
+    "inverter_empty": "Inverter failed: Gun is empty",
+    "mystery_box": "❓ {player} opens the Mystery Box...",
+    "box_heal": "💖 Miracle! +2 HP!",
+    "box_trap": "💥 Trap! -1 HP!",
+    "box_loot": "🎁 Jackpot! Found {loot}!",
+    "box_reload": "🔄 The box contained... a new gun?",
+}
+# Lines where `player` loses health, e.g. log_store.find(DAMAGE_LOGS, player="Bob")
+DAMAGE_LOGS = ("hit", "box_trap")
+
+
+def render_log(record):
+    template = LOG_MESSAGES[record.code]
+    if type(template) is tuple:
+        template = template[record.seq % len(template)]
+    return template.format(**record.args)
+
+# Log lines served to clients per poll
+LOG_WINDOW = 20
+
+# State versioning: clients further behind than this get a full snapshot
+STATE_DELTA_WINDOW = 500
+# Heavy state fields tracked per version; everything else is cheap and always sent
+TRACKED_FIELDS = ("health", "max_health", "items", "classes", "logs", "events", "stats")
 
 class CasinoGameEngine:
-    def __init__(self, players):
+    def __init__(self, players, log_retention=DEFAULT_LOG_RETENTION, log_archive=None,
+                 event_capacity=DEFAULT_EVENT_CAPACITY, headless=False, rng=None, seed=None, metrics=None,
+                 config=None, first_version=0):
+        # Every random decision goes through self.rng. Without an injected rng the
+        # engine seeds its own, so any match can be replayed from (seed, journal).
+        if rng is None:
+            if seed is None:
+                seed = random.randrange(2 ** 32)
+            rng = random.Random(seed)
+        self.rng = rng
+        self.seed = seed
+        # Balance knobs; a match is reproduced by (config, seed, journal)
+        self.config = config or DEFAULT_CONFIG
+        # Compact record of every run_draw / run_use / start_next_round call
+        self.journal = []
+
         self.original_players = players[:]
         self.players = players
         self.alive = players[:]
@@ -92,15 +276,12 @@ class CasinoGameEngine:
         } for p in players}
         self.prize_pool = 100000 # Base $100,000
         
-        # Logs structure: { "text": "...", "visible_to": None (all) or [names] }
-        self.logs = [] 
-        # Events structure: { "id": int, "type": "...", "data": {...} }
-        self.events = []
-        self.event_counter = 0
+        self._init_runtime(headless, log_retention, log_archive, event_capacity, metrics, first_version)
 
         self.player_classes = {}
         for p in players:
-            self.player_classes[p] = random.choice(PLAYER_CLASSES)
+            self.player_classes[p] = self.rng.choice(PLAYER_CLASSES)
+        self._touch("classes")
         
         self.player_max_health = {}
         self.health = {}
@@ -113,82 +294,163 @@ class CasinoGameEngine:
         self.double = None
         self.blackout_for = None
         self._blackout_announced = set()
-        self.deck = []
+        self.deck = Shoe()
+        # What each player knows about the loaded shells; see DeckKnowledge
+        self.knowledge = DeckKnowledge(players)
 
-        self.custom_log(f"--- ROUND {self.round_num} START ---")
-        self.custom_log(f"Players: {', '.join(players)}")
+        self.custom_log("round_start", round=self.round_num)
+        self.custom_log("players", players=", ".join(players))
         self.new_round_deck() 
 
+    def _init_runtime(self, headless=False, log_retention=DEFAULT_LOG_RETENTION, log_archive=None,
+                      event_capacity=DEFAULT_EVENT_CAPACITY, metrics=None, first_version=0):
+        """Presentation and bookkeeping state that is not part of the game itself."""
+        # Optional metrics.EngineMetrics; None keeps instrumented methods at full speed
+        self.metrics = metrics
+        # Headless (simulation) mode: logs and events are only counted, never built.
+        # Rule outcomes and RNG consumption are identical to normal mode.
+        self.headless = headless
+        self.suppressed_logs = 0
+        self.suppressed_events = 0
+
+        # Public ring buffer + per-player private tails; see LogStore
+        self.log_store = LogStore(retention=log_retention, archive=log_archive, render=render_log)
+        # Events structure: { "id": int, "type": "...", "data": {...} }
+        # Ids are never reused within a match; see EventBuffer
+        self.events = EventBuffer(capacity=event_capacity)
+
+        # Monotonic state version + the version at which each tracked field last changed.
+        # A room starts each new game above the last one's versions, so a version from an
+        # earlier game (below first_version) always gets a full state.
+        self.first_version = first_version
+        self.version = first_version
+        self._field_versions = {}
+        # Version of the last change everyone can see, and of each viewer's last private log line.
+        # A viewer's state only changes when one of the two moves; see view_version.
+        self.public_version = first_version
+        self._private_versions = {}
+        # Per-game encoder cache owned by wire.compact_state
+        self.wire_cache = None
+
+    def snapshot(self):
+        """Game-relevant state only (no logs/events); see snapshot.py."""
+        from snapshot import EngineSnapshot # Local import: snapshot builds on this module
+        return EngineSnapshot.capture(self)
+
+    @classmethod
+    def restore(cls, snap, headless=True, **runtime):
+        """New engine from a snapshot. `runtime` is passed to _init_runtime."""
+        return snap.restore(headless=headless, **runtime)
+
+    def clone(self, headless=True):
+        game = self.snapshot().restore(headless=headless)
+        # Snapshots don't carry what players have seen; a clone keeps it
+        game.knowledge = self.knowledge.clone()
+        return game
+
     def _init_health(self):
         for p in self.original_players:
             if self.round_num == 1:
                 base = 4
             else:
-                base = random.randint(4, 8)
+                base = self.rng.randint(4, 8)
             
-            bonus = 2 if self.player_classes[p] == CLASS_TANK else 0
+            bonus = self.config.tank_bonus if self.player_classes[p] == CLASS_TANK else 0
             self.player_max_health[p] = base + bonus
             self.health[p] = self.player_max_health[p]
-
-    def custom_log(self, message, visible_to=None):
-        self.logs.append({
-            "text": message,
-            "visible_to": visible_to
-        })
+        self._touch("health", "max_health")
+
+    def _touch(self, *fields, visible_to=None):
+        """Bump the state version and mark `fields` as changed at it.
+
+        With `visible_to`, the change only shows in those viewers' state.
+        """
+        self.version += 1
+        for f in fields:
+            self._field_versions[f] = self.version
+        if visible_to is None:
+            self.public_version = self.version
+        else:
+            for viewer in visible_to:
+                self._private_versions[viewer] = self.version
+
+    def field_version(self, field):
+        """Version at which TRACKED_FIELDS entry `field` last changed."""
+        return self._field_versions.get(field, 0)
+
+    def view_version(self, viewer=None):
+        """Cheap change counter for get_state(viewer): equal values mean an identical view
+        (apart from the "version" field itself)."""
+        return max(self.public_version, self._private_versions.get(viewer, 0))
+
+    def custom_log(self, code, visible_to=None, **args):
+        """Record log line `code` (a LOG_MESSAGES key) with its template arguments.
+        Nothing is formatted here; the text is rendered when the line is served."""
+        if self.headless:
+            self.suppressed_logs += 1
+            return
+        self._touch("logs", visible_to=visible_to)
+        self.log_store.append(code, args, visible_to)
 
     def _trigger_event(self, event_type, **kwargs):
         """Register a persistent event for frontend visuals."""
-        self.event_counter += 1
-        self.events.append({
-            "id": self.event_counter,
-            "type": event_type,
-            "data": kwargs,
-            "timestamp": time.time()
-        })
-        # Keep last 30 events to ensure all clients catch up
-        if len(self.events) > 30:
-            self.events.pop(0)
-
-    def new_round_deck(self):
-        total = random.randint(4, 8)
-        bust = random.randint(1, total - 1)
+        if self.headless:
+            self.suppressed_events += 1
+            return
+        self._touch("events")
+        self.events.append(event_type, kwargs, time.time())
+
+    def latest_event_id(self):
+        return self.events.last_id
+
+    def events_since(self, event_id):
+        """Events newer than the client's cursor, plus a resync-needed flag."""
+        return self.events.after(event_id)
+
+    @instrumented("new_round_deck")
+    def new_round_deck(self, expire_bounty=True):
+        total = self.rng.randint(self.config.deck_min, self.config.deck_max)
+        bust = self.rng.randint(1, total - 1)
         safe = total - bust
 
-        self.deck = [BUST] * bust + [SAFE] * safe
+        shells = [BUST] * bust + [SAFE] * safe
         
         # Round 3 Sudden Death: Replace one BUST with MAGIC_BULLET if possible
         if self.round_num == 3 and bust > 0:
-            self.deck[0] = MAGIC_BULLET # We shuffle next anyway
-            self.custom_log("💀 A SUDDEN DEATH BULLET has been loaded...")
+            shells[0] = MAGIC_BULLET # We shuffle next anyway
+            self.custom_log("sudden_death_loaded")
             self._trigger_event("sudden_death_loaded")
 
-        random.shuffle(self.deck)
+        self.rng.shuffle(shells)
+        self.deck = Shoe(shells)
+        self.knowledge.reload()
 
-        self.custom_log(f"🔫 Reloading... {bust} Live / {safe} Blank")
+        self.custom_log("reload", live=bust, blank=safe)
         self._trigger_event("reload", live=bust, blank=safe)
         
         # Bounty Expiration (User Request: "it should 'NOT' be like if deck is going to end it still asks me to kill")
-        if self.bounty:
+        if self.bounty and expire_bounty:
             a = self.bounty['assassin']
-            self.custom_log(f"❌ Contract EXPIRED due to reshuffle.", visible_to=[a])
+            self.custom_log("contract_expired", visible_to=[a])
             self.bounty = None
 
         self.give_items()
 
     def give_items(self):
+        self._touch("items")
         for p in self.alive:
             if self.player_classes.get(p) == CLASS_GAMBLER:
                 # Gambler diamond chance reduced to 25% as requested
-                if random.random() < 0.25:
+                if self.rng.random() < self.config.gambler_diamond_chance:
                     self.items[p].append(ITEM_DIAMOND)
                 for _ in range(3):
-                    self.items[p].append(random.choice(RARE_ITEMS + ALL_ITEMS))
+                    self.items[p].append(self.rng.choice(RARE_ITEMS + ALL_ITEMS))
             else:
                 for _ in range(4):
-                    if random.random() < 0.05: # Ultra Rare 5%
+                    if self.rng.random() < self.config.diamond_chance: # Ultra Rare 5%
                         self.items[p].append(ITEM_DIAMOND)
                     else:
-                        self.items[p].append(random.choice(ALL_ITEMS))
+                        self.items[p].append(self.rng.choice(ALL_ITEMS))
 
     def current(self):
         if not self.alive: return None
@@ -202,27 +464,22 @@ class CasinoGameEngine:
         self.turn = (self.turn + 1) % len(self.alive)
         
         next_p = self.current()
-        
-        # Modifier: Item Rain
-        if self.current_modifier == MOD_ITEM_RAIN:
-            gift = random.choice(ALL_ITEMS)
-            self.items[next_p].append(gift)
-            self.custom_log(f"☔ Item Rain! {next_p} got a {gift}")
-            self._trigger_event("item_rain", player=next_p, item=gift)
 
         if self.skip.get(next_p):
-            self.custom_log(f"{next_p} was locked and loses turn!")
+            self.custom_log("turn_lost", player=next_p)
             self._trigger_event("skip", player=next_p)
             self.skip[next_p] = False
             self.next_turn()
 
+    @instrumented("apply_damage")
     def _apply_damage(self, victim, dmg, source_player=None):
         # Modifier: Double Trouble
         if self.current_modifier == MOD_DOUBLE_TROUBLE:
             dmg *= 2
-            self.custom_log(f"💀 Double Trouble! Damage x2!")
+            self.custom_log("double_trouble", player=victim)
 
         self.health[victim] -= dmg
+        self._touch("health", "stats")
         if source_player and source_player in self.stats:
             if source_player != victim:
                 self.stats[source_player]["dmg_dealt"] += dmg
@@ -232,7 +489,7 @@ class CasinoGameEngine:
         if victim in self.stats:
             self.stats[victim]["dmg_taken"] += dmg
 
-        self.custom_log(random.choice(CINEMATIC_HIT).format(victim) + f" (-{dmg} {HEALTH_NAME})")
+        self.custom_log("hit", player=victim, dmg=dmg, source=source_player)
         
         # Determine if kill shot for event flavor
         is_kill = self.health[victim] <= 0
@@ -245,21 +502,21 @@ class CasinoGameEngine:
 
         # Bounty Check
         if is_kill and self.bounty and source_player and source_player == self.bounty['assassin'] and victim == self.bounty['target']:
-            self.custom_log(f"🎯 CONTRACT COMPLETE! {source_player} eliminated {victim}!")
+            self.custom_log("contract_complete", player=source_player, target=victim)
             self._trigger_event("bounty_complete", assassin=source_player)
             self.round_winner = source_player
-            self.custom_log(f"🏆 {source_player} wins by contract!")
+            self.custom_log("contract_win", player=source_player)
             self._trigger_event("round_over", winner=source_player, is_grand=(self.round_num >= self.max_rounds))
             return True
         if self.current_modifier == MOD_VAMPIRISM and source_player and source_player != victim and source_player in self.alive:
             heal_amt = 1
             if self.health[source_player] < self.player_max_health[source_player]:
                 self.health[source_player] += heal_amt
-                self.custom_log(f"🧛 Vampirism! {source_player} drains life!")
+                self.custom_log("vampirism", player=source_player)
                 self._trigger_event("heal", target=source_player, amount=heal_amt, is_vampire=True)
 
         if is_kill:
-            self.custom_log(random.choice(CINEMATIC_DEATH).format(victim))
+            self.custom_log("death", player=victim)
             if victim in self.alive:
                 self.alive.remove(victim)
             self._trigger_event("death", player=victim)
@@ -272,16 +529,18 @@ class CasinoGameEngine:
             winner = self.alive[0]
             if self.round_num < self.max_rounds:
                 self.round_winner = winner
-                self.custom_log(f"🏆 {winner} wins Round {self.round_num}!")
-                self.custom_log("Next round starting...")
+                self.custom_log("round_win", player=winner, round=self.round_num)
+                self.custom_log("next_round")
             else:
-                self.custom_log(f"👑 GRAND WINNER: {winner}!")
+                self.custom_log("grand_winner", player=winner)
             self._trigger_event("round_over", winner=winner, is_grand=(self.round_num >= self.max_rounds))
 
     def start_next_round(self):
+        self.journal.append(("next_round",))
         if self.round_num >= self.max_rounds:
             return False 
         
+        self._touch()
         self.round_num += 1
         self.round_winner = None
         self.alive = self.original_players[:]
@@ -289,83 +548,87 @@ class CasinoGameEngine:
         
         self._init_health()
         self.items = {p: [] for p in self.original_players}
+        self._touch("items")
         self.skip = {p: False for p in self.original_players}
         self.blocked = {p: False for p in self.original_players}
         self.double = None
         self.blackout_for = None
         self.bounty = None
-        self.events = [] # Clear events on new round start? Or just let them roll off.
-        self.event_counter = 0 # Reset counter or keep going? Better to keep going to avoid confusion, but round reset makes sense.
-        # Impl: Resetting ensures a clean slate.
+        # Events are NOT cleared: ids stay valid across rounds so client cursors never go ambiguous
         
         # Select Round Modifier
         if self.round_num > 1:
-            self.current_modifier = random.choice(ROUND_MODIFIERS)
+            self.current_modifier = self.rng.choice(ROUND_MODIFIERS)
             
             # Bounty Chance (30%) if enough players
-            if len(self.alive) >= 2 and random.random() < 0.30:
-                assassin = random.choice(self.alive)
+            if len(self.alive) >= 2 and self.rng.random() < self.config.bounty_chance:
+                assassin = self.rng.choice(self.alive)
                 targets = [p for p in self.alive if p != assassin]
                 if targets:
-                    target = random.choice(targets)
+                    target = self.rng.choice(targets)
                     self.bounty = {"assassin": assassin, "target": target}
-                    self.custom_log(f"🎯 CONTRACT: Kill {target} to win the round!", visible_to=[assassin])
-                    self.custom_log(f"🤫 You have received a secret contract...", visible_to=[assassin])
+                    self.custom_log("contract_target", visible_to=[assassin], target=target)
+                    self.custom_log("contract_received", visible_to=[assassin])
         else:
             self.current_modifier = None 
 
-        self.custom_log(f"--- ROUND {self.round_num} START ---")
+        self.custom_log("round_start", round=self.round_num)
         self.prize_pool += 50000 # Increase prize pool per round
         if self.current_modifier:
-            self.custom_log(f"⚠️ ROUND MODIFIER ACTIVE: {self.current_modifier} ⚠️")
+            self.custom_log("modifier", modifier=self.current_modifier)
             self._trigger_event("modifier_active", modifier=self.current_modifier)
 
-        self.new_round_deck()
+        # The round's first load must not expire the contract that was just handed out
+        self.new_round_deck(expire_bounty=False)
         return True
 
     def _sniper_bonus(self, player, base_dmg):
-        if self.player_classes.get(player) == CLASS_SNIPER and random.random() < 0.10:
-            self.custom_log(f"🎯 Sniper Critical Hit!")
+        if self.player_classes.get(player) == CLASS_SNIPER and self.rng.random() < self.config.sniper_crit:
+            self.custom_log("sniper_crit", player=player)
             self._trigger_event("crit", player=player)
             return base_dmg + 1
         return base_dmg
 
     def _maybe_trigger_blackout(self):
         if len(self.alive) < 2: return
-        if random.random() < 0.25:
+        if self.rng.random() < self.config.blackout_chance:
             self.blackout_for = self.current()
             self._blackout_announced = set()
-            self.custom_log(f"🌑 BLACKOUT triggered! {self.blackout_for}'s next draw will have target chosen at random.")
+            self.custom_log("blackout", player=self.blackout_for)
             self._trigger_event("blackout", active_player=self.blackout_for)
 
+    @instrumented("run_draw")
     def run_draw(self, target, mode=None):
-        if self.round_winner: return 
+        self.journal.append(("draw", target, mode))
+        if self.round_winner: return False
+        self._touch()
 
         if mode is None or mode != MODE_RISK:
             mode = MODE_SAFE
 
         player = self.current()
-        if not player: return
+        if not player: return False
 
         if target not in self.alive:
-            self.custom_log("Invalid target", visible_to=[player])
-            return
+            self.custom_log("invalid_target", visible_to=[player])
+            return False
 
         is_blackout_turn = self.blackout_for == player
         if is_blackout_turn:
             self.blackout_for = None
             opponents = [p for p in self.alive if p != player]
             if not opponents:
-                self.custom_log("No valid opponents for Blackout.")
-                return
-            target = random.choice(opponents)
-            self.custom_log(f"🌑 Blackout → target forced to {target}")
+                self.custom_log("blackout_no_target")
+                return False
+            target = self.rng.choice(opponents)
+            self.custom_log("blackout_forced", target=target)
 
         if not self.deck:
-            self.custom_log("⏹ Empty chamber. Reloading.")
+            self.custom_log("empty_reload")
             self.new_round_deck()
 
-        card = self.deck.pop(0)
+        card = self.deck.draw()
+        self.knowledge.pop_front()
         is_live = (card == BUST or card == MAGIC_BULLET)
         is_magic = (card == MAGIC_BULLET)
         
@@ -376,12 +639,12 @@ class CasinoGameEngine:
         self._trigger_event("shot_fired", player=player, target=target, is_live=is_live, is_magic=is_magic, mode=mode)
 
         if mode == MODE_SAFE:
-            self.custom_log(f"🎯 {player} Safe Shot → {target}")
+            self.custom_log("safe_shot", player=player, target=target)
             
             if is_live:
                 if is_magic:
                     dmg = 999
-                    self.custom_log(f"💀 SUDDEN DEATH! {target} was obliterated!")
+                    self.custom_log("sudden_death_hit", target=target)
                 else:
                     base_dmg = 2 if has_double else 1
                     dmg = self._sniper_bonus(player, base_dmg)
@@ -390,70 +653,79 @@ class CasinoGameEngine:
                 self.next_turn()
                 self._maybe_trigger_blackout()
             else:
-                self.custom_log(f"Click! {SAFE}. No damage.")
+                self.custom_log("click", target=target)
                 self._trigger_event("click", target=target)
                 if target == player:
-                    self.custom_log(f"{player} survives the blank and keeps the turn!")
+                    self.custom_log("blank_keeps_turn", player=player)
                     if player in self.stats:
                         self.stats[player]["lucky_saves"] += 1
+                        self._touch("stats")
                 else:
                     self.next_turn()
-            return
+            return True
 
         if mode == MODE_RISK:
             if is_blackout_turn:
                 actual_target = target
                 if is_live:
-                    base_dmg = 3
+                    base_dmg = self.config.risk_damage
                     dmg = self._sniper_bonus(player, base_dmg)
-                    self.custom_log(f"🎯 {player} Risk Shot (blackout) → {actual_target}")
+                    self.custom_log("risk_blackout_shot", player=player, target=actual_target)
                     self._apply_damage(actual_target, dmg, source_player=player)
                 else:
-                    self.custom_log(f"🎯 {player} Risk Shot (blackout) → {actual_target} ... Click! {SAFE}.")
+                    self.custom_log("risk_blackout_click", player=player, target=actual_target)
                     self._trigger_event("click", target=actual_target)
             else:
-                hit_self = random.random() < 0.60
+                hit_self = self.rng.random() < self.config.risk_backfire
                 actual_target = player if hit_self else target
                 
-                self.custom_log(f"🎯 {player} Risk Shot...")
+                self.custom_log("risk_shot", player=player, target=target)
                 
                 if is_live:
                     if hit_self:
-                        self.custom_log(f"🔥 BACKFIRE! The gun snaps to {player}!")
+                        self.custom_log("backfire", player=player)
                     else:
-                        self.custom_log(f"🔫 The gun stays steady on {target}!")
+                        self.custom_log("steady", target=target)
                     
                     if is_magic:
                         dmg = 999
-                        self.custom_log("💀 SUDDEN DEATH! INSTANT KILL!")
+                        self.custom_log("instant_kill", target=actual_target)
                     else:
-                        base_dmg = 3
+                        base_dmg = self.config.risk_damage
                         dmg = self._sniper_bonus(player, base_dmg)
                     
                     self._apply_damage(actual_target, dmg, source_player=player)
                 else:
-                    self.custom_log(f"Aimed at {actual_target}... Click! {SAFE}.")
+                    self.custom_log("risk_click", target=actual_target)
                     self._trigger_event("click", target=actual_target)
 
             self.next_turn()
             self._maybe_trigger_blackout()
+        return True
 
+    @instrumented("run_use", by_item=True)
     def run_use(self, item, target=None, item_to_steal=None):
-        if self.round_winner: return 
+        self.journal.append(("use", item, target, item_to_steal))
+        return self._run_use(item, target, item_to_steal)
+
+    def _run_use(self, item, target=None, item_to_steal=None):
+        if self.round_winner: return False
+        self._touch()
 
         player = self.current()
-        if not player: return
+        if not player: return False
 
         if self.blocked[player]:
-            self.custom_log(f"{player} is jammed and can't use items!", visible_to=[player])
+            self.custom_log("jammed", visible_to=[player], player=player)
             self.blocked[player] = False
-            return
+            return False
 
         if item not in self.items[player]:
-            self.custom_log("Item not owned", visible_to=[player])
-            return
+            self.custom_log("not_owned", visible_to=[player], item=item)
+            return False
 
         self.items[player].remove(item)
+        self._touch("items", "stats")
         if player in self.stats:
             self.stats[player]["items_used"] += 1
         self._trigger_event("use_item", player=player, item=item, target=target)
@@ -465,95 +737,99 @@ class CasinoGameEngine:
         # LOGIC
         if item == ITEM_STEAL:
              if not target or target == player or target not in self.alive:
-                 self.custom_log("Steal failed: Invalid target", visible_to=[player])
+                 self.custom_log("steal_invalid", visible_to=[player], target=target)
                  self.items[player].append(item)
-                 return
+                 return False
              
              if not self.items[target]:
-                 self.custom_log(f"{target} has no items to steal", visible_to=[player])
+                 self.custom_log("steal_empty", visible_to=[player], target=target)
                  self.items[player].append(item)
-                 return
+                 return False
                  
              if not item_to_steal:
-                 item_to_steal = random.choice(self.items[target])
+                 item_to_steal = self.rng.choice(self.items[target])
              
              if item_to_steal not in self.items[target]:
-                  self.custom_log(f"{target} does not have {item_to_steal}", visible_to=[player])
+                  self.custom_log("steal_missing", visible_to=[player], target=target, item=item_to_steal)
                   self.items[player].append(item)
-                  return
+                  return False
 
              self.items[target].remove(item_to_steal)
              self.items[player].append(item_to_steal)
-             self.custom_log(f"💉 {player} stole {item_to_steal} from {target}!")
-             self.run_use(item_to_steal, target) # Auto-use stolen item
+             self.custom_log("stole", player=player, item=item_to_steal, target=target)
+             self._run_use(item_to_steal, target) # Auto-use stolen item
 
         elif item == ITEM_SKIP:
             if not target or target not in self.alive:
-                self.custom_log("Skip failed: Invalid target", visible_to=[player])
+                self.custom_log("skip_invalid", visible_to=[player], target=target)
                 self.items[player].append(item)
-                return
+                return False
             self.skip[target] = True
-            self.custom_log(f"⛓️ {target} is handcuffed! They will miss their next turn.")
+            self.custom_log("handcuffed", target=target)
             self._trigger_event("handcuffed", player=target)
 
         elif item == ITEM_PEEK_RANDOM:
             if self.deck:
-                i = random.randrange(len(self.deck))
-                peek_card = self.deck[i]
+                i = self.rng.randrange(len(self.deck))
+                peek_card = self.deck.peek(i)
+                self.knowledge.see(player, i, peek_card)
                 
                 msg = peek_card
                 if peek_card == MAGIC_BULLET:
                     msg = "💀 SUDDEN DEATH BULLET"
                 
-                self.custom_log(f"🤫 Peek → shell {i + 1} is {msg}", visible_to=[player])
-                self.custom_log(f"{player} checks a random shell phone...", visible_to=None) 
+                self.custom_log("peek", visible_to=[player], index=i + 1, shell=msg)
+                self.custom_log("phone", player=player)
 
         elif item == ITEM_HEAL:
             max_hp = self.player_max_health[player]
             if self.health[player] < max_hp:
                 self.health[player] += 1
-                self.custom_log(f"{player} gains 1 {HEALTH_NAME}")
+                self._touch("health")
+                self.custom_log("heal", player=player)
                 self._trigger_event("heal", target=player, amount=1)
             else:
-                self.custom_log(f"{player} is already at full health", visible_to=[player])
+                self.custom_log("full_health", visible_to=[player], player=player)
                 self.items[player].append(item) 
-                return
+                return False
 
         elif item == ITEM_DOUBLE:
             self.double = player
-            self.custom_log(f"{player} saws off the barrel! Next hit deals DOUBLE damage.")
+            self.custom_log("knife", player=player)
 
         elif item == ITEM_DISCARD:
             if self.deck:
-                gone = self.deck.pop(0)
-                self.custom_log(f"Discarded {gone}")
+                gone = self.deck.eject()
+                self.knowledge.pop_front()
+                self.custom_log("discard", player=player, shell=gone)
 
         elif item == ITEM_LENS:
             if self.deck:
-                peek_card = self.deck[0]
+                peek_card = self.deck.peek()
                 # Disguise logic: Magic Bullet looks like LIVE round
                 if peek_card == MAGIC_BULLET:
                     peek_card = BUST
+                self.knowledge.see(player, 0, LIVE_OR_MAGIC if peek_card == BUST else peek_card)
                 
-                self.custom_log(f"🔍 Current shell is: {peek_card}", visible_to=[player])
-                self.custom_log(f"{player} inspects the chamber...", visible_to=None) 
+                self.custom_log("lens", visible_to=[player], shell=peek_card)
+                self.custom_log("lens_public", player=player)
         
         elif item == ITEM_DIAMOND:
             if not target: 
-                self.custom_log("Diamond failed: No item specified", visible_to=[player])
+                self.custom_log("diamond_no_item", visible_to=[player])
                 self.items[player].append(item)
-                return
+                return False
             
             desired_item = target
             valid_items = ALL_ITEMS + RARE_ITEMS
 
             if desired_item not in valid_items:
-                self.custom_log(f"Diamond failed: Invalid item {desired_item}", visible_to=[player])
+                self.custom_log("diamond_invalid", visible_to=[player], item=desired_item)
                 self.items[player].append(item)
-                return
+                return False
 
             self.items[player].append(desired_item)
-            self.custom_log(f"💎 {player} wishes for a {desired_item}!")
+            self.custom_log("wish", player=player, item=desired_item)
             
             wiped_count = 0
             for p in self.alive:
@@ -563,81 +839,149 @@ class CasinoGameEngine:
                     self.items[p] = [i for i in self.items[p] if i != desired_item]
             
             if wiped_count > 0:
-                self.custom_log(f"✨ The wish ripples out... {wiped_count} {desired_item}(s) vanished from opponents!")
+                self.custom_log("wish_wipe", player=player, count=wiped_count, item=desired_item)
         
         elif item == ITEM_INVERTER:
             if self.deck:
-                current_shell = self.deck[0]
+                current_shell = self.deck.peek()
                 # Inverter logic with Magic Bullet? 
                 # If Magic, act as Live -> invert to Blank? Or invert to Live?
                 # Let's say it breaks the Inverter or just acts as Live.
                 # Logic: If Magic, it's "Live". Inverting "Live" -> "Blank". 
                 # So Magic Bullet becomes Safe. That's a good counterplay.
                 
-                new_shell = BUST if current_shell == SAFE else SAFE
+                new_shell = self.deck.invert()
+                self.knowledge.reveal_front(new_shell)
                 if current_shell == MAGIC_BULLET:
-                     new_shell = SAFE # Neutralized!
-                     self.custom_log(f"⚡ {player} neutralized the anomaly! It's now Blank!")
+                     self.custom_log("neutralized", player=player)
                 
-                self.deck[0] = new_shell
-                self.custom_log(f"⚡ {player} inverted the polarity! The shell is now {new_shell}!")
+                self.custom_log("inverted", player=player, shell=new_shell)
                 self._trigger_event("inverse", player=player)
             else:
-                self.custom_log("Inverter failed: Gun is empty", visible_to=[player])
+                self.custom_log("inverter_empty", visible_to=[player])
                 self.items[player].append(item)
+                return False
         
         elif item == ITEM_MYSTERY_BOX:
             # Random effect
             outcomes = ["HEAL", "HURT", "LOOT", "RELOAD"]
-            outcome = random.choice(outcomes)
-            self.custom_log(f"❓ {player} opens the Mystery Box...")
+            outcome = self.rng.choice(outcomes)
+            self.custom_log("mystery_box", player=player)
             
             if outcome == "HEAL":
                 self.health[player] += 2
-                self.custom_log(f"💖 Miracle! +2 HP!")
+                self._touch("health")
+                self.custom_log("box_heal", player=player)
                 self._trigger_event("heal", target=player, amount=2)
             elif outcome == "HURT":
                 self.health[player] -= 1
-                self.custom_log(f"💥 Trap! -1 HP!")
+                self._touch("health", "stats")
+                self.custom_log("box_trap", player=player, dmg=1)
                 self._trigger_event("damage", target=player, amount=1, source=player)
                 if self.health[player] <= 0:
-                     self.custom_log(random.choice(CINEMATIC_DEATH).format(player))
+                     self.custom_log("death", player=player)
                      self.alive.remove(player)
                      self._trigger_event("death", player=player)
                      self._check_round_over()
             elif outcome == "LOOT":
-                loot = [random.choice(ALL_ITEMS) for _ in range(2)]
+                loot = [self.rng.choice(ALL_ITEMS) for _ in range(2)]
                 self.items[player].extend(loot)
-                self.custom_log(f"🎁 Jackpot! Found {loot}!")
+                self.custom_log("box_loot", player=player, loot=loot)
             elif outcome == "RELOAD":
-                self.custom_log(f"🔄 The box contained... a new gun?")
+                self.custom_log("box_reload", player=player)
                 self.new_round_deck()
+        return True
 
+    def perform(self, action):
+        """Apply an API-shaped action dict: {"type": "draw"|"use", ...}.
 
-    def get_state(self, requesting_player=None):
-        visible_logs = []
-        for log in self.logs:
-            if log['visible_to'] is None:
-                visible_logs.append(log['text'])
-            elif requesting_player and requesting_player in log['visible_to']:
-                visible_logs.append(log['text'])
-        
-        visible_logs = visible_logs[-20:]
+        Returns True if the action took effect, False if it was rejected.
+        """
+        action_type = action.get('type')
+        if action_type == 'draw':
+            return self.run_draw(action.get('target'), action.get('mode', MODE_SAFE))
+        if action_type == 'use':
+            return self.run_use(action.get('item'), action.get('target'), action.get('steal_item'))
+        return False
 
-        live_count = self.deck.count(BUST)
-        blank_count = self.deck.count(SAFE)
+    def perform_batch(self, actions):
+        """Apply actions in order for the current player, as one turn.
 
-        return {
+        Stops after the first action that is rejected or that hands the turn
+        over (or ends the round). Returns one step dict per attempted action.
+        """
+        steps = []
+        player = self.current()
+        for index, action in enumerate(actions):
+            ok = bool(self.perform(action))
+            turn_over = self.is_round_over() or self.current() != player
+            steps.append({"index": index, "type": action.get('type'), "ok": ok, "turn_over": turn_over})
+            if not ok or turn_over:
+                break
+        return steps
+
+    def ai_turn(self, player, time_budget=None):
+        """Play `player`'s whole turn with the expectimax bot. Returns actions taken."""
+        import solver # Local import: solver builds on this module
+
+        budget = solver.DEFAULT_TIME_BUDGET if time_budget is None else time_budget
+        taken = 0
+        while (taken < solver.MAX_ACTIONS_PER_TURN and not self.is_round_over()
+               and self.current() == player):
+            self.perform(solver.choose_action(self, player, budget))
+            taken += 1
+        return taken
+
+    def is_round_over(self):
+        return bool(self.round_winner) or len(self.alive) <= 1
+
+    def is_game_over(self):
+        return self.is_round_over() and self.round_num >= self.max_rounds
+
+    def grand_winner(self):
+        if not self.is_game_over():
+            return None
+        if self.round_winner:
+            return self.round_winner
+        return self.alive[0] if self.alive else None
+
+    def delta_fields(self, since_version=None):
+        """(full, changed) for a view since `since_version`; changed(field) says
+        whether a TRACKED_FIELDS entry must be sent. Shared by every state encoder."""
+        full = (since_version is None
+                or since_version < self.first_version
+                or since_version > self.version
+                or self.version - since_version > STATE_DELTA_WINDOW)
+
+        def changed(field):
+            return full or self._field_versions.get(field, 0) > since_version
+        return full, changed
+
+    @instrumented("get_state")
+    def get_state(self, requesting_player=None, since_version=None):
+        """Build the client view of the game.
+
+        With `since_version`, only the heavy fields (TRACKED_FIELDS) changed
+        after that version are included; cheap scalars are always sent.
+        A client too far behind (or from another game) gets a full snapshot,
+        flagged by "full": True.
+        """
+        full, changed = self.delta_fields(since_version)
+
+        # A final-round contract ends the match with several players still alive
+        game_over = self.is_game_over()
+        # Shoe counters: live includes the Sudden Death bullet
+        live_count = self.deck.live
+        blank_count = self.deck.blank
+
+        state = {
+            "version": self.version,
+            "full": full,
             "players": self.alive,
             "current_player": self.current(),
-            "health": self.health,
-            "max_health": self.player_max_health,
-            "items": self.items,
-            "classes": self.player_classes,
-            "logs": visible_logs,
-            "game_over": len(self.alive) <= 1 and self.round_num >= self.max_rounds,
+            "game_over": game_over,
             "round_winner": self.round_winner,
-            "winner": self.alive[0] if len(self.alive) == 1 else None,
+            "winner": self.grand_winner(),
             "deck_count": len(self.deck),
             "live_count": live_count,
             "blank_count": blank_count,
@@ -645,8 +989,22 @@ class CasinoGameEngine:
             "max_rounds": self.max_rounds,
             "blackout_next": self.blackout_for,
             "modifier": self.current_modifier,
-            "events": self.events,
-            "stats": self.stats if len(self.alive) <= 1 and self.round_num >= self.max_rounds else None,
-            "prize_pool": self.prize_pool
+            "prize_pool": self.prize_pool,
+            # This viewer's located shells and exact odds for the next one
+            "knowledge": self.knowledge.view(self.deck, requesting_player),
         }
-
+        if changed("health"):
+            state["health"] = self.health
+        if changed("max_health"):
+            state["max_health"] = self.player_max_health
+        if changed("items"):
+            state["items"] = self.items
+        if changed("classes"):
+            state["classes"] = self.player_classes
+        if changed("events"):
+            state["events"] = self.events.to_list()
+        if changed("stats"):
+            state["stats"] = self.stats if game_over else None
+        if changed("logs"):
+            state["logs"] = self.log_store.tail(requesting_player, LOG_WINDOW)
+        return state
@@ -0,0 +1,344 @@
+import atexit
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+from compact_state import STAT_KEYS
+from game_engine import DEFAULT_CONFIG, ENGINE_VERSION
+
+# =========================
+# MATCH HISTORY STORE
+# =========================
+# Finished matches go to SQLite. Request threads only enqueue a plain dict;
+# one background writer drains the queue and commits batches in a single
+# transaction. Leaderboards read per-player and per-class totals that the
+# writer keeps up to date, so they never scan the match tables.
+
+HISTORY_DB_PATH = "match_history.db"
+WRITE_BATCH = 500           # Max matches per transaction
+FLUSH_INTERVAL = 1.0        # Seconds the writer waits for a batch to fill
+MAX_PENDING = 100000        # Queue bound; submit() drops (and counts) beyond this
+MAX_PAGE = 100              # Row cap for every read endpoint
+
+# Per-player totals that can be ranked; each has its own index
+LEADERBOARD_STATS = ("wins", "matches", "kills", "dmg_dealt", "lucky_saves", "prize_money")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS matches (
+    id          INTEGER PRIMARY KEY,
+    room        TEXT,
+    finished_at REAL NOT NULL,
+    seed        INTEGER,
+    n_players   INTEGER NOT NULL,
+    rounds      INTEGER NOT NULL,
+    prize_pool  INTEGER NOT NULL,
+    winner      TEXT,
+    config      TEXT,               -- GameConfig.to_dict() as JSON; NULL: default rules
+    engine_version INTEGER
+);
+CREATE INDEX IF NOT EXISTS matches_finished ON matches (finished_at);
+
+CREATE TABLE IF NOT EXISTS match_players (
+    match_id    INTEGER NOT NULL REFERENCES matches (id),
+    seat        INTEGER NOT NULL,
+    player      TEXT NOT NULL,
+    class       TEXT NOT NULL,
+    won         INTEGER NOT NULL,
+    {", ".join(f"{k} INTEGER NOT NULL" for k in STAT_KEYS)},
+    PRIMARY KEY (match_id, seat)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS match_players_player ON match_players (player, match_id);
+
+CREATE TABLE IF NOT EXISTS player_totals (
+    player      TEXT PRIMARY KEY,
+    matches     INTEGER NOT NULL,
+    wins        INTEGER NOT NULL,
+    prize_money INTEGER NOT NULL,
+    {", ".join(f"{k} INTEGER NOT NULL" for k in STAT_KEYS)}
+) WITHOUT ROWID;
+{"".join(f"CREATE INDEX IF NOT EXISTS player_totals_{s} ON player_totals ({s} DESC);" for s in LEADERBOARD_STATS)}
+
+CREATE TABLE IF NOT EXISTS class_totals (
+    class       TEXT PRIMARY KEY,
+    matches     INTEGER NOT NULL,
+    wins        INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+_TOTAL_COLUMNS = ("matches", "wins", "prize_money") + STAT_KEYS
+
+# Columns added after the first schema: ALTERed into older databases on connect
+_ADDED_MATCH_COLUMNS = (("config", "TEXT"), ("engine_version", "INTEGER"))
+
+_INSERT_MATCH = ("INSERT INTO matches (room, finished_at, seed, n_players, rounds, prize_pool, winner, "
+                 "config, engine_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+_INSERT_PLAYER = (f"INSERT INTO match_players (match_id, seat, player, class, won, {', '.join(STAT_KEYS)}) "
+                  f"VALUES ({', '.join('?' * (5 + len(STAT_KEYS)))})")
+_UPSERT_PLAYER = (f"INSERT INTO player_totals (player, {', '.join(_TOTAL_COLUMNS)}) "
+                  f"VALUES ({', '.join('?' * (1 + len(_TOTAL_COLUMNS)))}) "
+                  f"ON CONFLICT (player) DO UPDATE SET "
+                  + ", ".join(f"{c} = {c} + excluded.{c}" for c in _TOTAL_COLUMNS))
+_UPSERT_CLASS = ("INSERT INTO class_totals (class, matches, wins) VALUES (?, ?, ?) "
+                 "ON CONFLICT (class) DO UPDATE SET matches = matches + excluded.matches, "
+                 "wins = wins + excluded.wins")
+
+
+def match_record(game, room=None, finished_at=None):
+    """Plain-dict summary of a finished engine, safe to hand to another thread."""
+    return {
+        "room": room,
+        "finished_at": finished_at if finished_at is not None else time.time(),
+        "seed": game.seed,
+        "config": game.config.to_dict(),
+        "engine_version": ENGINE_VERSION,
+        "rounds": game.round_num,
+        "prize_pool": game.prize_pool,
+        "winner": game.grand_winner(),
+        "players": [
+            (p, game.player_classes[p], {k: game.stats[p][k] for k in STAT_KEYS})
+            for p in game.original_players
+        ],
+    }
+
+
+class MatchHistory:
+    """SQLite-backed match log and leaderboards.
+
+    `submit()` never touches the database; reads open one connection per
+    thread. WAL mode lets those reads run while the writer commits.
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH, batch_size=WRITE_BATCH, flush_interval=FLUSH_INTERVAL,
+                 max_pending=MAX_PENDING):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    # ---------- connections ----------
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                existing = {row[1] for row in conn.execute("PRAGMA table_info(matches)")}
+                for name, kind in _ADDED_MATCH_COLUMNS:
+                    if name not in existing:
+                        conn.execute(f"ALTER TABLE matches ADD COLUMN {name} {kind}")
+                self._schema_ready = True
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # ---------- writes ----------
+
+    def submit(self, record):
+        """Queue a match_record() for the writer. Never blocks."""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Block until everything submitted so far is committed."""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name="history-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+
+    def _run_writer(self):
+        conn = self._connect()
+        try:
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size and batch[-1] is not None:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+                records = [r for r in batch if r is not None]
+                try:
+                    if records:
+                        self._write(conn, records)
+                except sqlite3.Error:
+                    # A bad batch must not kill the writer; it is counted and skipped
+                    self.failed += len(records)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if len(records) < len(batch):
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn, records):
+        players, totals, classes = [], {}, {}
+        with conn:
+            for r in records:
+                config = r.get("config")
+                cur = conn.execute(_INSERT_MATCH, (r["room"], r["finished_at"], r["seed"], len(r["players"]),
+                                                   r["rounds"], r["prize_pool"], r["winner"],
+                                                   json.dumps(config) if config else None,
+                                                   r.get("engine_version")))
+                match_id = cur.lastrowid
+                for seat, (name, cls, stats) in enumerate(r["players"]):
+                    won = int(name == r["winner"])
+                    row = [stats[k] for k in STAT_KEYS]
+                    players.append((match_id, seat, name, cls, won, *row))
+                    # Pre-aggregate the batch so each player/class is upserted once
+                    total = totals.setdefault(name, [0] * len(_TOTAL_COLUMNS))
+                    for i, v in enumerate((1, won, r["prize_pool"] if won else 0, *row)):
+                        total[i] += v
+                    c = classes.setdefault(cls, [0, 0])
+                    c[0] += 1
+                    c[1] += won
+            conn.executemany(_INSERT_PLAYER, players)
+            conn.executemany(_UPSERT_PLAYER, [(name, *t) for name, t in totals.items()])
+            conn.executemany(_UPSERT_CLASS, [(cls, *c) for cls, c in classes.items()])
+        self.written += len(records)
+
+    # ---------- reads ----------
+
+    def leaderboard(self, stat="wins", limit=10):
+        """Top players by a LEADERBOARD_STATS total (index-ordered, no scan)."""
+        if stat not in LEADERBOARD_STATS:
+            raise ValueError(f"Unknown stat {stat!r}; pick one of {', '.join(LEADERBOARD_STATS)}")
+        limit = max(1, min(limit, MAX_PAGE))
+        rows = self._reader().execute(
+            f"SELECT player, {', '.join(_TOTAL_COLUMNS)} FROM player_totals "
+            f"ORDER BY {stat} DESC LIMIT ?", (limit,)).fetchall()
+        return [self._player_row(row) for row in rows]
+
+    def player(self, name):
+        row = self._reader().execute(
+            f"SELECT player, {', '.join(_TOTAL_COLUMNS)} FROM player_totals WHERE player = ?", (name,)).fetchone()
+        return self._player_row(row) if row else None
+
+    @staticmethod
+    def _player_row(row):
+        out = dict(zip(("player",) + _TOTAL_COLUMNS, row))
+        out["win_rate"] = out["wins"] / out["matches"] if out["matches"] else 0.0
+        return out
+
+    def class_win_rates(self):
+        rows = self._reader().execute("SELECT class, matches, wins FROM class_totals ORDER BY class").fetchall()
+        return [{"class": cls, "matches": m, "wins": w, "win_rate": w / m if m else 0.0} for cls, m, w in rows]
+
+    def player_history(self, name, limit=20, before=None):
+        """Newest-first matches for one player; page with `before` = last match id seen."""
+        limit = max(1, min(limit, MAX_PAGE))
+        before = before if before is not None else 2 ** 63 - 1
+        rows = self._reader().execute(
+            f"SELECT m.id, m.room, m.finished_at, m.rounds, m.prize_pool, m.winner, p.class, p.won, "
+            f"{', '.join('p.' + k for k in STAT_KEYS)} "
+            f"FROM match_players p JOIN matches m ON m.id = p.match_id "
+            f"WHERE p.player = ? AND p.match_id < ? ORDER BY p.match_id DESC LIMIT ?",
+            (name, before, limit)).fetchall()
+        keys = ("match_id", "room", "finished_at", "rounds", "prize_pool", "winner", "class", "won") + STAT_KEYS
+        return [dict(zip(keys, row)) for row in rows]
+
+    def match(self, match_id):
+        conn = self._reader()
+        row = conn.execute("SELECT id, room, finished_at, seed, n_players, rounds, prize_pool, winner, "
+                           "config, engine_version FROM matches WHERE id = ?", (match_id,)).fetchone()
+        if row is None:
+            return None
+        out = dict(zip(("match_id", "room", "finished_at", "seed", "n_players", "rounds", "prize_pool", "winner",
+                        "config", "engine_version"), row))
+        out["config"] = json.loads(out["config"]) if out["config"] else DEFAULT_CONFIG.to_dict()
+        players = conn.execute(f"SELECT seat, player, class, won, {', '.join(STAT_KEYS)} FROM match_players "
+                               f"WHERE match_id = ? ORDER BY seat", (match_id,)).fetchall()
+        out["players"] = [dict(zip(("seat", "player", "class", "won") + STAT_KEYS, p)) for p in players]
+        return out
+
+    def stats(self):
+        return {"written": self.written, "pending": self.pending(), "dropped": self.dropped, "failed": self.failed}
+
+
+def main():
+    import argparse
+    import os
+    import random
+
+    from game_engine import PLAYER_CLASSES
+
+    parser = argparse.ArgumentParser(description="Fill a history DB with synthetic matches and time the reads")
+    parser.add_argument("--db", default="history_bench.db")
+    parser.add_argument("--matches", type=int, default=200000)
+    parser.add_argument("--players", type=int, default=2000, help="Distinct player names")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    rng = random.Random(0)
+    names = [f"Player{i}" for i in range(args.players)]
+    history = MatchHistory(args.db, batch_size=5000)
+
+    start = time.perf_counter()
+    for i in range(args.matches):
+        seats = rng.sample(names, rng.randint(2, 8))
+        players = [(p, rng.choice(PLAYER_CLASSES), {k: rng.randint(0, 6) for k in STAT_KEYS}) for p in seats]
+        history.submit({"room": "bench", "finished_at": i, "seed": i, "rounds": 3,
+                        "prize_pool": 200000, "winner": rng.choice(seats), "players": players})
+        while history.pending() > 50000:
+            time.sleep(0.01)
+    history.flush()
+    elapsed = time.perf_counter() - start
+    print(f"wrote {args.matches} matches in {elapsed:.1f}s ({args.matches / elapsed:.0f}/s)")
+
+    def bench(label, fn, n=200):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        print(f"{label:28s}: {(time.perf_counter() - start) / n * 1e3:7.3f} ms")
+
+    bench("leaderboard(kills)", lambda: history.leaderboard("kills"))
+    bench("leaderboard(lucky_saves)", lambda: history.leaderboard("lucky_saves"))
+    bench("class_win_rates", history.class_win_rates)
+    bench("player_history", lambda: history.player_history(rng.choice(names)))
+    bench("match", lambda: history.match(rng.randint(1, args.matches)))
+    history.close()
+
+
+if __name__ == "__main__":
+    main()
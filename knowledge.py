@@ -0,0 +1,152 @@
+from shoe import BUST, MAGIC_BULLET, SAFE
+
+# What a Lens shows for a live front shell: the Sudden Death bullet is disguised as a plain live round
+LIVE_OR_MAGIC = "Live or Sudden Death"
+
+
+class _Seen:
+    """One viewer's known shells plus running counts per kind."""
+
+    __slots__ = ("known", "blank", "live", "magic", "disguised")
+
+    def __init__(self):
+        self.known = {}      # absolute position since the reload -> shell kind
+        self.blank = 0
+        self.live = 0        # plain live rounds (not the Sudden Death bullet)
+        self.magic = 0
+        self.disguised = 0   # LIVE_OR_MAGIC
+
+    def _count(self, kind, delta):
+        if kind == SAFE:
+            self.blank += delta
+        elif kind == BUST:
+            self.live += delta
+        elif kind == MAGIC_BULLET:
+            self.magic += delta
+        else:
+            self.disguised += delta
+
+    def set(self, pos, kind):
+        old = self.known.get(pos)
+        if old is not None:
+            self._count(old, -1)
+        self.known[pos] = kind
+        self._count(kind, 1)
+
+    def drop(self, pos):
+        kind = self.known.pop(pos, None)
+        if kind is not None:
+            self._count(kind, -1)
+
+    def copy(self):
+        seen = _Seen.__new__(_Seen)
+        seen.known = dict(self.known)
+        seen.blank, seen.live, seen.magic, seen.disguised = self.blank, self.live, self.magic, self.disguised
+        return seen
+
+
+class DeckKnowledge:
+    """Per-player information sets over the loaded shells.
+
+    Everyone knows the remaining live/blank/Sudden Death counts (reloads
+    are announced and every fired or ejected shell is shown). On top of
+    that each player knows the positions their Lens and Phone revealed,
+    and everybody knows the front shell after an Inverter. Positions are
+    absolute since the last reload, so a draw or eject only drops the
+    front entry: every update is O(1) per player.
+
+    Given a player's known positions the unknown shells are a uniform
+    shuffle of what is left, which makes the readouts exact.
+    Viewer None is a spectator: public knowledge only.
+    """
+
+    __slots__ = ("_seen", "front")
+
+    def __init__(self, players=()):
+        self._seen = {p: _Seen() for p in players}
+        self._seen[None] = _Seen()
+        self.front = 0   # Absolute position of the current front shell
+
+    def clone(self):
+        copy = DeckKnowledge.__new__(DeckKnowledge)
+        copy._seen = {p: seen.copy() for p, seen in self._seen.items()}
+        copy.front = self.front
+        return copy
+
+    # ---------- updates (called by the engine) ----------
+
+    def reload(self):
+        for p in self._seen:
+            self._seen[p] = _Seen()
+        self.front = 0
+
+    def pop_front(self):
+        """The front shell was drawn or ejected."""
+        for seen in self._seen.values():
+            if seen.known:
+                seen.drop(self.front)
+        self.front += 1
+
+    def see(self, player, index, kind):
+        """`player` privately learned the shell `index` places from the front."""
+        seen = self._seen.get(player)
+        if seen is None:
+            seen = self._seen[player] = _Seen()
+        seen.set(self.front + index, kind)
+
+    def reveal_front(self, kind):
+        """Everybody learned the front shell."""
+        for seen in self._seen.values():
+            seen.set(self.front, kind)
+
+    # ---------- readouts ----------
+
+    def _of(self, viewer):
+        return self._seen.get(viewer) or self._seen[None]
+
+    def known(self, viewer=None):
+        """{index from the front: kind} of the shells `viewer` has located."""
+        return {pos - self.front: kind for pos, kind in sorted(self._of(viewer).known.items())}
+
+    def front_kind(self, viewer=None):
+        return self._of(viewer).known.get(self.front)
+
+    def live_chance(self, shoe, viewer=None):
+        """Exact probability, for `viewer`, that the next shell fires. None for an empty chamber
+        (the next draw reloads)."""
+        if not len(shoe):
+            return None
+        seen = self._of(viewer)
+        front = seen.known.get(self.front)
+        if front is not None:
+            return 0.0 if front == SAFE else 1.0
+        unknown = len(shoe) - len(seen.known)
+        return (shoe.live - seen.live - seen.magic - seen.disguised) / unknown
+
+    def sudden_death_chance(self, shoe, viewer=None):
+        """Exact probability, for `viewer`, that the next shell is the Sudden Death bullet."""
+        if not len(shoe) or not shoe.magic:
+            return 0.0
+        seen = self._of(viewer)
+        front = seen.known.get(self.front)
+        if front == MAGIC_BULLET:
+            return 1.0
+        if front in (SAFE, BUST):
+            return 0.0
+        hidden = shoe.magic - seen.magic
+        if not hidden:
+            return 0.0
+        # The unlocated bullet is equally likely to be any live shell not known to be plain live
+        live_slots = shoe.live - seen.live - seen.magic
+        if front == LIVE_OR_MAGIC:
+            return hidden / live_slots
+        unknown = len(shoe) - len(seen.known)
+        return (live_slots - seen.disguised) / unknown * hidden / live_slots
+
+    def view(self, shoe, viewer=None):
+        """The readout get_state serves to `viewer`."""
+        return {
+            "known": self.known(viewer),
+            "live_chance": self.live_chance(shoe, viewer),
+            "sudden_death_chance": self.sudden_death_chance(shoe, viewer),
+        }
@@ -0,0 +1,127 @@
+from collections import deque
+from itertools import islice
+
+DEFAULT_LOG_RETENTION = 200  # Lines kept per stream (public + each private tail)
+
+
+class LogRecord:
+    """One log line as data: a message code and its arguments.
+
+    The text is rendered by the store's `render(record)` the first time the
+    line is served and cached on the record, so lines nobody reads are
+    never formatted.
+    """
+
+    __slots__ = ("seq", "code", "args", "visible_to", "_text", "_render")
+
+    def __init__(self, seq, code, args, visible_to, render):
+        self.seq = seq
+        self.code = code
+        self.args = args
+        self.visible_to = visible_to
+        self._text = None
+        self._render = render
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self._render(self)
+        return self._text
+
+    def as_dict(self):
+        return {"seq": self.seq, "code": self.code, "args": self.args,
+                "visible_to": self.visible_to, "text": self.text}
+
+    def __repr__(self):
+        return f"LogRecord({self.seq}, {self.code!r}, {self.args!r})"
+
+
+class LogStore:
+    """Bounded game log indexed by viewer.
+
+    Public lines go to one ring buffer, private lines to a ring buffer per
+    viewer. Every line gets a sequence number, so "the last N lines visible
+    to X" is a merge of two short tails and costs O(N) no matter how long
+    the game has been running.
+
+    Lines are LogRecords rendered to text by `render(record)` only when
+    served. `archive`, if given, is called with every LogRecord to keep the
+    full history elsewhere.
+    """
+
+    def __init__(self, retention=DEFAULT_LOG_RETENTION, archive=None, render=None):
+        self.retention = retention
+        self.archive = archive
+        self.render = render or _render_code
+        self.seq = 0
+        self.public = deque(maxlen=retention)
+        self.private = {}
+
+    def __len__(self):
+        return self.seq
+
+    def append(self, code, args=None, visible_to=None):
+        self.seq += 1
+        record = LogRecord(self.seq, code, args or {}, visible_to, self.render)
+        if visible_to is None:
+            self.public.append(record)
+        else:
+            for viewer in visible_to:
+                tail = self.private.get(viewer)
+                if tail is None:
+                    tail = self.private[viewer] = deque(maxlen=self.retention)
+                tail.append(record)
+        if self.archive is not None:
+            self.archive(record)
+        return record
+
+    def records(self, viewer=None):
+        """Retained records visible to `viewer`, oldest first."""
+        own = self.private.get(viewer) if viewer else None
+        if not own:
+            return list(self.public)
+        return sorted(list(self.public) + list(own), key=lambda r: r.seq)
+
+    def find(self, codes=None, viewer=None, **args):
+        """Retained records visible to `viewer` with a code in `codes` whose
+        arguments match `args`, e.g. find(DAMAGE_LOGS, player="Bob")."""
+        if isinstance(codes, str):
+            codes = (codes,)
+        return [r for r in self.records(viewer)
+                if (codes is None or r.code in codes)
+                and all(r.args.get(k) == v for k, v in args.items())]
+
+    def tail(self, viewer=None, n=20):
+        """Texts of the last `n` lines visible to `viewer`, oldest first."""
+        public = list(islice(reversed(self.public), n))
+        own = self.private.get(viewer) if viewer else None
+        if not own:
+            return [r.text for r in reversed(public)]
+
+        private = list(islice(reversed(own), n))
+        # Both lists are newest-first; merge by sequence number
+        merged = []
+        i = j = 0
+        while len(merged) < n and (i < len(public) or j < len(private)):
+            if j >= len(private) or (i < len(public) and public[i].seq > private[j].seq):
+                merged.append(public[i])
+                i += 1
+            else:
+                merged.append(private[j])
+                j += 1
+        merged.reverse()
+        return [r.text for r in merged]
+
+    def sizes(self):
+        """Number of retained lines per stream, for monitoring. Safe without the room lock."""
+        sizes = {"public": len(self.public)}
+        # Metrics scrapes call this unlocked while append() may add a viewer's first private
+        # tail; list() copies the items in one step so the dict can't change mid-iteration
+        for viewer, tail in list(self.private.items()):
+            sizes[viewer] = len(tail)
+        return sizes
+
+
+def _render_code(record):
+    # Fallback for stores without a renderer: the code itself
+    return record.code
@@ -0,0 +1,376 @@
+import itertools
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from bot_scheduler import DEFAULT_BOT_KIND
+from rooms import MAX_PLAYERS, MIN_PLAYERS, RoomError, check_name
+
+# =========================
+# MATCHMAKING
+# =========================
+# A FIFO queue that seats players at fresh rooms `table_size` at a time and,
+# once the oldest player has waited `backfill_after` seconds, tops a short
+# table up with bots. Tournaments are multi-table elimination brackets: each
+# table plays a full match and its winner is re-seated at a new table (a new
+# engine) in the next stage, until one player is left.
+#
+# One background thread does all of it, woken by joins, finished tables and
+# the next backfill deadline. Tables are ordinary rooms: humans play them
+# through the room API and bot seats go through the shared BotScheduler,
+# which hands out one move at a time across every room, so hundreds of
+# tables progress side by side in one process.
+
+DEFAULT_TABLE_SIZE = 4
+DEFAULT_BACKFILL_AFTER = 30.0   # Seconds the oldest queued player waits before bots fill the table
+TOURNAMENT_TTL = 60 * 60        # Finished brackets stay queryable this long
+QUEUE_WAIT_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 20, 30, 45, 60, 120, 300, 600)
+
+log = logging.getLogger(__name__)
+
+
+def _check_table_size(table_size):
+    if not isinstance(table_size, int) or not MIN_PLAYERS <= table_size <= MAX_PLAYERS:
+        raise RoomError(f"Table size must be {MIN_PLAYERS}..{MAX_PLAYERS}")
+    return table_size
+
+
+def table_winner(game):
+    """Who advances from a finished table. A table where everyone fell has no
+    grand winner; the bracket then takes the best killer (damage breaks ties)."""
+    winner = game.grand_winner()
+    if winner:
+        return winner
+    return max(game.original_players, key=lambda p: (game.stats[p]["kills"], game.stats[p]["dmg_dealt"]))
+
+
+class Tournament:
+    """One elimination bracket. Mutated only by the Matchmaker, under its lock."""
+
+    def __init__(self, tournament_id, entrants, bots, table_size):
+        self.tournament_id = tournament_id
+        self.entrants = entrants
+        self.bots = bots             # name -> bot kind, for entrants the server plays
+        self.table_size = table_size
+        # stages[i] = list of tables {"room", "players", "winner"}; room None is a bye
+        self.stages = []
+        self.champion = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def stage_done(self):
+        return all(table["winner"] for table in self.stages[-1])
+
+    def summary(self):
+        return {
+            "tournament": self.tournament_id,
+            "table_size": self.table_size,
+            "entrants": self.entrants,
+            "bots": sorted(self.bots),
+            "stage": len(self.stages),
+            "stages": [[dict(table) for table in stage] for stage in self.stages],
+            "champion": self.champion,
+            "finished": self.champion is not None,
+        }
+
+
+class Matchmaker:
+    """Queue + bracket scheduler on top of a RoomRegistry.
+
+    `on_start(room)` is called with the room lock held after each table
+    starts (the app uses it to poke the bot scheduler). With a
+    MetricsRegistry as `metrics`, queue waits are recorded as a histogram.
+    """
+
+    def __init__(self, registry, on_start=None, table_size=DEFAULT_TABLE_SIZE,
+                 backfill_after=DEFAULT_BACKFILL_AFTER, bot_kind=DEFAULT_BOT_KIND, metrics=None, seed=None):
+        self.registry = registry
+        self.on_start = on_start
+        self.table_size = _check_table_size(table_size)
+        self.backfill_after = backfill_after
+        self.bot_kind = bot_kind
+        self._rng = random.Random(seed)  # Bracket seating only
+        self._cond = threading.Condition()
+        self._queue = OrderedDict()      # name -> monotonic enqueue time, oldest first
+        self._seated = {}                # name -> room id of their current table
+        self._tournaments = {}
+        self._tables = {}                # room id -> (tournament, stage, table index)
+        self._reports = []               # (room id, winner, players) of finished tables, for the worker
+        self._worker = None
+        self._stopped = False
+        self.players_seated = 0
+        self.tables_started = 0
+        self.bots_backfilled = 0
+        self.tables_failed = 0
+        self._wait = None
+        if metrics is not None:
+            self._wait = metrics.histogram("matchmaking_wait_seconds", "Seconds players spent queued before seating",
+                                           buckets=QUEUE_WAIT_BUCKETS)
+
+    # ---------- queue ----------
+
+    def enqueue(self, name):
+        check_name(name)
+        with self._cond:
+            if name not in self._queue:
+                self._seated.pop(name, None)
+                self._queue[name] = time.monotonic()
+                self._ensure_started()
+                self._cond.notify()
+            return self._status(name)
+
+    def leave(self, name):
+        with self._cond:
+            return self._queue.pop(name, None) is not None
+
+    def status(self, name):
+        with self._cond:
+            return self._status(name)
+
+    def _status(self, name):
+        if name in self._queue:
+            position = list(self._queue).index(name)
+            return {"status": "queued", "name": name, "position": position + 1,
+                    "waited": time.monotonic() - self._queue[name]}
+        if name in self._seated:
+            return {"status": "seated", "name": name, "room": self._seated[name]}
+        return None
+
+    def depth(self):
+        return len(self._queue)
+
+    def oldest_wait(self):
+        with self._cond:
+            if not self._queue:
+                return 0.0
+            return time.monotonic() - next(iter(self._queue.values()))
+
+    def stats(self):
+        with self._cond:
+            active = sum(1 for t in self._tournaments.values() if t.champion is None)
+            return {"queued": len(self._queue), "table_size": self.table_size,
+                    "backfill_after": self.backfill_after, "players_seated": self.players_seated,
+                    "tables_started": self.tables_started, "bots_backfilled": self.bots_backfilled,
+                    "tables_failed": self.tables_failed,
+                    "tournaments_active": active}
+
+    # ---------- tournaments ----------
+
+    def create_tournament(self, players, bots=(), table_size=None):
+        """Start a bracket for `players` (humans) and `bots` (names the server plays)."""
+        table_size = _check_table_size(table_size or self.table_size)
+        if not isinstance(players, (list, tuple)) or not isinstance(bots, (list, tuple)):
+            raise RoomError("Players and bots must be lists of names")
+        entrants = [check_name(name) for name in list(players) + list(bots)]
+        if len(entrants) < MIN_PLAYERS:
+            raise RoomError(f"Need at least {MIN_PLAYERS} entrants")
+        if len(set(entrants)) != len(entrants):
+            raise RoomError("Entrant names must be unique")
+        tournament = Tournament(uuid.uuid4().hex[:8], entrants, {b: self.bot_kind for b in bots}, table_size)
+        with self._cond:
+            now = time.time()
+            for tid, old in list(self._tournaments.items()):
+                if old.finished_at is not None and now - old.finished_at > TOURNAMENT_TTL:
+                    del self._tournaments[tid]
+            self._tournaments[tournament.tournament_id] = tournament
+            seating = self._seat_stage(tournament, entrants)
+        self._open(seating)
+        return self.tournament(tournament.tournament_id)
+
+    def tournament(self, tournament_id):
+        with self._cond:
+            tournament = self._tournaments.get(tournament_id)
+            if tournament is None:
+                raise RoomError(f"Tournament {tournament_id} not found", status=404)
+            return tournament.summary()
+
+    def tournaments(self):
+        with self._cond:
+            return [t.summary() for t in self._tournaments.values()]
+
+    def report(self, room, game):
+        """Hand over a just-finished table. Cheap; the worker does the rest."""
+        with self._cond:
+            if room.room_id not in self._tables and not any(self._seated.get(p) == room.room_id
+                                                             for p in game.original_players):
+                return
+            self._reports.append((room.room_id, table_winner(game), list(game.original_players)))
+            self._ensure_started()
+            self._cond.notify()
+
+    def _seat_stage(self, tournament, players):
+        """Append a stage for `players`; returns the tables to open. Caller holds the lock.
+
+        Tables are dealt round-robin from a shuffled list so sizes differ by at
+        most one; a table of one is a bye.
+        """
+        players = players[:]
+        self._rng.shuffle(players)
+        n_tables = -(-len(players) // tournament.table_size)
+        stage = len(tournament.stages)
+        tables, seating = [], []
+        for i in range(n_tables):
+            seats = players[i::n_tables]
+            table = {"room": None, "players": seats, "winner": seats[0] if len(seats) == 1 else None}
+            tables.append(table)
+            if table["winner"] is None:
+                seating.append((seats, {p: tournament.bots[p] for p in seats if p in tournament.bots},
+                                (tournament, stage, i)))
+        tournament.stages.append(tables)
+        return seating
+
+    def _advance(self, room_id, winner):
+        """Record a bracket table's winner; returns tables to open. Caller holds the lock."""
+        tournament, stage, index = self._tables.pop(room_id)
+        tournament.stages[stage][index]["winner"] = winner
+        if not tournament.stage_done():
+            return []
+        winners = [table["winner"] for table in tournament.stages[-1]]
+        if len(winners) == 1:
+            tournament.champion = winners[0]
+            tournament.finished_at = time.time()
+            return []
+        return self._seat_stage(tournament, winners)
+
+    # ---------- worker ----------
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+
+    def _ensure_started(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="matchmaker", daemon=True)
+            self._worker.start()
+
+    def _take_tables(self, now):
+        """Pop full tables (and a backfilled one if the oldest ticket is due) off the queue.
+
+        Caller holds the lock. Returns (seating, seconds until the next backfill or None).
+        """
+        seating = []
+        while self._queue and (len(self._queue) >= self.table_size
+                               or now - next(iter(self._queue.values())) >= self.backfill_after):
+            humans = []
+            while self._queue and len(humans) < self.table_size:
+                name, enqueued = self._queue.popitem(last=False)
+                humans.append(name)
+                if self._wait is not None:
+                    self._wait.observe(now - enqueued)
+            bots = {}
+            for i in itertools.count(1):
+                if len(humans) + len(bots) >= max(self.table_size, MIN_PLAYERS):
+                    break
+                name = f"Bot {i}"
+                if name not in humans:
+                    bots[name] = self.bot_kind
+            seating.append((humans + list(bots), bots, None))
+        wait = None
+        if self._queue:
+            wait = next(iter(self._queue.values())) + self.backfill_after - now
+        return seating, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                seating, wait = self._take_tables(time.monotonic())
+                for room_id, winner, players in self._reports:
+                    if room_id in self._tables:
+                        seating.extend(self._advance(room_id, winner))
+                    else:
+                        # A queue table is over; its players are no longer seated anywhere
+                        for p in players:
+                            if self._seated.get(p) == room_id:
+                                del self._seated[p]
+                self._reports.clear()
+                if not seating:
+                    self._cond.wait(timeout=wait)
+                    continue
+            # Rooms are created and started without the matchmaker lock held
+            self._open(seating)
+
+    def _open(self, seating):
+        for players, bots, bracket in seating:
+            room = self.registry.create()
+            with room.lock:
+                try:
+                    for name in players:
+                        # Queued humans are humans whatever their name
+                        room.join(name, bot=bots.get(name, False))
+                    room.start()
+                except Exception:
+                    # One bad table must not kill the worker and strand everyone queued behind it
+                    log.exception("Could not start table %s for %s", room.room_id, players)
+                    self.registry.remove(room.room_id)
+                    with self._cond:
+                        self.tables_failed += 1
+                    continue
+                with self._cond:
+                    for name in players:
+                        if name not in bots:
+                            self._seated[name] = room.room_id
+                    if bracket is not None:
+                        tournament, stage, index = bracket
+                        tournament.stages[stage][index]["room"] = room.room_id
+                        self._tables[room.room_id] = bracket
+                    self.tables_started += 1
+                    self.players_seated += len(players) - len(bots)
+                    if bracket is None:
+                        self.bots_backfilled += len(bots)
+                if self.on_start:
+                    self.on_start(room)
+
+
+def main():
+    import argparse
+
+    from bot_scheduler import BotScheduler
+    from rooms import RoomRegistry
+
+    parser = argparse.ArgumentParser(description="Run an all-bot bracket to size hardware for event nights")
+    parser.add_argument("--entrants", type=int, default=400)
+    parser.add_argument("--table-size", type=int, default=DEFAULT_TABLE_SIZE)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--cpu-share", type=float, default=1.0, help="Cores the bot scheduler may use")
+    parser.add_argument("--bot", default="random", help="Bot kind for every entrant")
+    args = parser.parse_args()
+
+    matchmaker = None
+    finished = {}  # room id -> seconds after start
+
+    def settle(room):
+        game = room.take_finished()
+        if game:
+            finished[room.room_id] = time.perf_counter() - start
+            matchmaker.report(room, game)
+
+    scheduler = BotScheduler(after_move=settle, workers=args.workers, cpu_share=args.cpu_share)
+    matchmaker = Matchmaker(RoomRegistry(), on_start=scheduler.poke, bot_kind=args.bot, seed=0)
+    start = time.perf_counter()
+    tournament = matchmaker.create_tournament([], [f"Bot{i}" for i in range(args.entrants)], args.table_size)
+    while not tournament["finished"]:
+        time.sleep(0.2)
+        tournament = matchmaker.tournament(tournament["tournament"])
+    elapsed = time.perf_counter() - start
+
+    stats = scheduler.stats()
+    print(f"{args.entrants} entrants, {matchmaker.tables_started} tables, {len(tournament['stages'])} stages "
+          f"in {elapsed:.1f}s; champion {tournament['champion']}")
+    print(f"{stats['moves']} bot moves ({stats['moves'] / elapsed:.0f}/s), {stats['cpu_seconds']:.1f} CPU s")
+    first = sorted(finished[t["room"]] for t in tournament["stages"][0] if t["room"])
+    print(f"stage 1 tables finished between {first[0]:.1f}s and {first[-1]:.1f}s "
+          f"(median {first[len(first) // 2]:.1f}s)")
+    scheduler.stop()
+    matchmaker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bots import legal_actions
+from game_engine import ALL_ITEMS, BUST, ITEM_DIAMOND, ITEM_SKIP, ITEM_STEAL, MAGIC_BULLET, MODE_SAFE, SAFE
+from knowledge import LIVE_OR_MAGIC
+from shoe import Shoe
+from snapshot import EngineSnapshot
+
+# =========================
+# IS-MCTS BOT
+# =========================
+# Single-observer information-set MCTS over the full engine. Every iteration
+# samples a determinization of what the searching player cannot see (the
+# shell order outside their Lens/Phone/Inverter knowledge, a secret contract
+# they don't hold, and every future RNG draw: backfires, crits, Mystery
+# Boxes, blackouts, reloads), then walks one shared tree on a restored
+# engine and finishes the round with PlayoutPolicy. Inventories, health and
+# the chamber's counts are public, so they are taken as they are.
+#
+# Tree edges are moves; after each move the searching player's observation
+# (every public outcome plus their own read of the front shell) picks the
+# next decision point, so a blank, a backfire or a Lens read all lead to
+# their own follow-up decisions. A move's reward is the round-win rate of
+# the seat making it (max^n); the match winner is the final round's winner,
+# so rounds are what every seat plays for. With workers > 1 the search runs
+# root-parallel: each process grows its own tree from the same root until a
+# shared wall-clock deadline and the root visit counts are summed.
+
+DEFAULT_TIME_BUDGET = 0.05      # Seconds per decision
+DEFAULT_EXPLORATION = 0.7       # UCB1 constant; rewards are in [0, 1]
+MAX_PLAYOUT_ACTIONS = 300       # A playout still running after this is scored as a split pot
+MIN_ITERATIONS = 8              # Always searched, even past the deadline
+PLAYOUT_ITEM_CHANCE = 0.2       # How often the playout policy uses an item instead of shooting
+
+
+def action_key(action):
+    return (action["type"], action.get("item"), action.get("target"), action.get("mode"))
+
+
+def key_action(key):
+    kind, item, target, mode = key
+    if kind == "draw":
+        return {"type": "draw", "target": target, "mode": mode}
+    return {"type": "use", "item": item, "target": target}
+
+
+class _Move:
+    """An edge of the tree: one action from a decision point, with its statistics and the
+    decision points it led to, keyed by what the searching player observed afterwards."""
+
+    __slots__ = ("actor", "visits", "reward", "avail", "outcomes")
+
+    def __init__(self, actor):
+        self.actor = actor      # Seat making the move
+        self.visits = 0
+        self.reward = 0.0       # Summed round wins for `actor`
+        self.avail = 0          # Iterations in which this move was legal (ISMCTS UCB)
+        self.outcomes = {}      # observation -> {action key: _Move}
+
+
+# ---------- determinization ----------
+
+def viewer_info(game, viewer):
+    """(known, bounty): what `viewer` knows beyond public state, in the picklable form
+    search() and determinize() take. `bounty` is only set for the contract's holder."""
+    bounty = game.bounty if game.bounty and game.bounty["assassin"] == viewer else None
+    return game.knowledge.known(viewer), bounty
+
+
+def determinize(snap, viewer, known, bounty, rng):
+    """A headless engine from `snap` with everything `viewer` cannot see resampled."""
+    game = snap.restore()
+
+    # Shells: located ones stay put, "live or Sudden Death" slots get a random firing shell,
+    # the rest is a uniform shuffle of what's left
+    deck = game.deck
+    pool = [SAFE] * deck.blank + [BUST] * (deck.live - deck.magic) + [MAGIC_BULLET] * deck.magic
+    shells = [None] * len(deck)
+    disguised = []
+    for index, kind in known.items():
+        if index >= len(shells):
+            continue
+        if kind == LIVE_OR_MAGIC:
+            disguised.append(index)
+        else:
+            shells[index] = kind
+            pool.remove(kind)
+    rng.shuffle(pool)
+    for index in disguised:
+        firing = next(i for i, shell in enumerate(pool) if shell != SAFE)
+        shells[index] = pool.pop(firing)
+    it = iter(pool)
+    game.deck = Shoe(shell if shell is not None else next(it) for shell in shells)
+    for index, kind in known.items():
+        game.knowledge.see(viewer, index, kind)
+
+    # Contract: a non-holder only knows the prior. Expiry on reload is not tracked, so
+    # this slightly overestimates how often one is live late in a round.
+    if bounty is None and game.round_num > 1:
+        seats = game.original_players
+        chance = game.config.bounty_chance
+        n = len(seats)
+        # P(some other seat holds one | the viewer doesn't)
+        if n > 1 and rng.random() < chance * (n - 1) / n / (1 - chance / n):
+            assassin = rng.choice([p for p in seats if p != viewer])
+            game.bounty = {"assassin": assassin, "target": rng.choice([p for p in seats if p != assassin])}
+        else:
+            game.bounty = None
+    else:
+        game.bounty = dict(bounty) if bounty else None
+
+    game.rng.seed(rng.getrandbits(64))
+    return game
+
+
+# ---------- search ----------
+
+class PlayoutPolicy:
+    """Cheap default policy for playouts: shoot yourself when the next shell is more
+    likely blank (by what this seat knows), a random opponent otherwise, and now and
+    then use a random item. Never takes a Risk Shot."""
+
+    def __init__(self, seed=None, item_chance=PLAYOUT_ITEM_CHANCE):
+        self.rng = random.Random(seed)
+        self.item_chance = item_chance
+
+    def __call__(self, game, player):
+        rng = self.rng
+        inventory = game.items[player]
+        opponents = [p for p in game.alive if p != player]
+        if inventory and not game.blocked.get(player) and rng.random() < self.item_chance:
+            item = rng.choice(inventory)
+            target = None
+            if item in (ITEM_STEAL, ITEM_SKIP):
+                target = rng.choice(opponents)
+            elif item == ITEM_DIAMOND:
+                target = rng.choice(ALL_ITEMS)
+            return {"type": "use", "item": item, "target": target}
+        chance = game.knowledge.live_chance(game.deck, player)
+        target = player if chance is not None and chance < 0.5 else rng.choice(opponents)
+        return {"type": "draw", "target": target, "mode": MODE_SAFE}
+
+
+def _observation(game, viewer):
+    """What `viewer` can tell apart after a move: every public outcome (shell fired, damage,
+    backfire, reload, Mystery Box, blackout, whose turn) plus their own read of the front shell."""
+    deck = game.deck
+    return (game.current(), len(deck), deck.live, game.blackout_for, game.knowledge.front_kind(viewer),
+            tuple(game.health[p] for p in game.original_players),
+            tuple(len(game.items[p]) for p in game.original_players))
+
+
+def _rewards(game):
+    """seat -> reward for a finished (or abandoned) playout."""
+    if game.round_winner:
+        return {game.round_winner: 1.0}
+    if len(game.alive) <= 1:
+        return {game.alive[0]: 1.0} if game.alive else {}
+    share = 1.0 / len(game.alive)
+    return {p: share for p in game.alive}
+
+
+def _iterate(root, snap, viewer, known, bounty, rng, rollout, exploration):
+    game = determinize(snap, viewer, known, bounty, rng)
+    moves = root
+    path = []
+    actions = 0
+
+    # Selection / expansion over the moves legal in this determinization. One new
+    # decision point is added per iteration.
+    while not game.is_round_over():
+        player = game.current()
+        legal = {action_key(a): a for a in legal_actions(game, player)}
+        untried = [k for k in legal if k not in moves]
+        if untried:
+            key = rng.choice(untried)
+            moves[key] = _Move(player)
+        else:
+            key, best_score = None, -1.0
+            for k in legal:
+                move = moves[k]
+                score = move.reward / move.visits + exploration * math.sqrt(math.log(move.avail + 1) / move.visits)
+                if score > best_score:
+                    key, best_score = k, score
+        for k in legal:
+            if k in moves:
+                moves[k].avail += 1
+        move = moves[key]
+        game.perform(legal[key])
+        actions += 1
+        path.append(move)
+        seen = _observation(game, viewer)
+        moves = move.outcomes.get(seen)
+        if moves is None:
+            move.outcomes[seen] = {}
+            break
+
+    # Playout
+    while not game.is_round_over() and actions < MAX_PLAYOUT_ACTIONS:
+        game.perform(rollout(game, game.current()))
+        actions += 1
+
+    rewards = _rewards(game)
+    for move in path:
+        move.visits += 1
+        move.reward += rewards.get(move.actor, 0.0)
+
+
+def search(blob, viewer, known, bounty, deadline=None, iterations=None, seed=None,
+           exploration=DEFAULT_EXPLORATION):
+    """Grow one tree from snapshot bytes `blob` for the player to move, who is `viewer`.
+
+    Stops at the wall-clock `deadline` (time.time()) or after `iterations`,
+    whichever comes first. Returns ({action key: [visits, reward]}, iterations).
+    Module-level so it can run in a worker process.
+    """
+    snap = EngineSnapshot.from_bytes(blob)
+    rng = random.Random(seed)
+    rollout = PlayoutPolicy(rng.getrandbits(64))
+    root = {}
+    done = 0
+    while True:
+        if iterations is not None and done >= iterations:
+            break
+        if deadline is not None and done >= MIN_ITERATIONS and time.time() >= deadline:
+            break
+        _iterate(root, snap, viewer, known, bounty, rng, rollout, exploration)
+        done += 1
+    return {key: [move.visits, move.reward] for key, move in root.items()}, done
+
+
+class MCTSBot:
+    """IS-MCTS policy. `workers` > 1 searches root-parallel on a process pool (created on
+    first use; call close() when done). With workers=1 it searches in the calling thread,
+    which is what the bot scheduler and the tournament runner want."""
+
+    def __init__(self, seed=None, time_budget=DEFAULT_TIME_BUDGET, workers=1, exploration=DEFAULT_EXPLORATION):
+        self.rng = random.Random(seed)
+        self.time_budget = time_budget
+        self.workers = workers
+        self.exploration = exploration
+        self.iterations = 0     # Playouts run by the last decision, over all workers
+        self._pool = None
+
+    def __call__(self, game, player):
+        legal = legal_actions(game, player)
+        if len(legal) == 1:
+            self.iterations = 0
+            return legal[0]
+
+        blob = game.snapshot().to_bytes()
+        known, bounty = viewer_info(game, player)
+        deadline = time.time() + self.time_budget
+        seeds = [self.rng.getrandbits(64) for _ in range(self.workers)]
+        if self.workers <= 1:
+            results = [search(blob, player, known, bounty, deadline, seed=seeds[0], exploration=self.exploration)]
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            futures = [self._pool.submit(search, blob, player, known, bounty, deadline, None, seed,
+                                         self.exploration) for seed in seeds]
+            results = [f.result() for f in futures]
+
+        totals = {}
+        self.iterations = 0
+        for stats, done in results:
+            self.iterations += done
+            for key, (visits, reward) in stats.items():
+                entry = totals.setdefault(key, [0, 0.0])
+                entry[0] += visits
+                entry[1] += reward
+        # Most visited root move; ties go to the better mean
+        key = max(totals, key=lambda k: (totals[k][0], totals[k][1] / totals[k][0]))
+        return key_action(key)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark IS-MCTS playouts per second, serial vs root-parallel")
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--budget", type=float, default=1.0, help="Seconds of search per measurement")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    from game_engine import CasinoGameEngine
+
+    game = CasinoGameEngine([f"Player{i + 1}" for i in range(args.players)], headless=True, seed=args.seed)
+    player = game.current()
+    for workers in (int(w) for w in args.workers.split(",")):
+        bot = MCTSBot(args.seed, args.budget, workers)
+        bot(game, player)   # Warm the pool up so process start-up isn't timed
+        start = time.perf_counter()
+        action = bot(game, player)
+        elapsed = time.perf_counter() - start
+        bot.close()
+        print(f"workers {workers:2d}: {bot.iterations / elapsed:8.0f} playouts/s "
+              f"({bot.iterations} in {elapsed:.2f}s) -> {action}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
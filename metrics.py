@@ -0,0 +1,202 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+# =========================
+# METRICS
+# =========================
+# Counters and histograms updated in place on the hot path; nothing is
+# formatted until /api/metrics is scraped. Gauges are callbacks evaluated
+# only at scrape time. Output is the Prometheus text exposition format.
+
+METRIC_PREFIX = "roulette_"
+
+# Seconds. HTTP buckets stretch to the long-poll timeout.
+HTTP_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ENGINE_BUCKETS = (0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = METRIC_PREFIX + name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set. observe() is a bisect and three adds."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=HTTP_BUCKETS):
+        self.name = METRIC_PREFIX + name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, labels=()):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, count) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = _labels(self.labelnames, labels, [("le", _number(bound))])
+                lines.append(f"{self.name}_bucket{le} {running}")
+            base = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{base} {total!r}")
+            lines.append(f"{self.name}_count{base} {count}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time: `fn()` returns a number or a {label values: number} dict.
+
+    `kind="counter"` exposes a monotonic value something else already keeps.
+    """
+
+    def __init__(self, name, help_text, fn, labelnames=(), kind="gauge"):
+        self.name = METRIC_PREFIX + name
+        self.help = help_text
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        value = self.fn()
+        items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        for labels, v in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# =========================
+# ENGINE INSTRUMENTATION
+# =========================
+class EngineMetrics:
+    """Per-operation timings shared by every engine it is handed to."""
+
+    # Item labels come from client input; anything past this many distinct values is "other"
+    MAX_ITEM_LABELS = 32
+
+    def __init__(self, registry):
+        self.ops = registry.histogram("engine_op_seconds", "Engine operation latency by op and item",
+                                      ("op", "item"), buckets=ENGINE_BUCKETS)
+        self._items = set()
+
+    def observe(self, op, item, seconds):
+        if not isinstance(item, str):
+            item = "other"
+        elif item not in self._items:
+            if len(self._items) >= self.MAX_ITEM_LABELS:
+                item = "other"
+            else:
+                self._items.add(item)
+        self.ops.observe(seconds, (op, item))
+
+
+def instrumented(op, by_item=False):
+    """Time an engine method into `self.metrics` when the engine has one.
+
+    With `by_item` the method's first argument (run_use's item) becomes the
+    "item" label. Engines without metrics (simulations, bots) pay one
+    attribute check.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            metrics = self.metrics
+            if metrics is None:
+                return fn(self, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(self, *args, **kwargs)
+            finally:
+                item = (args[0] if args else kwargs.get("item")) if by_item else None
+                metrics.observe(op, item or "", time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# Process-wide registry used by the server
+REGISTRY = MetricsRegistry()
+ENGINE_METRICS = EngineMetrics(REGISTRY)
@@ -0,0 +1,257 @@
+import threading
+import time
+import uuid
+
+from bot_scheduler import DEFAULT_BOT_KIND
+from game_engine import CasinoGameEngine
+from metrics import ENGINE_METRICS
+
+# =========================
+# ROOM CONFIG
+# =========================
+MAX_PLAYERS = 8
+MIN_PLAYERS = 2
+MAX_NAME_LENGTH = 32         # Characters; names are shown in every log line
+ROOM_IDLE_TTL = 30 * 60      # Rooms nobody touched for 30 min are collected
+FINISHED_ROOM_TTL = 5 * 60   # Finished games linger a bit for the stats screen
+GC_INTERVAL = 30             # Seconds between garbage-collection sweeps
+STREAM_TIMEOUT = 25          # Max seconds a long-poll waits before returning empty
+DEFAULT_ROOM = "main"        # Room used by the legacy un-scoped /api/* routes
+
+
+class RoomError(Exception):
+    """Raised for invalid room operations. Carries an HTTP status for the API."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def check_name(name):
+    """`name` if it can be seated; names end up in events, logs and dict keys."""
+    if not isinstance(name, str) or not name:
+        raise RoomError("Name must be a non-empty string")
+    if len(name) > MAX_NAME_LENGTH:
+        raise RoomError(f"Name too long (max {MAX_NAME_LENGTH} characters)")
+    return name
+
+
+class Room:
+    """One table: its own lobby, its own engine and its own lock."""
+
+    def __init__(self, room_id):
+        self.room_id = room_id
+        self.lock = threading.RLock()
+        # Long-poll waiters sleep on this; every mutation wakes them up
+        self.changed = threading.Condition(self.lock)
+        self.lobby = []
+        # Bot seats: name -> bot kind (see bot_scheduler.BOT_KINDS)
+        self.bots = {}
+        self.game = None
+        self.game_started = False
+        # Bumped whenever the game is replaced, so engine versions from different games never collide
+        self.generation = 0
+        # Highest state version any game in this room has reached; the next game starts above it
+        self.last_version = 0
+        # Set once the finished game has been handed to the match history
+        self.recorded = False
+        self.created_at = time.time()
+        self.last_active = self.created_at
+
+    def touch(self):
+        self.last_active = time.time()
+
+    def notify(self):
+        """Wake up stream waiters. Caller must hold the room lock."""
+        self.changed.notify_all()
+
+    def wait_for_events(self, since, timeout=STREAM_TIMEOUT):
+        """Block until the game has events newer than `since` (or is replaced).
+
+        Caller must hold the room lock; it is released while waiting.
+        Returns (events, resync). `resync` is True when the game was started
+        or reset underneath the client, or the cursor fell off the buffer.
+        """
+        game = self.game
+
+        def ready():
+            if self.game is not game:
+                return True
+            return game is not None and game.events.has_after(since)
+
+        self.changed.wait_for(ready, timeout=timeout)
+        if self.game is not game:
+            return (self.game.events_since(None)[0] if self.game else []), True
+        if game is None:
+            return [], False
+        return game.events_since(since)
+
+    def join(self, name, bot=None):
+        """Seat `name`; `bot` is a bot kind for a server-played seat, False for a human.
+
+        None (older clients never send it) falls back to the original rule:
+        a name containing "Auto" or "Bot" is a DEFAULT_BOT_KIND seat.
+        """
+        if self.game_started:
+            raise RoomError("Game already in progress")
+        check_name(name)
+        if name in self.lobby:
+            # Rejoining is a no-op
+            return
+        if len(self.lobby) >= MAX_PLAYERS:
+            raise RoomError(f"Lobby full (max {MAX_PLAYERS})")
+        self.lobby.append(name)
+        if bot is None and ("Auto" in name or "Bot" in name):
+            bot = DEFAULT_BOT_KIND
+        if bot:
+            self.bots[name] = bot
+
+    def start(self):
+        if len(self.lobby) < MIN_PLAYERS:
+            raise RoomError(f"Need at least {MIN_PLAYERS} players")
+        self._retire_game()
+        self.game = CasinoGameEngine(self.lobby[:], metrics=ENGINE_METRICS, first_version=self.last_version + 1)
+        self.generation += 1
+        self.game_started = True
+        self.recorded = False
+        self.notify()
+
+    def reset(self):
+        self._retire_game()
+        self.game = None
+        self.generation += 1
+        self.game_started = False
+        self.lobby = []
+        self.bots = {}
+        self.notify()
+
+    def _retire_game(self):
+        if self.game:
+            self.last_version = max(self.last_version, self.game.version)
+
+    def is_finished(self):
+        if not self.game:
+            return False
+        # Not just "one left alive": a final-round contract ends the match with everyone standing
+        return self.game.is_game_over()
+
+    def is_bot(self, name):
+        return name in self.bots
+
+    def all_bots(self):
+        return bool(self.lobby) and all(name in self.bots for name in self.lobby)
+
+    def bot_to_act(self):
+        """The bot seat that should move now, if any. Caller must hold the room lock."""
+        game = self.game
+        if game is None or game.is_round_over():
+            return None
+        current = game.current()
+        return current if current in self.bots else None
+
+    def bot_pending(self):
+        """True if the bot scheduler has work here: a bot's move, or the next round at an all-bot table."""
+        game = self.game
+        if game is None:
+            return False
+        if game.is_round_over():
+            return not game.is_game_over() and self.all_bots()
+        return game.current() in self.bots
+
+    def take_finished(self):
+        """The game if it just finished and hasn't been recorded yet, else None.
+
+        Caller must hold the room lock.
+        """
+        if self.recorded or not self.is_finished():
+            return None
+        self.recorded = True
+        return self.game
+
+    def is_expired(self, now, idle_ttl=ROOM_IDLE_TTL):
+        idle = now - self.last_active
+        if self.is_finished():
+            return idle > FINISHED_ROOM_TTL
+        return idle > idle_ttl
+
+    def summary(self):
+        return {
+            "room": self.room_id,
+            "lobby": self.lobby,
+            "bots": sorted(self.bots),
+            "started": self.game_started,
+            "finished": self.is_finished(),
+        }
+
+
+class RoomRegistry:
+    """Holds every live room keyed by id.
+
+    The registry lock only guards the dict itself; all game work happens
+    under the owning room's lock so one busy table never blocks another.
+    """
+
+    def __init__(self, idle_ttl=ROOM_IDLE_TTL, gc_interval=GC_INTERVAL):
+        self._rooms = {}
+        self._lock = threading.Lock()
+        self.idle_ttl = idle_ttl
+        self.gc_interval = gc_interval
+        self._last_gc = time.time()
+
+    def create(self, room_id=None):
+        self._maybe_collect()
+        with self._lock:
+            if room_id is None:
+                room_id = uuid.uuid4().hex[:8]
+                while room_id in self._rooms:
+                    room_id = uuid.uuid4().hex[:8]
+            elif room_id in self._rooms:
+                raise RoomError(f"Room {room_id} already exists", status=409)
+            room = Room(room_id)
+            self._rooms[room_id] = room
+            return room
+
+    def get(self, room_id):
+        self._maybe_collect()
+        with self._lock:
+            room = self._rooms.get(room_id)
+        if room is None:
+            raise RoomError(f"Room {room_id} not found", status=404)
+        return room
+
+    def get_or_create(self, room_id):
+        self._maybe_collect()
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is None:
+                room = Room(room_id)
+                self._rooms[room_id] = room
+            return room
+
+    def remove(self, room_id):
+        with self._lock:
+            return self._rooms.pop(room_id, None) is not None
+
+    def rooms(self):
+        with self._lock:
+            return list(self._rooms.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rooms)
+
+    def collect(self, now=None):
+        """Drop expired rooms. Returns the ids that were collected."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            expired = [rid for rid, room in self._rooms.items() if room.is_expired(now, self.idle_ttl)]
+            for rid in expired:
+                del self._rooms[rid]
+            self._last_gc = now
+        return expired
+
+    def _maybe_collect(self):
+        # Lazy GC piggybacks on normal traffic; no extra thread needed.
+        if time.time() - self._last_gc >= self.gc_interval:
+            self.collect()
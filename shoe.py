@@ -0,0 +1,81 @@
+from collections import deque
+
+# Shell kinds (re-exported by game_engine)
+SAFE = "Blank round"
+BUST = "Live round"
+MAGIC_BULLET = "Sudden Death" # Acts as BUST but 999 DMG & Hidden
+
+
+class Shoe:
+    """The loaded shells, front of the chamber first.
+
+    Drawing, ejecting, peeking and inverting the front shell are O(1), and
+    live/blank/Sudden Death counters are maintained on every change so
+    reading them is free. `live` counts every shell that fires, including
+    the Sudden Death bullet.
+    """
+
+    __slots__ = ("_shells", "live", "blank", "magic")
+
+    def __init__(self, shells=()):
+        self._shells = deque(shells)
+        self.live = 0
+        self.blank = 0
+        self.magic = 0
+        for shell in self._shells:
+            self._count(shell, 1)
+
+    def _count(self, shell, delta):
+        if shell == SAFE:
+            self.blank += delta
+        else:
+            self.live += delta
+            if shell == MAGIC_BULLET:
+                self.magic += delta
+
+    def __len__(self):
+        return len(self._shells)
+
+    def __iter__(self):
+        return iter(self._shells)
+
+    def __getitem__(self, index):
+        return self._shells[index]
+
+    def __repr__(self):
+        return f"Shoe({list(self._shells)!r})"
+
+    def draw(self):
+        """Remove and return the front shell."""
+        shell = self._shells.popleft()
+        self._count(shell, -1)
+        return shell
+
+    # Soda ejects exactly like a draw, just without firing
+    eject = draw
+
+    def peek(self, index=0):
+        return self._shells[index]
+
+    def invert(self):
+        """Flip the front shell's polarity and return the new shell.
+
+        A Sudden Death bullet is neutralized into a blank.
+        """
+        old = self._shells[0]
+        new = BUST if old == SAFE else SAFE
+        self._count(old, -1)
+        self._count(new, 1)
+        self._shells[0] = new
+        return new
+
+    def snapshot(self):
+        return tuple(self._shells)
+
+    def clone(self):
+        copy = Shoe.__new__(Shoe)
+        copy._shells = deque(self._shells)
+        copy.live = self.live
+        copy.blank = self.blank
+        copy.magic = self.magic
+        return copy
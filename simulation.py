@@ -0,0 +1,99 @@
+import argparse
+import time
+
+from bots import RandomBot
+from game_engine import CasinoGameEngine
+
+# =========================
+# HEADLESS MATCH RUNNER
+# =========================
+MAX_ACTIONS_PER_MATCH = 5000  # Guard against policies that never shoot
+
+
+class MatchStalled(Exception):
+    """A policy kept the match going past MAX_ACTIONS_PER_MATCH."""
+
+
+def play_match(players, policy, headless=True, seed=None, max_actions=MAX_ACTIONS_PER_MATCH,
+               keep_game=False, config=None):
+    """Play one full match (all rounds) and return a plain-dict summary.
+
+    `policy(game, player)` returns an /api/action-shaped dict for every seat.
+    `seed` seeds the engine's RNG so a match can be reproduced exactly.
+    `config` is a GameConfig (default: the shipped rules).
+    With `keep_game` the finished engine is returned under "game".
+    """
+    game = CasinoGameEngine(players, headless=headless, seed=seed, config=config)
+
+    rounds = []
+    actions = 0
+    while True:
+        bounty = game.bounty
+        while not game.is_round_over():
+            if actions >= max_actions:
+                raise MatchStalled(f"No winner after {actions} actions")
+            player = game.current()
+            game.perform(policy(game, player))
+            actions += 1
+
+        rounds.append({
+            "round": game.round_num,
+            "modifier": game.current_modifier,
+            "bounty": dict(bounty) if bounty else None,
+            "winner": game.round_winner or (game.alive[0] if game.alive else None),
+        })
+        if not game.start_next_round():
+            break
+
+    result = {
+        "players": list(game.original_players),
+        "classes": dict(game.player_classes),
+        "winner": game.grand_winner(),
+        "rounds": rounds,
+        "stats": game.stats,
+        "prize_pool": game.prize_pool,
+        "actions": actions,
+    }
+    if keep_game:
+        result["game"] = game
+    return result
+
+
+def benchmark(n_games=500, n_players=4, seed=0):
+    """Games per second with and without headless mode, on identical seeds.
+
+    Also checks that both modes produce exactly the same matches.
+    """
+    players = [f"Bot{i + 1}" for i in range(n_players)]
+    results = {}
+    outcomes = {}
+    for headless in (False, True):
+        played = []
+        start = time.perf_counter()
+        for i in range(n_games):
+            played.append(play_match(players, RandomBot(seed + i), headless=headless, seed=seed + i))
+        elapsed = time.perf_counter() - start
+        label = "headless" if headless else "normal"
+        results[label] = n_games / elapsed
+        outcomes[label] = played
+
+    if outcomes["normal"] != outcomes["headless"]:
+        raise AssertionError("Headless mode changed match outcomes")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless vs normal engine throughput")
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = benchmark(args.games, args.players, args.seed)
+    for label, gps in results.items():
+        print(f"{label:>8}: {gps:8.1f} games/s")
+    print(f" speedup: {results['headless'] / results['normal']:.2f}x (outcomes identical)")
+
+
+if __name__ == "__main__":
+    main()
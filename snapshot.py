@@ -0,0 +1,265 @@
+import copy
+import json
+import random
+import struct
+import time
+from array import array
+
+from compact_state import (
+    ITEM_CODES,
+    ITEM_NAMES,
+    N_ITEMS,
+    STAT_KEYS,
+    CompactState,
+)
+from game_engine import DEFAULT_CONFIG, CasinoGameEngine, GameConfig
+
+# =========================
+# ENGINE SNAPSHOTS
+# =========================
+# Everything that decides how a match continues: chamber, health, inventories
+# (in order), flags, turn, round, modifier, bounty, the balance config and the
+# RNG state. Logs, events, versions and the journal are presentation and are
+# left out, so a restored engine starts with empty buffers.
+
+SNAPSHOT_MAGIC = b"BRS"
+SNAPSHOT_VERSION = 3                             # 2: adds the GameConfig; 3: two-byte name and inventory sizes
+
+_HEADER = struct.Struct("<3sBB")                 # magic, version, seats
+_NAME = struct.Struct("<H")                      # UTF-8 name length (one byte before version 3)
+_SEAT = struct.Struct("<hhBBH")                  # hp, max_hp, class, flags, inventory size
+_SEAT_V2 = struct.Struct("<hhBBB")               # Same with a one-byte inventory size
+_STATS = struct.Struct(f"<{len(STAT_KEYS)}i")
+_SCALARS = struct.Struct("<iiiBbbbbbI")          # turn, round, max_rounds, modifier, double, blackout,
+                                                 # assassin, target, round_winner, prize_pool
+_SEED = struct.Struct("<Bq")                     # has_seed, seed
+_RNG_HEAD = struct.Struct("<BH")                 # rng state version, state length
+_GAUSS = struct.Struct("<Bd")                    # has_gauss_next, gauss_next
+_CONFIG = struct.Struct("<BBdBdddddB")           # GameConfig.FIELDS in order
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+class EngineSnapshot:
+    """Immutable-by-convention capture of a CasinoGameEngine.
+
+    `state` is a CompactState; `inventories` keeps each seat's item codes in
+    hand order (CompactState only keeps counts); `rng_state` is
+    `random.Random.getstate()`.
+    """
+
+    __slots__ = ("state", "inventories", "rng_state", "seed", "config")
+
+    def __init__(self, state, inventories, rng_state, seed=None, config=DEFAULT_CONFIG):
+        self.state = state
+        self.inventories = inventories
+        self.rng_state = rng_state
+        self.seed = seed
+        self.config = config
+
+    @staticmethod
+    def capture(game):
+        return EngineSnapshot(
+            CompactState.from_engine(game),
+            tuple(bytes(ITEM_CODES[item] for item in game.items.get(name, ()))
+                  for name in game.original_players),
+            game.rng.getstate(),
+            game.seed,
+            game.config,
+        )
+
+    def restore(self, headless=True, **runtime):
+        """Build a fresh engine in this state. `runtime` goes to _init_runtime."""
+        game = CasinoGameEngine.__new__(CasinoGameEngine)
+        game._init_runtime(headless, **runtime)
+        self.state.to_engine(game)
+        names = self.state.names
+        game.items = {name: [ITEM_NAMES[c] for c in inv] for name, inv in zip(names, self.inventories)}
+        rng = random.Random.__new__(random.Random) # Skips the OS-entropy seeding setstate overwrites
+        rng.setstate(self.rng_state)
+        game.rng = rng
+        game.config = self.config
+        # The journal starts here, so (seed, journal) no longer describes this engine
+        game.seed = None
+        game.journal = []
+        game.base_max_health = 4
+        game._blackout_announced = set()
+        return game
+
+    def __eq__(self, other):
+        return (isinstance(other, EngineSnapshot) and self.state == other.state
+                and self.inventories == other.inventories and self.rng_state == other.rng_state
+                and self.seed == other.seed and self.config == other.config)
+
+    __hash__ = None
+
+    # ---------- binary format ----------
+
+    def to_bytes(self):
+        s = self.state
+        n = len(s.names)
+        n_stats = len(STAT_KEYS)
+        out = [_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, n)]
+        for name in s.names:
+            raw = name.encode("utf-8")
+            out.append(_NAME.pack(len(raw)) + raw)
+        for i in range(n):
+            inv = self.inventories[i]
+            out.append(_SEAT.pack(s.hp[i], s.max_hp[i], s.cls[i], s.flags[i], len(inv)))
+            out.append(inv)
+            out.append(_STATS.pack(*s.stats[i * n_stats:(i + 1) * n_stats]))
+        out.append(bytes((len(s.order),)) + bytes(s.order))
+        out.append(bytes((len(s.deck),)) + bytes(s.deck))
+        out.append(_SCALARS.pack(s.turn, s.round_num, s.max_rounds, s.modifier, s.double,
+                                 s.blackout, s.assassin, s.target, s.round_winner, s.prize_pool))
+        out.append(_SEED.pack(self.seed is not None, self.seed or 0))
+        rng_version, internal, gauss = self.rng_state
+        out.append(_RNG_HEAD.pack(rng_version, len(internal)))
+        out.append(struct.pack(f"<{len(internal)}I", *internal))
+        out.append(_GAUSS.pack(gauss is not None, gauss or 0.0))
+        out.append(_CONFIG.pack(*self.config.to_dict().values()))
+        return b"".join(out)
+
+    @staticmethod
+    def from_bytes(data):
+        data = memoryview(data)
+        magic, version, n = _HEADER.unpack_from(data, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError("Not an engine snapshot")
+        if not 1 <= version <= SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version} (expected {SNAPSHOT_VERSION})")
+        pos = _HEADER.size
+
+        def take(size):
+            nonlocal pos
+            chunk = bytes(data[pos:pos + size])
+            pos += size
+            return chunk
+
+        names = []
+        for _ in range(n):
+            if version >= 3:
+                size, = _NAME.unpack_from(data, pos)
+                pos += _NAME.size
+            else:
+                size = data[pos]
+                pos += 1
+            names.append(take(size).decode("utf-8"))
+
+        hp, max_hp, stats = array("h"), array("h"), array("i")
+        cls, flags, items = bytearray(), bytearray(n), bytearray(n * N_ITEMS)
+        inventories = []
+        seat = _SEAT if version >= 3 else _SEAT_V2
+        for i in range(n):
+            h, m, c, f, size = seat.unpack_from(data, pos)
+            pos += seat.size
+            inv = take(size)
+            hp.append(h)
+            max_hp.append(m)
+            cls.append(c)
+            flags[i] = f
+            for code in inv:
+                items[i * N_ITEMS + code] += 1
+            inventories.append(inv)
+            stats.extend(_STATS.unpack_from(data, pos))
+            pos += _STATS.size
+
+        order = take(data[pos] + 1)[1:]
+        deck = bytearray(take(data[pos] + 1)[1:])
+        (turn, round_num, max_rounds, modifier, double, blackout, assassin, target,
+         round_winner, prize_pool) = _SCALARS.unpack_from(data, pos)
+        pos += _SCALARS.size
+        has_seed, seed = _SEED.unpack_from(data, pos)
+        pos += _SEED.size
+        rng_version, length = _RNG_HEAD.unpack_from(data, pos)
+        pos += _RNG_HEAD.size
+        internal = struct.unpack_from(f"<{length}I", data, pos)
+        pos += 4 * length
+        has_gauss, gauss = _GAUSS.unpack_from(data, pos)
+        pos += _GAUSS.size
+        config = DEFAULT_CONFIG
+        if version >= 2:
+            # Version 1 predates GameConfig: those matches ran on the default rules
+            config = GameConfig(*_CONFIG.unpack_from(data, pos))
+
+        state = CompactState(tuple(names), hp, max_hp, bytes(cls), flags, items, stats, order, deck,
+                             turn, round_num, max_rounds, modifier, double, blackout, assassin,
+                             target, round_winner, prize_pool)
+        return EngineSnapshot(state, tuple(inventories),
+                              (rng_version, internal, gauss if has_gauss else None),
+                              seed if has_seed else None, config)
+
+
+def snapshot_to_json(snap):
+    """Plain JSON equivalent of to_bytes, used as the benchmark baseline."""
+    s = snap.state
+    return json.dumps({
+        "names": list(s.names), "hp": list(s.hp), "max_hp": list(s.max_hp), "cls": list(s.cls),
+        "flags": list(s.flags), "inventories": [list(inv) for inv in snap.inventories],
+        "stats": list(s.stats), "order": list(s.order), "deck": list(s.deck),
+        "scalars": [s.turn, s.round_num, s.max_rounds, s.modifier, s.double, s.blackout,
+                    s.assassin, s.target, s.round_winner, s.prize_pool],
+        "seed": snap.seed, "rng": [snap.rng_state[0], list(snap.rng_state[1]), snap.rng_state[2]],
+        "config": snap.config.to_dict(),
+    })
+
+
+def snapshot_from_json(text):
+    d = json.loads(text)
+    n = len(d["names"])
+    items = bytearray(n * N_ITEMS)
+    for i, inv in enumerate(d["inventories"]):
+        for code in inv:
+            items[i * N_ITEMS + code] += 1
+    state = CompactState(tuple(d["names"]), array("h", d["hp"]), array("h", d["max_hp"]),
+                         bytes(d["cls"]), bytearray(d["flags"]), items, array("i", d["stats"]),
+                         bytes(d["order"]), bytearray(d["deck"]), *d["scalars"])
+    rng_version, internal, gauss = d["rng"]
+    return EngineSnapshot(state, tuple(bytes(inv) for inv in d["inventories"]),
+                          (rng_version, tuple(internal), gauss), d["seed"],
+                          GameConfig.from_dict(d["config"]) if "config" in d else DEFAULT_CONFIG)
+
+
+def main():
+    import argparse
+
+    from bots import RandomBot
+
+    parser = argparse.ArgumentParser(description="Benchmark engine snapshots against deepcopy and JSON")
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("-n", type=int, default=2000)
+    args = parser.parse_args()
+
+    players = [f"Player{i + 1}" for i in range(args.players)]
+    game = CasinoGameEngine(players, headless=True, seed=1)
+    bot = RandomBot(1)
+    for _ in range(10):
+        game.perform(bot(game, game.current()))
+
+    snap = EngineSnapshot.capture(game)
+    blob = snap.to_bytes()
+    text = snapshot_to_json(snap)
+    assert EngineSnapshot.from_bytes(blob) == snap
+    assert snapshot_from_json(text) == snap
+
+    def bench(label, fn):
+        start = time.perf_counter()
+        for _ in range(args.n):
+            fn()
+        print(f"{label:22s}: {(time.perf_counter() - start) / args.n * 1e6:8.1f} us")
+
+    bench("deepcopy(engine)", lambda: copy.deepcopy(game))
+    bench("snapshot", lambda: EngineSnapshot.capture(game))
+    bench("restore", snap.restore)
+    bench("clone", game.clone)
+    bench("to_bytes", snap.to_bytes)
+    bench("from_bytes", lambda: EngineSnapshot.from_bytes(blob))
+    bench("json dumps", lambda: snapshot_to_json(snap))
+    bench("json loads", lambda: snapshot_from_json(text))
+    print(f"binary {len(blob)} bytes | json {len(text.encode())} bytes")
+
+
+if __name__ == "__main__":
+    main()
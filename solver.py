@@ -0,0 +1,348 @@
+import time
+
+from game_engine import (
+    CLASS_SNIPER,
+    DEFAULT_CONFIG,
+    ITEM_DISCARD,
+    ITEM_DOUBLE,
+    ITEM_HEAL,
+    ITEM_INVERTER,
+    ITEM_LENS,
+    ITEM_SKIP,
+    BUST,
+    MAGIC_BULLET,
+    MOD_DOUBLE_TROUBLE,
+    MOD_VAMPIRISM,
+    MODE_RISK,
+    MODE_SAFE,
+    SAFE,
+)
+from knowledge import LIVE_OR_MAGIC as SEEN_LIVE_OR_MAGIC
+
+# =========================
+# EXPECTIMAX BOT
+# =========================
+# Searches the public game: remaining live/blank/Sudden Death counts, health,
+# item counts and pending handcuffs. Every seat maximises its own chance to
+# win the round (max^n), shells and crits are chance nodes. Positions are
+# memoized in a bounded transposition table shared across moves.
+#
+# Modelled items: Cigarette, Knife, Soda, Inverter, Lens, Handcuffs.
+# Injection, Phone, Diamond and Mystery Box are never chosen by the search.
+# Blackouts are not modelled. Risk Shot backfire and damage and the Sniper
+# crit come from the match's GameConfig; together with the round modifier
+# they make up the `rules` every transition and table entry is keyed by.
+
+DEFAULT_TIME_BUDGET = 0.05   # Seconds per decision
+MAX_DEPTH = 12
+TT_LIMIT = 200000           # Transposition table is cleared when it grows past this
+MAX_ACTIONS_PER_TURN = 20   # ai_turn safety cap
+
+SEARCHED_ITEMS = (ITEM_HEAL, ITEM_DOUBLE, ITEM_DISCARD, ITEM_INVERTER, ITEM_LENS, ITEM_SKIP)
+HEAL, KNIFE, SODA, INVERT, LENS, CUFFS = range(len(SEARCHED_ITEMS))
+
+# What the table knows about the front shell
+UNKNOWN, BLANK, LIVE, LIVE_OR_MAGIC = range(4)
+
+# DeckKnowledge front kinds -> search front. A located Sudden Death bullet is searched as
+# LIVE_OR_MAGIC, which slightly undervalues it; deeper known positions are not modelled.
+_SEEN_FRONT = {SAFE: BLANK, BUST: LIVE, MAGIC_BULLET: LIVE_OR_MAGIC, SEEN_LIVE_OR_MAGIC: LIVE_OR_MAGIC}
+
+MAGIC_DAMAGE = 999
+
+# Player tuple fields
+HP, MAX_HP, SNIPER, SKIPPED, ITEMS = range(5)
+
+_table = {}
+
+
+class _Timeout(Exception):
+    pass
+
+
+class SolverState:
+    """Canonical, hashable search position.
+
+    players: tuple of (hp, max_hp, is_sniper, skipped, item_counts) in seat order;
+    dead seats keep hp <= 0 so utility vectors stay aligned.
+    """
+
+    __slots__ = ("players", "cur", "live", "blank", "magic", "front", "double", "key")
+
+    def __init__(self, players, cur, live, blank, magic, front, double):
+        self.players = players
+        self.cur = cur
+        self.live = live
+        self.blank = blank
+        self.magic = magic
+        self.front = front
+        self.double = double
+        self.key = (players, cur, live, blank, magic, front, double)
+
+    def alive(self):
+        return [i for i, p in enumerate(self.players) if p[HP] > 0]
+
+
+def from_engine(game, player, front=None):
+    """Project the engine onto the public search state, seen from `player`.
+
+    `front` defaults to what `player` knows about the front shell (game.knowledge).
+    """
+    if front is None:
+        front = _SEEN_FRONT.get(game.knowledge.front_kind(player), UNKNOWN)
+    players = []
+    for p in game.alive:
+        inv = game.items[p]
+        players.append((
+            game.health[p],
+            game.player_max_health[p],
+            game.player_classes.get(p) == CLASS_SNIPER,
+            bool(game.skip.get(p)),
+            tuple(inv.count(item) for item in SEARCHED_ITEMS),
+        ))
+    shoe = game.deck
+    return SolverState(tuple(players), game.alive.index(player), shoe.live,
+                       shoe.blank, shoe.magic, front, game.double == player)
+
+
+# ---------- transitions ----------
+
+def _replace_player(players, i, field, value):
+    p = list(players[i])
+    p[field] = value
+    return players[:i] + (tuple(p),) + players[i + 1:]
+
+
+def _use_item(players, i, item):
+    counts = list(players[i][ITEMS])
+    counts[item] -= 1
+    return _replace_player(players, i, ITEMS, tuple(counts))
+
+
+def _next_turn(players, cur):
+    """Next living seat after `cur`, consuming handcuffs like engine.next_turn."""
+    n = len(players)
+    i = cur
+    for _ in range(2 * n):
+        i = (i + 1) % n
+        if players[i][HP] <= 0:
+            continue
+        if players[i][SKIPPED]:
+            players = _replace_player(players, i, SKIPPED, False)
+            continue
+        return players, i
+    return players, cur
+
+
+def _shell_outcomes(state):
+    """(probability, kind, live, blank, magic) for the front shell."""
+    live, blank, magic = state.live, state.blank, state.magic
+    if state.front == BLANK:
+        return [(1.0, BLANK, live, blank - 1, magic)]
+    if state.front == LIVE:
+        return [(1.0, LIVE, live - 1, blank, magic)]
+    outcomes = []
+    if state.front == LIVE_OR_MAGIC:
+        p_live = 1.0
+    else:
+        total = live + blank
+        p_live = live / total
+        if blank:
+            outcomes.append((1 - p_live, BLANK, live, blank - 1, magic))
+    if live:
+        p_magic = magic / live
+        if p_magic < 1:
+            outcomes.append((p_live * (1 - p_magic), LIVE, live - 1, blank, magic))
+        if magic:
+            outcomes.append((p_live * p_magic, MAGIC_BULLET, live - 1, blank, magic - 1))
+    return outcomes
+
+
+def _rules(modifier=None, config=DEFAULT_CONFIG):
+    """(modifier, risk backfire, risk damage, sniper crit): everything the search reads besides the state."""
+    return (modifier, config.risk_backfire, config.risk_damage, config.sniper_crit)
+
+
+def _children(state, action, rules):
+    """(probability, next_state) pairs for `action`."""
+    modifier, risk_backfire, risk_damage, sniper_crit = rules
+    players, cur = state.players, state.cur
+    kind = action[0]
+
+    if kind == "use":
+        item = action[1]
+        players = _use_item(players, cur, item)
+        if item == HEAL:
+            players = _replace_player(players, cur, HP, players[cur][HP] + 1)
+            return [(1.0, SolverState(players, cur, state.live, state.blank, state.magic, state.front, state.double))]
+        if item == KNIFE:
+            return [(1.0, SolverState(players, cur, state.live, state.blank, state.magic, state.front, True))]
+        if item == CUFFS:
+            players = _replace_player(players, action[2], SKIPPED, True)
+            return [(1.0, SolverState(players, cur, state.live, state.blank, state.magic, state.front, state.double))]
+        if item == LENS:
+            total = state.live + state.blank
+            out = []
+            if state.blank:
+                out.append((state.blank / total, SolverState(players, cur, state.live, state.blank, state.magic, BLANK, state.double)))
+            if state.live:
+                out.append((state.live / total, SolverState(players, cur, state.live, state.blank, state.magic, LIVE_OR_MAGIC, state.double)))
+            return out
+        if item == SODA:
+            return [(p, SolverState(players, cur, live, blank, magic, UNKNOWN, state.double))
+                    for p, _, live, blank, magic in _shell_outcomes(state)]
+        if item == INVERT:
+            out = []
+            for p, shell, live, blank, magic in _shell_outcomes(state):
+                # The flip is announced publicly, so the new front is known to all
+                if shell == BLANK:
+                    out.append((p, SolverState(players, cur, live + 1, blank, magic, LIVE, state.double)))
+                else:
+                    out.append((p, SolverState(players, cur, live, blank + 1, magic, BLANK, state.double)))
+            return out
+
+    # Draws
+    _, target, mode = action
+    out = []
+    for p_shell, shell, live, blank, magic in _shell_outcomes(state):
+        if shell == BLANK:
+            if mode == MODE_SAFE and target == cur:
+                nxt_players, nxt = players, cur
+            else:
+                nxt_players, nxt = _next_turn(players, cur)
+            out.append((p_shell, SolverState(nxt_players, nxt, live, blank, magic, UNKNOWN, False)))
+            continue
+
+        if mode == MODE_RISK:
+            aims = [(risk_backfire, cur), (1 - risk_backfire, target)]
+            base = risk_damage
+        else:
+            aims = [(1.0, target)]
+            base = 2 if state.double else 1
+
+        if shell == MAGIC_BULLET:
+            damages = [(1.0, MAGIC_DAMAGE)]
+        elif players[cur][SNIPER]:
+            damages = [(1 - sniper_crit, base), (sniper_crit, base + 1)]
+        else:
+            damages = [(1.0, base)]
+
+        for p_aim, victim in aims:
+            for p_dmg, dmg in damages:
+                if modifier == MOD_DOUBLE_TROUBLE:
+                    dmg *= 2
+                hit = _replace_player(players, victim, HP, players[victim][HP] - dmg)
+                if modifier == MOD_VAMPIRISM and victim != cur and hit[cur][HP] < hit[cur][MAX_HP]:
+                    hit = _replace_player(hit, cur, HP, hit[cur][HP] + 1)
+                nxt_players, nxt = _next_turn(hit, cur)
+                out.append((p_shell * p_aim * p_dmg,
+                            SolverState(nxt_players, nxt, live, blank, magic, UNKNOWN, False)))
+    return out
+
+
+def legal_moves(state):
+    players, cur = state.players, state.cur
+    me = players[cur]
+    opponents = [i for i in state.alive() if i != cur]
+    moves = [("draw", t, MODE_SAFE) for t in opponents]
+    moves.append(("draw", cur, MODE_SAFE))
+    moves += [("draw", t, MODE_RISK) for t in opponents]
+
+    items = me[ITEMS]
+    has_shell = state.live + state.blank > 0
+    if items[HEAL] and me[HP] < me[MAX_HP]:
+        moves.append(("use", HEAL))
+    if items[KNIFE] and not state.double:
+        moves.append(("use", KNIFE))
+    if items[LENS] and has_shell and state.front == UNKNOWN:
+        moves.append(("use", LENS))
+    if items[INVERT] and has_shell:
+        moves.append(("use", INVERT))
+    if items[SODA] and has_shell:
+        moves.append(("use", SODA))
+    if items[CUFFS]:
+        moves += [("use", CUFFS, t) for t in opponents if not players[t][SKIPPED]]
+    return moves
+
+
+# ---------- search ----------
+
+def _heuristic(state):
+    """Leaf value: each seat's share of the remaining health."""
+    hp = [max(p[HP], 0) for p in state.players]
+    total = sum(hp) or 1
+    return tuple(h / total for h in hp)
+
+
+def _value(state, depth, rules, deadline):
+    alive = state.alive()
+    if len(alive) <= 1:
+        return tuple(1.0 if i in alive else 0.0 for i in range(len(state.players)))
+    if depth == 0 or state.live + state.blank == 0:
+        return _heuristic(state)
+
+    key = (state.key, depth, rules)
+    cached = _table.get(key)
+    if cached is not None:
+        return cached
+    if time.perf_counter() > deadline:
+        raise _Timeout()
+
+    best = None
+    for move in legal_moves(state):
+        value = _expected(state, move, depth, rules, deadline)
+        if best is None or value[state.cur] > best[state.cur]:
+            best = value
+
+    if len(_table) >= TT_LIMIT:
+        _table.clear()
+    _table[key] = best
+    return best
+
+
+def _expected(state, move, depth, rules, deadline):
+    total = [0.0] * len(state.players)
+    for p, child in _children(state, move, rules):
+        for i, v in enumerate(_value(child, depth - 1, rules, deadline)):
+            total[i] += p * v
+    return tuple(total)
+
+
+def best_move(state, modifier=None, time_budget=DEFAULT_TIME_BUDGET, config=DEFAULT_CONFIG):
+    """Iterative-deepening expectimax; returns (move, value) for `state.cur`.
+
+    Always finishes depth 1, then deepens until the time budget runs out.
+    `config` is the match's GameConfig.
+    """
+    rules = _rules(modifier, config)
+    deadline = time.perf_counter() + time_budget
+    moves = legal_moves(state)
+    best = (moves[0], None)
+    for depth in range(1, MAX_DEPTH + 1):
+        try:
+            scored = [(m, _expected(state, m, depth, rules, deadline if depth > 1 else float("inf")))
+                      for m in moves]
+        except _Timeout:
+            break
+        move, value = max(scored, key=lambda mv: mv[1][state.cur])
+        best = (move, value)
+        if state.live + state.blank <= depth:
+            break  # Searched to the end of the chamber; deeper adds nothing
+    return best
+
+
+def choose_action(game, player, time_budget=DEFAULT_TIME_BUDGET):
+    """Pick an /api/action dict for `player` in a live engine."""
+    if not game.deck:
+        # Empty chamber: the engine reloads on the next draw, nothing to search
+        opponent = next(p for p in game.alive if p != player)
+        return {"type": "draw", "target": opponent, "mode": MODE_SAFE}
+
+    state = from_engine(game, player)
+    move, _ = best_move(state, game.current_modifier, time_budget, game.config)
+    if move[0] == "draw":
+        return {"type": "draw", "target": game.alive[move[1]], "mode": move[2]}
+    action = {"type": "use", "item": SEARCHED_ITEMS[move[1]], "target": None}
+    if move[1] == CUFFS:
+        action["target"] = game.alive[move[2]]
+    return action
@@ -0,0 +1,350 @@
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from statistics import NormalDist
+
+from game_engine import DEFAULT_CONFIG, ENGINE_VERSION, PLAYER_CLASSES, GameConfig
+from tournament import POLICIES, TournamentStats, run_chunk
+
+# =========================
+# BALANCE SWEEP
+# =========================
+# Plays many GameConfig variants across all cores, each until every class
+# win rate is pinned down to a target confidence interval. Chunks of all
+# configs share one process pool. Every config starts at seed 0 (common
+# random numbers), so differences between points come from the rules rather
+# than from the deal. Chunks are merged in seed order and the stopping rule
+# is checked after each one, so a point's result does not depend on the
+# worker count.
+#
+# Finished (and partial) points are cached on disk, one JSON file per
+# (config, engine version, table setup); a rerun only plays what is missing
+# and a tighter margin continues from where the cache stopped.
+
+DEFAULT_CACHE_DIR = "sweep_cache"
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_MARGIN = 0.01        # Target CI half-width on every class win rate
+DEFAULT_MIN_GAMES = 1000     # Normal approximation needs some games before it means anything
+DEFAULT_MAX_GAMES = 200000
+DEFAULT_CHUNK = 500
+CACHE_FORMAT = 1
+
+
+# ---------- config generation ----------
+
+def grid(axes, base=DEFAULT_CONFIG):
+    """Every combination of `axes` ({field: [values]}) applied to `base`. Invalid combinations
+    (e.g. deck_min > deck_max) are skipped."""
+    fields = list(axes)
+    configs = []
+    for values in itertools.product(*(axes[f] for f in fields)):
+        try:
+            configs.append(base.replace(**dict(zip(fields, values))))
+        except ValueError:
+            continue
+    return configs
+
+
+def sample(axes, n, seed=0, base=DEFAULT_CONFIG, max_tries=100):
+    """`n` random configs. An axis is a list (pick one) or a (lo, hi) tuple (uniform; ints
+    inclusive, floats rounded to 3 places so reruns hit the cache)."""
+    rng = random.Random(seed)
+    configs = []
+    tries = 0
+    while len(configs) < n:
+        tries += 1
+        if tries > n * max_tries:
+            raise ValueError("Axes produce too few valid configs")
+        changes = {}
+        for field, axis in axes.items():
+            if isinstance(axis, tuple):
+                lo, hi = axis
+                changes[field] = rng.randint(lo, hi) if field in GameConfig.INT_FIELDS else round(rng.uniform(lo, hi), 3)
+            else:
+                changes[field] = rng.choice(axis)
+        try:
+            configs.append(base.replace(**changes))
+        except ValueError:
+            continue
+    return configs
+
+
+def parse_axis(spec):
+    """'field=a,b,c' -> (field, [a, b, c]); 'field=lo:hi' -> (field, (lo, hi))."""
+    field, sep, values = spec.partition("=")
+    if not sep or field not in GameConfig.FIELDS:
+        raise ValueError(f"Expected <field>=<values> with field one of: {', '.join(GameConfig.FIELDS)}")
+    kind = int if field in GameConfig.INT_FIELDS else float
+    if ":" in values:
+        lo, hi = values.split(":")
+        return field, (kind(lo), kind(hi))
+    return field, [kind(v) for v in values.split(",")]
+
+
+# ---------- confidence ----------
+
+def half_widths(stats, confidence=DEFAULT_CONFIDENCE):
+    """{class: CI half-width of its win rate}. Seats are treated as independent samples."""
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    out = {}
+    for cls in PLAYER_CLASSES:
+        seats = stats.class_seats.get(cls, 0)
+        if not seats:
+            out[cls] = math.inf
+            continue
+        p = stats.class_wins.get(cls, 0) / seats
+        # Clamp p away from 0/1 so a lucky streak can't claim a zero-width interval
+        p = min(max(p, 1 / seats), 1 - 1 / seats) if seats > 1 else 0.5
+        out[cls] = z * math.sqrt(p * (1 - p) / seats)
+    return out
+
+
+# ---------- cache ----------
+
+def point_key(config, n_players, policy_names):
+    """Cache key: config hash, engine version and table setup."""
+    setup = json.dumps({"config": config.key(), "engine": ENGINE_VERSION, "players": n_players,
+                        "policies": list(policy_names)}, sort_keys=True)
+    return hashlib.sha256(setup.encode()).hexdigest()[:20]
+
+
+class SweepCache:
+    """One JSON file per point; writes are atomic so an interrupted sweep leaves no torn files."""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key):
+        """(stats, next_seed) or None."""
+        try:
+            with open(self._path(key)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("format") != CACHE_FORMAT or data.get("engine_version") != ENGINE_VERSION:
+            return None
+        return TournamentStats.from_dict(data["stats"]), data["next_seed"]
+
+    def store(self, point):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(point.key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "format": CACHE_FORMAT,
+                "engine_version": ENGINE_VERSION,
+                "config": point.config.to_dict(),
+                "players": point.n_players,
+                "policies": list(point.policy_names),
+                "next_seed": point.next_seed,
+                "stats": point.stats.to_dict(),
+            }, f)
+        os.replace(tmp, path)
+
+
+# ---------- sweep ----------
+
+class SweepPoint:
+    """One config's running aggregate. Chunks can finish out of order; they are merged in
+    seed order so the stopping rule always sees a prefix of the seed sequence."""
+
+    def __init__(self, config, n_players, policy_names):
+        self.config = config
+        self.n_players = n_players
+        self.policy_names = policy_names
+        self.key = point_key(config, n_players, policy_names)
+        self.stats = TournamentStats()
+        self.next_seed = 0        # First seed not yet merged
+        self.dispatched = 0       # First seed not yet handed to a worker
+        self.finished = {}        # first_seed -> (count, stats) waiting for earlier chunks
+        self.inflight = 0
+        self.done = False
+        self.cached = False       # Answered from the cache without playing
+
+    def played(self):
+        return self.stats.matches + self.stats.stalled
+
+    def check(self, margin, confidence, min_games, max_games):
+        if self.played() >= max_games:
+            self.done = True
+        elif self.played() >= min_games:
+            self.done = max(half_widths(self.stats, confidence).values()) <= margin
+        return self.done
+
+    def report(self, confidence):
+        tables = self.stats.tables()
+        rates = [row["win_rate"] for row in tables["by_class"].values() if row["win_rate"] is not None]
+        widths = half_widths(self.stats, confidence)
+        return {
+            "key": self.key,
+            "config": self.config.to_dict(),
+            "changed": repr(self.config),
+            "matches": self.stats.matches,
+            "cached": self.cached,
+            "spread": round(max(rates) - min(rates), 4) if rates else None,
+            "half_width": {cls: round(w, 4) for cls, w in widths.items()},
+            "tables": tables,
+        }
+
+
+def run_sweep(configs, n_players=4, policy_names=("random",), margin=DEFAULT_MARGIN,
+              confidence=DEFAULT_CONFIDENCE, min_games=DEFAULT_MIN_GAMES, max_games=DEFAULT_MAX_GAMES,
+              workers=None, chunk=DEFAULT_CHUNK, cache_dir=DEFAULT_CACHE_DIR, on_point=None):
+    """Simulate every config to `margin` at `confidence` (or `max_games`) and return their
+    reports, most balanced (smallest class win-rate spread) first.
+
+    `on_point(report)` is called as each point finishes. cache_dir=None disables the cache.
+    """
+    if len(policy_names) == 1:
+        policy_names = tuple(policy_names) * n_players
+    if len(policy_names) != n_players:
+        raise ValueError("Give one policy name, or one per seat")
+    for name in policy_names:
+        if name not in POLICIES:
+            raise ValueError(f"Unknown policy {name}")
+
+    cache = SweepCache(cache_dir) if cache_dir else None
+    points = {}
+    for config in configs:
+        point = SweepPoint(config, n_players, tuple(policy_names))
+        points.setdefault(point.key, point)
+    points = list(points.values())
+
+    finished = []
+
+    def finish(point):
+        finished.append(point)
+        if on_point:
+            on_point(point.report(confidence))
+
+    active = []
+    for point in points:
+        cached = cache.load(point.key) if cache else None
+        if cached:
+            point.stats, point.next_seed = cached
+            point.dispatched = point.next_seed
+        if point.check(margin, confidence, min_games, max_games):
+            point.cached = True
+            finish(point)
+        else:
+            active.append(point)
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        turn = 0
+        while active or futures:
+            # Round-robin new chunks over unfinished points, keeping a bounded number in flight.
+            # Each point runs at most `workers` chunks ahead of its merged prefix, which bounds
+            # the games thrown away once it reaches its target.
+            idle = 0
+            while len(futures) < workers * 2 and active and idle < len(active):
+                point = active[turn % len(active)]
+                turn += 1
+                if point.inflight >= workers or point.dispatched >= max_games:
+                    idle += 1
+                    continue
+                idle = 0
+                count = min(chunk, max_games - point.dispatched)
+                future = pool.submit(run_chunk, n_players, point.policy_names, point.dispatched, count,
+                                     point.config)
+                futures[future] = (point, point.dispatched, count)
+                point.dispatched += count
+                point.inflight += 1
+            if not futures:
+                break
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                point, first_seed, count = futures.pop(future)
+                point.inflight -= 1
+                if point.done:
+                    continue          # Past the stopping point; discarded
+                point.finished[first_seed] = (count, future.result())
+                while point.next_seed in point.finished and not point.done:
+                    count, stats = point.finished.pop(point.next_seed)
+                    point.stats.merge(stats)
+                    point.next_seed += count
+                    point.check(margin, confidence, min_games, max_games)
+                if cache:
+                    cache.store(point)
+                if point.done:
+                    point.finished.clear()
+                    active.remove(point)
+                    finish(point)
+
+    return sorted((p.report(confidence) for p in finished),
+                  key=lambda r: (r["spread"] is None, r["spread"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sweep balance configs across all cores, each to a target confidence, with a disk cache",
+        epilog="Axes: <field>=v1,v2,... for a grid or a random pick, <field>=lo:hi for a uniform "
+               "range (needs --sample). Fields: " + ", ".join(GameConfig.FIELDS))
+    parser.add_argument("axes", nargs="*", help="Config axes, e.g. risk_backfire=0.5,0.6 tank_bonus=1:3")
+    parser.add_argument("--sample", type=int, help="Draw this many random configs instead of the full grid")
+    parser.add_argument("--sample-seed", type=int, default=0)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--policy", default="random",
+                        help="Policy name, or comma-separated names one per seat: " + ", ".join(POLICIES))
+    parser.add_argument("--margin", type=float, default=DEFAULT_MARGIN,
+                        help="Target CI half-width on every class win rate")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE)
+    parser.add_argument("--min-games", type=int, default=DEFAULT_MIN_GAMES)
+    parser.add_argument("--max-games", type=int, default=DEFAULT_MAX_GAMES)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK)
+    parser.add_argument("--cache", default=DEFAULT_CACHE_DIR, help="Cache directory")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--out", help="Write the sorted reports as JSON to this file")
+    args = parser.parse_args()
+
+    try:
+        axes = dict(parse_axis(spec) for spec in args.axes)
+        if args.sample:
+            configs = sample(axes, args.sample, args.sample_seed)
+        elif any(isinstance(axis, tuple) for axis in axes.values()):
+            parser.error("lo:hi ranges need --sample")
+        else:
+            configs = grid(axes)
+    except ValueError as e:
+        parser.error(str(e))
+    configs = list(dict.fromkeys(configs))
+    if not configs:
+        parser.error("No valid configs on these axes")
+
+    start = time.perf_counter()
+    seen = [0]
+
+    def progress(report):
+        seen[0] += 1
+        source = "cached" if report["cached"] else f"{time.perf_counter() - start:.1f}s"
+        print(f"[{seen[0]}/{len(configs)}] {report['changed']}: {report['matches']} games ({source}), "
+              f"spread {report['spread']}", flush=True)
+
+    reports = run_sweep(configs, args.players, tuple(args.policy.split(",")), args.margin, args.confidence,
+                        args.min_games, args.max_games, args.workers, args.chunk,
+                        None if args.no_cache else args.cache, on_point=progress)
+
+    print("\nMost balanced first (class win rate ± half-width):")
+    for report in reports:
+        rates = ", ".join(f"{cls} {row['win_rate']}±{report['half_width'][cls]}"
+                          for cls, row in report["tables"]["by_class"].items())
+        print(f"  spread {report['spread']:.4f} | {report['changed']} | {rates}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
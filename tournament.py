@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from bots import ExpectimaxBot, RandomBot
+from game_engine import PLAYER_CLASSES
+from mcts import MCTSBot
+from simulation import MatchStalled, play_match
+
+# =========================
+# POLICY REGISTRY
+# =========================
+# Factories take a seed and return a policy(game, player) callable.
+# Workers look policies up by name so nothing unpicklable crosses processes.
+POLICIES = {
+    "random": RandomBot,
+    "expectimax": ExpectimaxBot,
+    "mcts": MCTSBot,
+}
+
+DEFAULT_CHUNK = 250  # Matches per worker task
+
+
+def make_policy(names, seed):
+    """One policy for the whole table, dispatching per seat when names differ."""
+    seats = [POLICIES[name](seed * 31 + i) for i, name in enumerate(names)]
+    if len(set(names)) == 1:
+        return seats[0]
+
+    def policy(game, player):
+        return seats[game.original_players.index(player)](game, player)
+    return policy
+
+
+class TournamentStats:
+    """Mergeable aggregate over many matches."""
+
+    def __init__(self):
+        self.matches = 0
+        self.stalled = 0
+        self.class_seats = defaultdict(int)
+        self.class_wins = defaultdict(int)
+        self.class_totals = defaultdict(lambda: defaultdict(int))
+        self.seat_wins = defaultdict(int)
+        self.seat_games = defaultdict(int)
+        # modifier -> class -> [appearances, round wins]
+        self.modifier_rounds = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        # "bounty"/"no_bounty" -> class -> [appearances, round wins]
+        self.bounty_rounds = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        self.assassin_wins = 0
+        self.bounties = 0
+
+    def add(self, result):
+        self.matches += 1
+        players = result["players"]
+        classes = result["classes"]
+        winner = result["winner"]
+
+        for seat, p in enumerate(players):
+            cls = classes[p]
+            self.class_seats[cls] += 1
+            self.seat_games[seat] += 1
+            for key, value in result["stats"][p].items():
+                self.class_totals[cls][key] += value
+            if p == winner:
+                self.class_wins[cls] += 1
+                self.seat_wins[seat] += 1
+
+        for rnd in result["rounds"]:
+            bounty = rnd["bounty"]
+            by_bounty = self.bounty_rounds["bounty" if bounty else "no_bounty"]
+            by_modifier = self.modifier_rounds[rnd["modifier"] or "none"]
+            for p in players:
+                cls = classes[p]
+                won = int(rnd["winner"] == p)
+                for table in (by_bounty, by_modifier):
+                    table[cls][0] += 1
+                    table[cls][1] += won
+            if bounty:
+                self.bounties += 1
+                self.assassin_wins += int(rnd["winner"] == bounty["assassin"])
+
+    def merge(self, other):
+        self.matches += other.matches
+        self.stalled += other.stalled
+        self.assassin_wins += other.assassin_wins
+        self.bounties += other.bounties
+        for mine, theirs in ((self.class_seats, other.class_seats), (self.class_wins, other.class_wins),
+                             (self.seat_wins, other.seat_wins), (self.seat_games, other.seat_games)):
+            for key, value in theirs.items():
+                mine[key] += value
+        for cls, totals in other.class_totals.items():
+            for key, value in totals.items():
+                self.class_totals[cls][key] += value
+        for mine, theirs in ((self.modifier_rounds, other.modifier_rounds), (self.bounty_rounds, other.bounty_rounds)):
+            for group, per_class in theirs.items():
+                for cls, (seen, won) in per_class.items():
+                    mine[group][cls][0] += seen
+                    mine[group][cls][1] += won
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, data):
+        # defaultdicts of lambdas don't pickle; travel between processes as plain dicts
+        self.__dict__.update(TournamentStats.from_dict(data).__dict__)
+
+    @staticmethod
+    def from_dict(data):
+        stats = TournamentStats()
+        stats.matches = data["matches"]
+        stats.stalled = data["stalled"]
+        stats.assassin_wins = data["assassin_wins"]
+        stats.bounties = data["bounties"]
+        stats.class_seats.update(data["class_seats"])
+        stats.class_wins.update(data["class_wins"])
+        stats.seat_wins.update({int(k): v for k, v in data["seat_wins"].items()})
+        stats.seat_games.update({int(k): v for k, v in data["seat_games"].items()})
+        for cls, totals in data["class_totals"].items():
+            stats.class_totals[cls].update(totals)
+        for name in ("modifier_rounds", "bounty_rounds"):
+            table = getattr(stats, name)
+            for group, per_class in data[name].items():
+                for cls, pair in per_class.items():
+                    table[group][cls] = list(pair)
+        return stats
+
+    def to_dict(self):
+        return {
+            "matches": self.matches,
+            "stalled": self.stalled,
+            "assassin_wins": self.assassin_wins,
+            "bounties": self.bounties,
+            "class_seats": dict(self.class_seats),
+            "class_wins": dict(self.class_wins),
+            "seat_wins": dict(self.seat_wins),
+            "seat_games": dict(self.seat_games),
+            "class_totals": {cls: dict(t) for cls, t in self.class_totals.items()},
+            "modifier_rounds": {g: {c: list(v) for c, v in t.items()} for g, t in self.modifier_rounds.items()},
+            "bounty_rounds": {g: {c: list(v) for c, v in t.items()} for g, t in self.bounty_rounds.items()},
+        }
+
+    def tables(self):
+        """Win-rate tables for reporting."""
+        def rate(won, seen):
+            return round(won / seen, 4) if seen else None
+
+        by_class = {}
+        for cls in PLAYER_CLASSES:
+            seen = self.class_seats.get(cls, 0)
+            row = {"seats": seen, "win_rate": rate(self.class_wins.get(cls, 0), seen)}
+            for key, value in self.class_totals.get(cls, {}).items():
+                row[f"avg_{key}"] = round(value / seen, 3) if seen else None
+            by_class[cls] = row
+
+        return {
+            "matches": self.matches,
+            "stalled": self.stalled,
+            "by_class": by_class,
+            "by_seat": {seat: rate(self.seat_wins.get(seat, 0), games)
+                        for seat, games in sorted(self.seat_games.items())},
+            "by_modifier": {group: {cls: rate(won, seen) for cls, (seen, won) in per_class.items()}
+                            for group, per_class in self.modifier_rounds.items()},
+            "by_bounty": {group: {cls: rate(won, seen) for cls, (seen, won) in per_class.items()}
+                          for group, per_class in self.bounty_rounds.items()},
+            "assassin_win_rate": rate(self.assassin_wins, self.bounties),
+        }
+
+
+def run_chunk(n_players, policy_names, first_seed, count, config=None):
+    """Worker task: play `count` matches with consecutive seeds."""
+    players = [f"Bot{i + 1}" for i in range(n_players)]
+    stats = TournamentStats()
+    for seed in range(first_seed, first_seed + count):
+        policy = make_policy(policy_names, seed)
+        try:
+            stats.add(play_match(players, policy, headless=True, seed=seed, config=config))
+        except MatchStalled:
+            stats.stalled += 1
+    return stats
+
+
+def run_tournament(n_games, n_players=4, policy_names=("random",), workers=None,
+                   chunk=DEFAULT_CHUNK, seed=0, on_progress=None, config=None):
+    """Play `n_games` matches across a process pool and merge the results.
+
+    Every match gets seed `seed + index`, so results don't depend on the
+    worker count. `config` is the GameConfig every match is played on.
+    `on_progress(stats)` is called after every finished chunk with the
+    running aggregate.
+    """
+    if len(policy_names) == 1:
+        policy_names = tuple(policy_names) * n_players
+    if len(policy_names) != n_players:
+        raise ValueError("Give one policy name, or one per seat")
+    for name in policy_names:
+        if name not in POLICIES:
+            raise ValueError(f"Unknown policy {name}")
+
+    workers = workers or os.cpu_count() or 1
+    total = TournamentStats()
+    tasks = ((seed + start, min(chunk, n_games - start)) for start in range(0, n_games, chunk))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        # Keep a bounded number of chunks in flight so million-game runs don't queue millions of futures
+        for first_seed, count in tasks:
+            pending.add(pool.submit(run_chunk, n_players, policy_names, first_seed, count, config))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    total.merge(future.result())
+                    if on_progress:
+                        on_progress(total)
+        for future in pending:
+            total.merge(future.result())
+            if on_progress:
+                on_progress(total)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo tournament over the game engine")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--policy", default="random",
+                        help="Policy name, or comma-separated names one per seat: " + ", ".join(POLICIES))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write final tables to this file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    def progress(stats):
+        elapsed = time.perf_counter() - start
+        tables = stats.tables()
+        rates = ", ".join(f"{cls} {row['win_rate']}" for cls, row in tables["by_class"].items())
+        print(f"[{stats.matches}/{args.games}] {stats.matches / elapsed:.0f} games/s | {rates}", flush=True)
+
+    stats = run_tournament(args.games, args.players, tuple(args.policy.split(",")), args.workers,
+                           args.chunk, args.seed, on_progress=progress)
+    tables = stats.tables()
+    print(json.dumps(tables, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(tables, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+
+from bots import RandomBot
+from knowledge import LIVE_OR_MAGIC
+from shoe import BUST, MAGIC_BULLET, SAFE
+from simulation import play_match
+
+# =========================
+# KNOWLEDGE ODDS CHECK
+# =========================
+# DeckKnowledge answers live_chance / sudden_death_chance with closed-form
+# counts. This plays seeded matches and, before every action, enumerates
+# every shell order consistent with what each seat (and a spectator) has
+# located, then checks the readouts against the brute-force odds. Each
+# distinct order is equally likely, so plain counting is exact.
+
+TOLERANCE = 1e-9
+
+
+def orderings(blank, live, magic):
+    """Every distinct order of `blank` blanks, `live` plain live rounds and `magic` Sudden Death bullets."""
+    if not blank + live + magic:
+        yield ()
+        return
+    for kind, rest in ((SAFE, (blank - 1, live, magic)), (BUST, (blank, live - 1, magic)),
+                       (MAGIC_BULLET, (blank, live, magic - 1))):
+        if min(rest) >= 0:
+            for tail in orderings(*rest):
+                yield (kind,) + tail
+
+
+def _matches(shell, kind):
+    if kind == LIVE_OR_MAGIC:
+        return shell != SAFE
+    return shell == kind
+
+
+def brute_force(deck, known):
+    """(live_chance, sudden_death_chance, orders) by enumerating the orders consistent with `known`."""
+    if not len(deck):
+        return None, 0.0, []
+    orders = [order for order in orderings(deck.blank, deck.live - deck.magic, deck.magic)
+              if all(_matches(order[index], kind) for index, kind in known.items())]
+    assert orders, f"no order of {deck!r} fits {known}"
+    live = sum(order[0] != SAFE for order in orders) / len(orders)
+    magic = sum(order[0] == MAGIC_BULLET for order in orders) / len(orders)
+    return live, magic, orders
+
+
+class CheckingPolicy:
+    """Wraps a policy and checks every viewer's readout before each action it takes."""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.checks = 0
+        self.located = 0    # Checks where the viewer had located at least one shell
+
+    def __call__(self, game, player):
+        deck = game.deck
+        for viewer in [None] + list(game.original_players):
+            view = game.knowledge.view(deck, viewer)
+            live, magic, orders = brute_force(deck, view["known"])
+            where = f"seed {game.seed}, round {game.round_num}, viewer {viewer}, known {view['known']}"
+            assert not len(deck) or tuple(deck) in orders, f"{where}: the real order is ruled out"
+            if live is None:
+                assert view["live_chance"] is None, f"{where}: live_chance {view['live_chance']} for an empty chamber"
+            else:
+                assert abs(view["live_chance"] - live) < TOLERANCE, \
+                    f"{where}: live_chance {view['live_chance']}, brute force {live}"
+            assert abs(view["sudden_death_chance"] - magic) < TOLERANCE, \
+                f"{where}: sudden_death_chance {view['sudden_death_chance']}, brute force {magic}"
+            self.checks += 1
+            self.located += bool(view["known"])
+        return self.policy(game, player)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the knowledge odds against brute-force enumeration")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--players", type=int, default=4)
+    args = parser.parse_args()
+
+    players = [f"Bot{i + 1}" for i in range(args.players)]
+    checks = located = 0
+    for seed in range(args.games):
+        # Use items about half the time so Lens, Phone and Inverter reads come up often
+        policy = CheckingPolicy(RandomBot(seed, draw_bias=0.5))
+        play_match(players, policy, headless=True, seed=seed)
+        checks += policy.checks
+        located += policy.located
+    print(f"{args.games} matches: {checks} readouts match brute force ({located} with located shells)")
+
+
+if __name__ == "__main__":
+    main()
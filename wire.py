@@ -0,0 +1,161 @@
+from compact_state import (
+    CLASS_CODES,
+    ITEM_CODES,
+    ITEM_NAMES,
+    MODIFIER_CODES,
+    MODIFIER_NAMES,
+    NOBODY,
+    SHELL_CODES,
+    SHELL_NAMES,
+    STAT_KEYS,
+)
+from game_engine import LOG_WINDOW, PLAYER_CLASSES
+from knowledge import LIVE_OR_MAGIC
+from metrics import instrumented
+
+# =========================
+# COMPACT WIRE FORMAT
+# =========================
+# Opt-in alternative to get_state() for clients that ask for it
+# (?format=compact or Accept: application/vnd.roulette.compact+json).
+# Players are seat indexes into the static "n" list, items/classes/
+# modifiers are integer codes (see WIRE_SCHEMA), inventories are count maps
+# and event timestamps are dropped. Static data (names, classes, max
+# health) is only sent when it changes, i.e. once per round.
+#
+# The seat map, the static block, the inventory count maps and each encoded
+# event are cached on the engine and rebuilt only when their field version
+# (or the event id) moves, so a poll mostly copies references. Cached
+# values are shared between replies and must not be mutated.
+
+COMPACT_MIME = "application/vnd.roulette.compact+json"
+WIRE_VERSION = 1
+
+# Event data values that name a player / an item are sent as codes
+_PLAYER_KEYS = ("player", "target", "winner", "active_player", "source", "assassin")
+_ITEM_KEYS = ("item",)
+
+# Shell codes in "kn" also cover what a Lens shows for a live shell
+_SEEN_CODES = dict(SHELL_CODES, **{LIVE_OR_MAGIC: len(SHELL_CODES)})
+# Count-map keys are JSON object keys, i.e. strings on the wire anyway; building them
+# as strings up front spares the encoder converting every int key on every reply
+_ITEM_KEYS_JSON = {item: str(code) for item, code in ITEM_CODES.items()}
+
+WIRE_SCHEMA = {
+    "wire_version": WIRE_VERSION,
+    "items": ITEM_NAMES,
+    "classes": PLAYER_CLASSES,
+    "modifiers": [MODIFIER_NAMES[code] for code in sorted(MODIFIER_NAMES)],
+    "shells": [SHELL_NAMES[code] for code in sorted(SHELL_NAMES)] + [LIVE_OR_MAGIC],
+    "stats": list(STAT_KEYS),
+    "nobody": NOBODY,
+    "keys": {
+        "v": "version", "f": "full (1) or delta (0)", "a": "alive seats in turn order",
+        "c": "current seat", "go": "game over", "rw": "round winner seat", "w": "winner seat",
+        "d": "[shells left, live, blank]", "r": "[round, max rounds]", "bo": "blackout seat",
+        "m": "modifier code", "pz": "prize pool", "me": "it is the viewer's turn",
+        "s": "static {n: names, k: class codes, mh: max health} (sent when changed)",
+        "h": "health per seat", "i": "inventory count maps per seat {item code: count}",
+        "e": "events [id, type, data]", "st": "stats per seat in `stats` order (game over only)",
+        "l": "log lines",
+        "kn": "viewer's [live chance, sudden death chance, {index from front: shell code}]",
+    },
+}
+
+
+class _WireCache:
+    __slots__ = ("seats", "static_key", "static", "items_version", "items", "events_id", "event_rows", "events")
+
+    def __init__(self, names):
+        self.seats = {name: i for i, name in enumerate(names)}
+        self.static_key = self.static = None
+        self.items_version = -1
+        self.items = None
+        self.events_id = -1
+        self.event_rows = {}    # event id -> encoded [id, type, data]
+        self.events = None
+
+
+def _event_data(data, seats):
+    out = {}
+    for key, value in data.items():
+        if not isinstance(value, str):
+            pass  # Only names and items are coded; anything else passes through as-is
+        elif key in _PLAYER_KEYS and value in seats:
+            value = seats[value]
+        elif key in _ITEM_KEYS and value in ITEM_CODES:
+            value = ITEM_CODES[value]
+        out[key] = value
+    return out
+
+
+@instrumented("compact_state")
+def compact_state(game, viewer=None, since_version=None):
+    """get_state() equivalent in the compact wire format."""
+    full, changed = game.delta_fields(since_version)
+    names = game.original_players
+    cache = game.wire_cache
+    if cache is None:
+        cache = game.wire_cache = _WireCache(names)
+    seats = cache.seats
+    current = game.current()
+    alive = game.alive
+    deck = game.deck
+    game_over = game.is_game_over()
+    winner = game.grand_winner()
+
+    state = {
+        "v": game.version,
+        "f": int(full),
+        "a": [seats[p] for p in alive],
+        "c": seats.get(current, NOBODY),
+        "go": int(game_over),
+        "rw": seats.get(game.round_winner, NOBODY),
+        "w": seats.get(winner, NOBODY),
+        "d": [len(deck), deck.live, deck.blank],
+        "r": [game.round_num, game.max_rounds],
+        "bo": seats.get(game.blackout_for, NOBODY),
+        "m": MODIFIER_CODES[game.current_modifier],
+        "pz": game.prize_pool,
+        "me": int(viewer is not None and current == viewer),
+        "kn": [game.knowledge.live_chance(deck, viewer), game.knowledge.sudden_death_chance(deck, viewer),
+               {str(i): _SEEN_CODES[kind] for i, kind in game.knowledge.known(viewer).items()}],
+    }
+    if changed("classes") or changed("max_health"):
+        key = (game.field_version("classes"), game.field_version("max_health"))
+        if cache.static_key != key:
+            cache.static_key = key
+            cache.static = {
+                "n": names,
+                "k": [CLASS_CODES[game.player_classes[p]] for p in names],
+                "mh": [game.player_max_health[p] for p in names],
+            }
+        state["s"] = cache.static
+    if changed("health"):
+        state["h"] = [game.health[p] for p in names]
+    if changed("items"):
+        version = game.field_version("items")
+        if cache.items_version != version:
+            inventories = []
+            for p in names:
+                counts = {}
+                for item in game.items.get(p, ()):
+                    key = _ITEM_KEYS_JSON[item]
+                    counts[key] = counts.get(key, 0) + 1
+                inventories.append(counts)
+            cache.items_version, cache.items = version, inventories
+        state["i"] = cache.items
+    if changed("events"):
+        if cache.events_id != game.events.last_id:
+            # Events never change once appended: only new ones are encoded, evicted ones dropped
+            old, rows = cache.event_rows, {}
+            for e in game.events:
+                row = old.get(e["id"])
+                rows[e["id"]] = row or [e["id"], e["type"], _event_data(e["data"], seats)]
+            cache.events_id, cache.event_rows, cache.events = game.events.last_id, rows, list(rows.values())
+        state["e"] = cache.events
+    if changed("stats") and game_over:
+        state["st"] = [[game.stats[p][k] for k in STAT_KEYS] for p in names]
+    if changed("logs"):
+        state["l"] = game.log_store.tail(viewer, LOG_WINDOW)
+    return state